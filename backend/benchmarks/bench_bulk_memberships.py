@@ -0,0 +1,57 @@
+"""
+Benchmark adding N users to a squad: one POST /squad-memberships per user
+versus a single POST /squad-memberships/{squad_id}/bulk.
+
+One-by-one costs two round trips per user (duplicate check + insert); the
+bulk import costs a constant handful (lookups + one batched insert).
+
+Run from the backend directory:
+    python benchmarks/bench_bulk_memberships.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+from cache import LRUCache
+from memberships import MembershipIndex
+from benchmarks.stub_supabase import StubSupabase, auth_headers, seed_squad
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 300])
+    args = parser.parse_args()
+
+    main.cache = LRUCache()
+    print(f"{'users':>6} {'mode':>10} {'trips':>6} {'seconds':>8} {'users/s':>9}")
+    for size in args.sizes:
+        for mode in ("one-by-one", "bulk"):
+            stub = StubSupabase(latency=args.latency)
+            user_ids = seed_squad(stub, "pool", size)
+            # The target squad's admin does the adding
+            admin = seed_squad(stub, "target", 1)[0]
+            main.supabase = stub
+            main.membership_index = MembershipIndex()
+            http = TestClient(main.app, headers=auth_headers(admin))
+
+            start = time.perf_counter()
+            if mode == "bulk":
+                response = http.post("/squad-memberships/target/bulk", json={"user_ids": user_ids})
+                assert response.json()["summary"]["created"] == size, response.text
+            else:
+                for user_id in user_ids:
+                    response = http.post("/squad-memberships", json={"user_id": user_id, "squad_id": "target"})
+                    assert response.status_code == 201, response.text
+            elapsed = time.perf_counter() - start
+            print(f"{size:>6} {mode:>10} {stub.round_trips:>6} {elapsed:>8.2f} {size / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,88 @@
+"""
+Benchmark calendar queries on one squad's care sessions: the sorted-interval
+CareSessionIndex against scanning every session.
+
+Each squad gets back-to-back sessions of 2-8 hours with gaps of 0-12 hours,
+plus one week-long session so the index's query window is not artificially
+tight. Queries:
+- week:     sessions overlapping a random 7-day range (a calendar view)
+- on-duty:  sessions in progress at a random moment
+- conflict: sessions overlapping a random 3-hour slot (create's overlap check)
+
+Run from the backend directory:
+    python benchmarks/bench_care_sessions.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from care_sessions import CareSessionIndex
+
+EPOCH = datetime(2024, 1, 1)
+
+
+def make_sessions(count, rng):
+    sessions = []
+    moment = EPOCH
+    for i in range(count):
+        moment += timedelta(hours=rng.uniform(0, 12))
+        end = moment + timedelta(hours=rng.uniform(2, 8))
+        sessions.append({"id": f"session-{i}", "starts_at": moment.isoformat(), "ends_at": end.isoformat()})
+        moment = end
+    sessions.append({
+        "id": "long-session",
+        "starts_at": (EPOCH - timedelta(days=8)).isoformat(),
+        "ends_at": (EPOCH - timedelta(days=1)).isoformat(),
+    })
+    return sessions, moment
+
+
+def scan(parsed, start, end):
+    return [session for session_start, session_end, session in parsed if session_start < end and session_end > start]
+
+
+def time_queries(query, ranges):
+    start = time.perf_counter()
+    found = sum(len(query(low, high)) for low, high in ranges)
+    return (time.perf_counter() - start) / len(ranges), found
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'sessions':>9} {'query':>9} {'index us':>9} {'scan us':>9} {'speedup':>8}")
+    for size in args.sizes:
+        sessions, last = make_sessions(size, rng)
+        index = CareSessionIndex()
+        index.load(sessions)
+        parsed = [(datetime.fromisoformat(s["starts_at"]), datetime.fromisoformat(s["ends_at"]), s) for s in sessions]
+        span = (last - EPOCH).total_seconds()
+
+        def random_moment():
+            return EPOCH + timedelta(seconds=rng.uniform(0, span))
+
+        cases = {
+            "week": timedelta(days=7),
+            "on-duty": timedelta(microseconds=1),
+            "conflict": timedelta(hours=3),
+        }
+        for name, length in cases.items():
+            ranges = [(moment, moment + length) for moment in (random_moment() for _ in range(args.queries))]
+            indexed, _ = time_queries(index.overlapping, ranges)
+            scanned, scanned_found = time_queries(lambda low, high: scan(parsed, low, high), ranges[:200])
+            # Both must find the same sessions
+            assert sum(len(index.overlapping(*r)) for r in ranges[:200]) == scanned_found
+            print(f"{size:>9} {name:>9} {indexed * 1e6:>9.1f} {scanned * 1e6:>9.1f} {scanned / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main_benchmark()
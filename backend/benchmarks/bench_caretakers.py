@@ -0,0 +1,101 @@
+"""
+Monte Carlo benchmark of caretaker selection.
+
+Fairness: simulates --squads squads of 2-6 members over --rounds draws. Each
+draw's caretaker is credited one session of 2-10 hours. Reports how unevenly
+the hours end up spread within a squad (coefficient of variation, averaged
+over squads) and the widest gap in sessions, for fairness 0 (a uniform draw,
+like the old client-side wheel) and the weighted settings.
+
+Throughput: times one nightly batch, caretakers.pick_caretakers() for
+--batch-squads squads, against a Python loop of random.choices() per squad.
+
+Run from the backend directory:
+    python benchmarks/bench_caretakers.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import caretakers
+
+
+def make_squads(squad_count, rng):
+    sizes = rng.integers(2, 7, squad_count)
+    groups = np.repeat(np.arange(squad_count), sizes)
+    return groups, sizes
+
+
+def simulate(groups, sizes, rounds, fairness, rng):
+    caretakers.CARETAKER_FAIRNESS = fairness
+    hours = np.zeros(len(groups))
+    sessions = np.zeros(len(groups))
+    for _ in range(rounds):
+        picks, _ = caretakers.pick_caretakers(groups, hours, sessions, len(sizes), rng)
+        hours[picks] += rng.uniform(2, 10, len(picks))
+        sessions[picks] += 1
+
+    counts = sizes.astype(np.float64)
+    mean = np.bincount(groups, hours) / counts
+    variance = np.bincount(groups, (hours - mean[groups]) ** 2) / counts
+    spread = np.sqrt(variance) / mean
+    session_max = np.full(len(sizes), -np.inf)
+    np.maximum.at(session_max, groups, sessions)
+    session_min = np.full(len(sizes), np.inf)
+    np.minimum.at(session_min, groups, sessions)
+    return spread.mean(), (session_max - session_min).max()
+
+
+def loop_picks(groups, hours, sessions, sizes):
+    # One weighted draw per squad in plain Python, for comparison
+    weights = caretakers.member_weights(groups, hours, sessions, len(sizes)).tolist()
+    picks = []
+    start = 0
+    for size in sizes.tolist():
+        picks.append(start + random.choices(range(size), weights[start:start + size])[0])
+        start += size
+    return picks
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--squads", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=52)
+    parser.add_argument("--fairness", type=float, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--batch-squads", type=int, default=100000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    groups, sizes = make_squads(args.squads, rng)
+    print(f"{args.squads} squads, {len(groups)} members, {args.rounds} draws each")
+    print(f"{'fairness':>9} {'hours CV':>9} {'max session gap':>16}")
+    for fairness in args.fairness:
+        spread, gap = simulate(groups, sizes, args.rounds, fairness, rng)
+        print(f"{fairness:>9g} {spread:>9.3f} {gap:>16.0f}")
+
+    caretakers.CARETAKER_FAIRNESS = 2
+    groups, sizes = make_squads(args.batch_squads, rng)
+    hours = rng.uniform(0, 200, len(groups))
+    sessions = rng.integers(0, 30, len(groups)).astype(np.float64)
+
+    start = time.perf_counter()
+    caretakers.pick_caretakers(groups, hours, sessions, len(sizes), rng)
+    vectorized = time.perf_counter() - start
+    start = time.perf_counter()
+    loop_picks(groups, hours, sessions, sizes)
+    looped = time.perf_counter() - start
+
+    print(f"\nnightly batch: {args.batch_squads} squads, {len(groups)} members")
+    print(f"{'mode':>11} {'ms':>8} {'squads/s':>11}")
+    for mode, seconds in (("vectorized", vectorized), ("loop", looped)):
+        print(f"{mode:>11} {seconds * 1000:>8.1f} {args.batch_squads / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,128 @@
+"""
+Benchmark a serverless cold start: a fresh interpreter importing main and
+answering its first request.
+
+Each run starts a new Python process, as a cold Vercel invocation does,
+which imports main and sends GET /users/{user_id} straight to the ASGI app.
+SUPABASE_URL points at a StubPostgrestServer in this process, so the real
+PostgREST client is created and makes a real HTTP round trip. Reports,
+as the median of --runs runs:
+- import:  importing main
+- first:   the first request, including anything deferred to first use
+- second:  the next request, i.e. a warm invocation
+- total:   from starting the process until the first response
+
+for the default (lazy) startup and for STARTUP_MODE=eager, followed by the
+slowest imports of a cold `import main` (python -X importtime).
+
+Run from the backend directory:
+    python benchmarks/bench_cold_start.py
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_postgrest import StubPostgrestServer
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh process; talks raw ASGI so no client library is imported
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def request(path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80), "root_path": "",
+    }
+    status = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    await main.app(scope, receive, send)
+    assert status == [200], status
+
+async def serve():
+    await request(sys.argv[1])
+    first = time.perf_counter()
+    await request(sys.argv[2])
+    return first, time.perf_counter()
+
+first, second = asyncio.run(serve())
+print(json.dumps({"import": imported - started, "first": first - imported, "second": second - first}), flush=True)
+"""
+
+
+def cold_start(env, user_ids):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", CHILD, f"/users/{user_ids[0]}", f"/users/{user_ids[1]}"],
+        cwd=BACKEND, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    # main prints its own startup messages; the result is the JSON line
+    line = process.stdout.readline()
+    while line and not line.startswith("{"):
+        line = process.stdout.readline()
+    total = time.perf_counter() - start
+    process.wait()
+    result = json.loads(line)
+    # Up to the first response, leaving out the second request
+    result["total"] = total - result["second"]
+    return result
+
+
+def import_breakdown(env, top):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        # Only top-level imports, i.e. those made by main and its own modules
+        if match and len(match.group(3)) <= 3:
+            rows.append((int(match.group(2)), int(match.group(1)), match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    stub = StubSupabase()
+    user_ids = seed_squad(stub, "squad", 2)
+    with StubPostgrestServer(stub) as server:
+        env = dict(os.environ, SUPABASE_URL=server.url, SUPABASE_SERVICE_KEY="stub-key")
+        print(f"{'mode':>6} {'import ms':>10} {'first ms':>9} {'second ms':>10} {'total ms':>9}")
+        for mode in ("lazy", "eager"):
+            mode_env = dict(env, STARTUP_MODE=mode)
+            cold_start(mode_env, user_ids)  # warm the OS file cache
+            runs = [cold_start(mode_env, user_ids) for _ in range(args.runs)]
+            median = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            print(f"{mode:>6} {median['import']:>10.1f} {median['first']:>9.1f} {median['second']:>10.1f} {median['total']:>9.1f}")
+
+        print("\nslowest imports of main (lazy startup)")
+        print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for cumulative, own, module in import_breakdown(dict(env, STARTUP_MODE="lazy"), args.top):
+            print(f"{cumulative / 1000:>14.1f} {own / 1000:>8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
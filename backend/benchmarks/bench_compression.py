@@ -0,0 +1,92 @@
+"""
+Benchmark response compression: bytes on the wire and CPU per request.
+
+Serves each endpoint end to end through the ASGI app (against the in-memory
+StubSupabase, no latency) with:
+
+- identity: the client accepts no compression, as before;
+- gzip / br: compressed by CompressionMiddleware. br only if the optional
+  `brotli` package is installed;
+- "cache off" / "cache on": without and with the compressed bodies kept per
+  ETag (CompressedBodies), for the endpoints that send one: /squads and the
+  squad members. /users and /squad-memberships have no ETag and are
+  compressed on every request.
+
+Reports response bytes and CPU milliseconds (time.process_time) per request.
+CPU includes the stub database's own work for the uncached list endpoints,
+so compare rows of the same endpoint.
+
+Run from the backend directory:
+    python benchmarks/bench_compression.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import compression
+import main
+from cache import LRUCache
+from memberships import MembershipIndex
+from versions import VersionTable
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+async def serve(path, accept_encoding, count):
+    transport = httpx.ASGITransport(app=main.app)
+    headers = {"Accept-Encoding": accept_encoding}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as http:
+        # The first request warms the caches
+        assert (await http.get(path)).status_code == 200
+        body_bytes = 0
+        start = time.process_time()
+        for _ in range(count):
+            # Stream so the body is counted as sent rather than decoded
+            async with http.stream("GET", path) as response:
+                assert response.status_code == 200
+                body_bytes += sum([len(chunk) async for chunk in response.aiter_raw()])
+        return body_bytes / count, (time.process_time() - start) / count
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--squads", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    stub = StubSupabase()
+    seed_squad(stub, "squad", args.members)
+    for i in range(args.squads - 1):
+        seed_squad(stub, f"other-{i}", 0)
+    main.supabase = stub
+
+    # path -> whether its responses carry an ETag
+    paths = {"/squad-memberships/squad/members": True, "/squads": True, "/users": False, "/squad-memberships": False}
+    max_bytes = compression.compressed_bodies.max_bytes
+
+    print(f"{'path':>32} {'encoding':>9} {'cache':>6} {'bytes/req':>10} {'cpu ms/req':>11}")
+    try:
+        for path, has_etag in paths.items():
+            modes = [("identity", None)] + [
+                (encoding, cached) for encoding in compression.ENCODINGS for cached in ((False, True) if has_etag else (None,))
+            ]
+            for encoding, cached in modes:
+                main.cache = LRUCache()
+                main.versions = VersionTable()
+                main.membership_index = MembershipIndex()
+                compression.compressed_bodies.max_bytes = 0 if cached is False else max_bytes
+                body_bytes, seconds = asyncio.run(serve(path, encoding, args.requests))
+                cache = {None: "-", False: "off", True: "on"}[cached]
+                print(f"{path:>32} {encoding:>9} {cache:>6} {body_bytes:>10.0f} {seconds * 1000:>11.2f}")
+    finally:
+        compression.compressed_bodies.max_bytes = max_bytes
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,77 @@
+"""
+Benchmark request throughput as concurrency grows.
+
+Runs the real PostgREST client (db.create_client) against a local stub PostgREST server that
+adds --latency seconds to every round trip, and drives GET /users/{id}
+through the ASGI app at increasing concurrency. With db.execute() offloading
+round trips to the thread pool, throughput should scale with concurrency up
+to DB_MAX_WORKERS. The "blocking" column calls .execute() on the event loop,
+as the handlers used to, for comparison.
+
+Run from the backend directory:
+    python benchmarks/bench_concurrency.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import db
+import main
+from cache import LRUCache
+from benchmarks.stub_postgrest import StubPostgrestServer
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+async def blocking_execute(query):
+    return query.execute()
+
+
+async def drive(concurrency, total, user_ids):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        next_request = iter(range(total))
+
+        async def worker():
+            for i in next_request:
+                response = await http.get(f"/users/{user_ids[i % len(user_ids)]}")
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    stub = StubSupabase(latency=args.latency)
+    user_ids = seed_squad(stub, "squad", 50)
+    offloaded_execute = db.execute
+    # Measure the round trips themselves, not the read-through cache
+    main.cache = LRUCache(maxsize=0)
+
+    with StubPostgrestServer(stub) as server:
+        main.supabase = db.create_client(server.url, "stub-key")
+
+        print(f"{'concurrency':>11} {'offloaded req/s':>16} {'blocking req/s':>15}")
+        for concurrency in args.concurrency:
+            db.execute = offloaded_execute
+            offloaded = asyncio.run(drive(concurrency, args.requests, user_ids))
+            db.execute = blocking_execute
+            blocking = asyncio.run(drive(concurrency, args.requests, user_ids))
+            print(f"{concurrency:>11} {offloaded:>16.1f} {blocking:>15.1f}")
+        db.execute = offloaded_execute
+
+
+if __name__ == "__main__":
+    main_benchmark()
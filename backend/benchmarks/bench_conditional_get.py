@@ -0,0 +1,99 @@
+"""
+Benchmark revalidating unchanged resources with If-None-Match.
+
+A client fetches each resource once and then re-fetches it --refetches
+times, as Squad.tsx does on every mount, either unconditionally or sending
+back the ETag it got (what a browser does with a "no-cache" response):
+
+- members: GET /squad-memberships/{squad_id}/members
+- squads:  GET /squads
+- user:    GET /users/{user_id}
+
+Every --write-every re-fetches a member is added to the squad, which bumps
+the members' version, so the next conditional re-fetch gets a 200 again.
+Reports response bytes and database round trips per re-fetch and p50
+latency, against the in-memory StubSupabase with --latency per round trip.
+
+Run from the backend directory:
+    python benchmarks/bench_conditional_get.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from cache import LRUCache
+from memberships import MembershipIndex
+from versions import VersionTable
+from benchmarks.stub_supabase import StubSupabase, auth_headers, seed_squad
+
+
+async def refetch(path, args, stub, conditional, writer):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        response = await http.get(path)
+        etag = response.headers["etag"]
+        latencies = []
+        body_bytes = 0
+        trips = 0
+        statuses = {}
+        for i in range(1, args.refetches + 1):
+            if args.write_every and i % args.write_every == 0:
+                user_id = str(uuid.uuid4())
+                stub.tables["users"].append({"id": user_id, "nameFirst": "New", "nameLast": "Member"})
+                added = await http.post("/squad-memberships", json={"user_id": user_id, "squad_id": "squad"}, headers=auth_headers(writer))
+                assert added.status_code == 201, added.text
+            headers = {"If-None-Match": etag} if conditional else {}
+            before = stub.round_trips
+            start = time.perf_counter()
+            response = await http.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            trips += stub.round_trips - before
+            assert response.status_code in (200, 304), response.text
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            body_bytes += len(response.content)
+            etag = response.headers.get("etag", etag)
+    latencies.sort()
+    return body_bytes / args.refetches, trips / args.refetches, latencies[len(latencies) // 2] * 1000, statuses
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--squads", type=int, default=50)
+    parser.add_argument("--refetches", type=int, default=200)
+    parser.add_argument("--write-every", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':>8} {'conditional':>11} {'bytes/req':>10} {'trips/req':>10} {'p50 ms':>7}  statuses")
+    for name in ("members", "squads", "user"):
+        for conditional in (False, True):
+            stub = StubSupabase(latency=args.latency)
+            user_ids = seed_squad(stub, "squad", args.members)
+            for i in range(args.squads - 1):
+                seed_squad(stub, f"other-{i}", 0)
+            main.supabase = stub
+            main.cache = LRUCache()
+            main.versions = VersionTable()
+            main.membership_index = MembershipIndex()
+            path = {
+                "members": "/squad-memberships/squad/members",
+                "squads": "/squads",
+                "user": f"/users/{user_ids[0]}",
+            }[name]
+            body_bytes, trips, p50, statuses = asyncio.run(refetch(path, args, stub, conditional, user_ids[0]))
+            mode = "yes" if conditional else "no"
+            statuses = " ".join(f"{status}x{count}" for status, count in sorted(statuses.items()))
+            print(f"{name:>8} {mode:>11} {body_bytes:>10.0f} {trips:>10.2f} {p50:>7.2f}  {statuses}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
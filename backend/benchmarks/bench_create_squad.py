@@ -0,0 +1,70 @@
+"""
+Benchmark POST /squads: one RPC round trip versus the two-step insert.
+
+The "rpc" mode uses the create_squad_with_admin function; "two-step" removes
+it from the stub so the backend falls back to two inserts (the previous
+flow). A final fault-injection run fails every membership insert on the
+two-step path and checks that no admin-less squad is left behind.
+
+Run from the backend directory:
+    python benchmarks/bench_create_squad.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+import main
+from benchmarks.stub_supabase import StubSupabase, auth_headers, seed_squad
+
+
+def run(http, stub, user_id, requests):
+    timings = []
+    stub.round_trips = 0
+    for i in range(requests):
+        start = time.perf_counter()
+        response = http.post("/squads", json={"name": f"Squad {i}", "nameMom": "Mom", "user_id": user_id}, headers=auth_headers(user_id))
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 201, response.text
+    return statistics.median(timings), stub.round_trips / requests
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds")
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} {'p50 ms':>8} {'trips/request':>14}")
+    for mode in ("rpc", "two-step"):
+        stub = StubSupabase(latency=args.latency)
+        user_id = seed_squad(stub, "seed", 1)[0]
+        if mode == "two-step":
+            del stub.functions["create_squad_with_admin"]
+        main.supabase = stub
+        main.squad_rpc_available = True
+        p50, trips = run(TestClient(main.app), stub, user_id, args.requests)
+        print(f"{mode:>9} {p50 * 1000:>8.1f} {trips:>14.1f}")
+
+    stub = StubSupabase()
+    del stub.functions["create_squad_with_admin"]
+    stub.failures[("user_squad_memberships", "insert")] = APIError({"code": "23503", "message": "injected failure"})
+    main.supabase = stub
+    main.squad_rpc_available = True
+    http = TestClient(main.app, headers=auth_headers("nobody"))
+    failed = sum(
+        http.post("/squads", json={"name": "Doomed", "nameMom": "Mom", "user_id": "nobody"}).status_code == 500
+        for _ in range(args.requests)
+    )
+    print(f"fault injection: {failed}/{args.requests} requests failed, "
+          f"{len(stub.tables.get('squad', []))} orphan squads left")
+
+
+if __name__ == "__main__":
+    main_benchmark()
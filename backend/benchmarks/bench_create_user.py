@@ -0,0 +1,77 @@
+"""
+Benchmark POST /create-user round trips and latency.
+
+Modes:
+- precheck:    USERS_UNIQUE_CONSTRAINTS=false, one OR query for email and
+               username, then the insert (2 round trips)
+- constraints: USERS_UNIQUE_CONSTRAINTS=true, the unique constraints in
+               sql/users_unique_constraints.sql reject duplicates on
+               insert (1 round trip)
+
+The previous flow checked email and username in separate queries before
+inserting (3 round trips). Each mode then replays the same registrations to
+time the 409 path. scrypt is turned down so the numbers are the
+database round trips, not password hashing.
+
+Run from the backend directory:
+    python benchmarks/bench_create_user.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+import passwords
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+def new_user(i):
+    return {
+        "username": f"bench_{i}",
+        "password": "password123",
+        "nameFirst": "Bench",
+        "nameLast": "User",
+        "email": f"bench{i}@example.com",
+        "phoneNumber": "1234567890",
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    passwords.PASSWORD_SCRYPT_N = 2 ** 4
+    passwords.PASSWORD_HASH_EXECUTOR = "thread"
+    main.cache = LRUCache(maxsize=0)
+
+    print(f"{'mode':>12} {'outcome':>9} {'trips/req':>10} {'p50 ms':>8}")
+    for mode in ("precheck", "constraints"):
+        main.USERS_UNIQUE_CONSTRAINTS = mode == "constraints"
+        stub = StubSupabase(latency=args.latency)
+        seed_squad(stub, "squad", 100)
+        main.supabase = stub
+        http = TestClient(main.app)
+
+        for outcome, expected in (("created", 201), ("duplicate", 409)):
+            latencies = []
+            trips_before = stub.round_trips
+            for i in range(args.requests):
+                start = time.perf_counter()
+                response = http.post("/create-user", json=new_user(i))
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == expected, response.text
+            trips = (stub.round_trips - trips_before) / args.requests
+            print(f"{mode:>12} {outcome:>9} {trips:>10.1f} {statistics.median(latencies) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
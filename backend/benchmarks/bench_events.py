@@ -0,0 +1,186 @@
+"""
+Benchmark fanning squad events out to many connected clients.
+
+hub:  --clients subscribers of one squad inside this process, each draining
+      its queue through Subscription.frames() as the SSE endpoint does.
+      Publishes --events events and reports the cost of publish() (encoding
+      once and queueing for every subscriber) and how long until each
+      subscriber had each event. Run again with --slow of the subscribers
+      never reading: their queues stay at EVENT_QUEUE_SIZE and they get
+      resync, while the publisher and everyone else are unaffected.
+
+http: one uvicorn worker in a subprocess (against the in-memory stub) with
+      --clients real connections to GET /squads/{squad_id}/events. Each of
+      --http-events POST /squads/{squad_id}/sessions is pushed to every client as
+      session.created; reports the time from sending the POST until each
+      client read the event. The clients run in this process, so on a
+      single core they compete with the server for CPU.
+
+Run from the backend directory:
+    python benchmarks/bench_events.py
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import tokens
+from events import SquadEventHub
+from benchmarks.stub_supabase import StubSupabase, auth_headers, seed_squad
+
+SERVER = """
+import sys
+sys.path.insert(0, {backend!r})
+import uvicorn
+import main
+import tokens
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+main.supabase = StubSupabase()
+main.cache = LRUCache()
+seed_squad(main.supabase, "squad", 3)
+tokens.rotate_signing_keys({{"bench": {secret!r}}})
+uvicorn.run(main.app, host="127.0.0.1", port={port}, log_level="warning", backlog=4096)
+"""
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return [samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 for p in (0.5, 0.99)] + [samples[-1] * 1000]
+
+
+async def bench_hub(clients, events, slow):
+    hub = SquadEventHub()
+    latencies = []
+    sent = {}
+    fast = clients - int(clients * slow)
+
+    async def consume(subscription):
+        async for chunk in subscription.frames():
+            now = time.perf_counter()
+            for frame in chunk.split(b"\n\n"):
+                if frame.startswith(b"id: "):
+                    latencies.append(now - sent[frame[4:frame.index(b"\n")].decode()])
+
+    subscriptions = [hub.subscribe("squad") for _ in range(clients)]
+    readers = [asyncio.create_task(consume(subscription)) for subscription in subscriptions[:fast]]
+    await asyncio.sleep(0)
+
+    publish_seconds = 0.0
+    for i in range(events):
+        event_id = f"{hub.epoch}-{hub._sequence + 1}"
+        start = time.perf_counter()
+        sent[event_id] = start
+        hub.publish("squad", "session.created", {"id": f"session-{i}", "squad_id": "squad", "notes": "x" * 100})
+        publish_seconds += time.perf_counter() - start
+        # Let the readers run between events, as a server would
+        await asyncio.sleep(0)
+    while len(latencies) < fast * events:
+        await asyncio.sleep(0.001)
+
+    for reader in readers:
+        reader.cancel()
+    backlog = max(subscription.queue.qsize() for subscription in subscriptions)
+    return publish_seconds / events, percentiles(latencies), hub.resyncs, backlog
+
+
+async def sse_client(port, received, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /squads/squad/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    ready()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: session.created"):
+                received.append(time.perf_counter())
+    finally:
+        writer.close()
+
+
+async def bench_http(port, clients, events, headers):
+    received = []
+    connected = 0
+
+    def ready():
+        nonlocal connected
+        connected += 1
+
+    tasks = []
+    for i in range(0, clients, 500):
+        tasks += [asyncio.create_task(sse_client(port, received, ready)) for _ in range(min(500, clients - i))]
+        while connected < len(tasks):
+            await asyncio.sleep(0.01)
+
+    latencies = []
+    starts_at = datetime(2030, 1, 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers) as http:
+        for i in range(events):
+            received.clear()
+            start = time.perf_counter()
+            session = {"starts_at": (starts_at + timedelta(hours=i)).isoformat(), "ends_at": (starts_at + timedelta(hours=i, minutes=30)).isoformat()}
+            response = await http.post("/squads/squad/sessions", json=session)
+            assert response.status_code == 201, response.text
+            while len(received) < clients:
+                await asyncio.sleep(0.001)
+            latencies += [moment - start for moment in received]
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return percentiles(latencies)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--http-events", type=int, default=10)
+    parser.add_argument("--slow", type=float, default=0.1, help="share of hub subscribers that never read")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--skip-http", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.events} hub events, {args.http_events} http events")
+    print(f"{'mode':>16} {'publish us':>11} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'resyncs':>8} {'backlog':>8}")
+    for slow in (0.0, args.slow):
+        publish, (p50, p99, worst), resyncs, backlog = asyncio.run(bench_hub(args.clients, args.events, slow))
+        mode = f"hub {int(slow * 100)}% slow"
+        print(f"{mode:>16} {publish * 1e6:>11.0f} {p50:>8.2f} {p99:>8.2f} {worst:>8.2f} {resyncs:>8} {backlog:>8}")
+
+    if args.skip_http:
+        return
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # The server signs with the same key, so it accepts the sessions' tokens
+    secret = secrets.token_urlsafe(32)
+    tokens.rotate_signing_keys({"bench": secret})
+    # seed_squad's ids are deterministic: this is the server's first member
+    headers = auth_headers(seed_squad(StubSupabase(), "squad", 1)[0])
+    server = subprocess.Popen([sys.executable, "-c", SERVER.format(backend=backend, port=args.port, secret=secret)], cwd=backend)
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        p50, p99, worst = asyncio.run(bench_http(args.port, args.clients, args.http_events, headers))
+        print(f"{'http sse':>16} {'-':>11} {p50:>8.2f} {p99:>8.2f} {worst:>8.2f} {'-':>8} {'-':>8}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,100 @@
+"""
+Benchmark GET /users as one JSON body versus streamed NDJSON.
+
+For each table size, reports time to first byte, total time and the peak
+Python memory allocated while serving the request (tracemalloc, so the
+seeded stub data itself is excluded). The NDJSON stream should keep TTFB
+and peak memory flat as the table grows; the single JSON body grows with it.
+
+Run from the backend directory:
+    python benchmarks/bench_list_streaming.py --sizes 10000 50000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase
+
+
+def seed_users(client, count):
+    client.tables["users"] = [
+        {
+            "id": f"user-{i:08d}",
+            "username": f"user_{i}",
+            "password": "password123",
+            "nameFirst": f"First{i}",
+            "nameLast": f"Last{i}",
+            "email": f"user{i}@example.com",
+            "phoneNumber": "123-456-7890",
+            "hours": i % 40,
+            "sessions": i % 7,
+        }
+        for i in range(count)
+    ]
+
+
+async def measure(path):
+    """
+    Call the ASGI app directly so body chunks can be timed and discarded as
+    they arrive (httpx's ASGI transport buffers the whole response).
+    """
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80), "root_path": "",
+    }
+    state = {"first_byte": None, "size": 0, "received": False}
+    finished = asyncio.Event()
+
+    async def receive():
+        if state["received"]:
+            # No disconnect until the response is complete
+            await finished.wait()
+            return {"type": "http.disconnect"}
+        state["received"] = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            if state["first_byte"] is None:
+                state["first_byte"] = time.perf_counter() - start
+            state["size"] += len(message["body"])
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await main.app(scope, receive, send)
+    finished.set()
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return state["first_byte"], total, peak, state["size"]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    main.cache = LRUCache(maxsize=0)
+    print(f"{'rows':>8} {'mode':>7} {'ttfb ms':>8} {'total ms':>9} {'peak MiB':>9} {'bytes':>11}")
+    for size in args.sizes:
+        stub = StubSupabase(latency=args.latency)
+        seed_users(stub, size)
+        main.supabase = stub
+        for mode, path in (("json", "/users"), ("ndjson", "/users?format=ndjson")):
+            ttfb, total, peak, body = asyncio.run(measure(path))
+            print(f"{size:>8} {mode:>7} {ttfb * 1000:>8.1f} {total * 1000:>9.1f} {peak / 2**20:>9.1f} {body:>11}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,95 @@
+"""
+Benchmark POST /login throughput with scrypt password hashing.
+
+Modes:
+- inline:  scrypt runs on the event loop (what a naive port would do)
+- thread:  scrypt runs on a thread pool
+- process: scrypt runs on a process pool (the default)
+- cached:  process pool, but every login repeats recent credentials so the
+           verified-hash cache answers without running scrypt
+
+Run from the backend directory:
+    python benchmarks/bench_login.py --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+import passwords
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+async def inline_scrypt(password, salt, n, r, p):
+    return passwords._scrypt(password, salt, n, r, p)
+
+
+async def hash_all(count):
+    return await asyncio.gather(*(passwords.hash_password("password123") for _ in range(count)))
+
+
+async def drive(usernames, concurrency, total):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        next_request = iter(range(total))
+        latencies = []
+
+        async def worker():
+            for i in next_request:
+                start = time.perf_counter()
+                response = await http.post("/login", json={"username": usernames[i % len(usernames)], "password": "password123"})
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    stub = StubSupabase(latency=args.latency)
+    seed_squad(stub, "squad", args.requests)
+    # Distinct salts per user, so the verified-hash cache can't share entries
+    stored = asyncio.run(hash_all(len(stub.tables["users"])))
+    for user, password_hash in zip(stub.tables["users"], stored):
+        user["password"] = password_hash
+    usernames = [user["username"] for user in stub.tables["users"]]
+    main.supabase = stub
+    run_scrypt = passwords._run_scrypt
+
+    print(f"scrypt n={passwords.PASSWORD_SCRYPT_N} r={passwords.PASSWORD_SCRYPT_R} p={passwords.PASSWORD_SCRYPT_P}, "
+          f"{passwords.PASSWORD_HASH_WORKERS} workers")
+    print(f"{'mode':>8} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ("inline", "thread", "process", "cached"):
+        passwords.verified_cache = LRUCache(ttl=passwords.PASSWORD_CACHE_TTL)
+        if passwords._executor is not None:
+            passwords._executor.shutdown()
+            passwords._executor = None
+        passwords._run_scrypt = inline_scrypt if mode == "inline" else run_scrypt
+        passwords.PASSWORD_HASH_EXECUTOR = "thread" if mode == "thread" else "process"
+        names = usernames
+        if mode == "cached":
+            names = usernames[:args.concurrency]
+            asyncio.run(drive(names, args.concurrency, len(names)))
+        throughput, p50, p99 = asyncio.run(drive(names, args.concurrency, args.requests))
+        print(f"{mode:>8} {throughput:>9.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
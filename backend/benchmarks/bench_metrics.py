@@ -0,0 +1,79 @@
+"""
+Benchmark what the metrics instrumentation adds to each request.
+
+- middleware: a minimal ASGI app answering 200, called bare and wrapped in
+  MetricsMiddleware; the difference is the per-request overhead
+- record_query: the cost db.execute() adds per round trip
+- render: producing /metrics once every route has been seen
+
+Run from the backend directory:
+    python benchmarks/bench_metrics.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import metrics
+from benchmarks.stub_supabase import StubSupabase
+
+BODY = b'{"message":"ok","data":null}'
+
+
+async def plain_app(scope, receive, send):
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def call(app, requests):
+    scope = {"type": "http", "method": "GET", "path": "/users/1", "headers": []}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(call(plain_app, args.requests))
+    wrapped = asyncio.run(call(metrics.MetricsMiddleware(plain_app), args.requests))
+    print(f"{'bare app':>14} {bare * 1e6:>8.2f} us/request")
+    print(f"{'with metrics':>14} {wrapped * 1e6:>8.2f} us/request   (+{(wrapped - bare) * 1e6:.2f} us)")
+
+    query = StubSupabase().table("users").select("id").eq("id", "1")
+    metrics.current_request.set(metrics.RequestMetrics())
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        metrics.record_query(query, 0.001)
+    print(f"{'record_query':>14} {(time.perf_counter() - start) / args.requests * 1e6:>8.2f} us/round trip")
+
+    # One series per route and method, as after serving every endpoint
+    for route in main.app.routes:
+        for method in getattr(route, "methods", None) or ():
+            labels = (method, route.path)
+            metrics.REQUESTS.inc(labels + ("200",))
+            for histogram in (metrics.REQUEST_DURATION, metrics.REQUEST_ROUND_TRIPS, metrics.REQUEST_SIZE, metrics.RESPONSE_SIZE):
+                histogram.observe(labels, 1)
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"{'render':>14} {(time.perf_counter() - start) * 1000:>8.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main_benchmark()
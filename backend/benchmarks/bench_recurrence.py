@@ -0,0 +1,110 @@
+"""
+Benchmark reading a calendar view of recurring care sessions.
+
+A squad has --rules rules (a mix of daily and weekly ones with BYDAY) that
+started --years years ago and never end. Modes:
+- eager:        expand every occurrence from each rule's start to a year
+                ahead (what storing every occurrence amounts to), then filter
+- lazy:         expand_care_rules() for just the requested window
+- materialized: fetch_recurring_sessions() answering from the cached
+                next-RECURRENCE_WINDOW_WEEKS window
+
+Views are this week (inside the materialized window) and a month two years
+back (outside it, so materialized falls back to lazy expansion).
+
+Run from the backend directory:
+    python benchmarks/bench_recurrence.py
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from cache import LRUCache
+from care_sessions import to_utc
+from benchmarks.stub_supabase import StubSupabase
+
+RULES = ("FREQ=DAILY", "FREQ=WEEKLY;BYDAY=MO,WE,FR", "FREQ=WEEKLY;INTERVAL=2;BYDAY=SA", "FREQ=DAILY;INTERVAL=3")
+
+
+def make_rules(count, years, rng):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        {
+            "id": f"rule-{i}",
+            "squad_id": "squad",
+            "caretaker_id": None,
+            "rrule": RULES[i % len(RULES)],
+            "starts_at": (today - timedelta(days=365 * years) + timedelta(hours=rng.randint(0, 23))).isoformat(),
+            "duration_minutes": rng.choice([60, 120, 240]),
+            "notes": None,
+        }
+        for i in range(count)
+    ]
+
+
+def eager(rules, start, end):
+    horizon = datetime.utcnow() + timedelta(days=365)
+    occurrences = list(main.expand_care_rules(rules, [], to_utc(min(rule["starts_at"] for rule in rules)), horizon))
+    return [s for s in occurrences if to_utc(s["starts_at"]) < end and to_utc(s["ends_at"]) > start], len(occurrences)
+
+
+def lazy(rules, start, end):
+    return list(main.expand_care_rules(rules, [], start, end))
+
+
+def materialized(start, end, repeat=1):
+    async def run():
+        for _ in range(repeat):
+            sessions = await main.fetch_recurring_sessions("squad", start, end)
+        return sessions
+    return asyncio.run(run())
+
+
+def measure(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rules = make_rules(args.rules, args.years, random.Random(0))
+    stub = StubSupabase()
+    stub.tables["care_session_rules"] = rules
+    main.supabase = stub
+    main.cache = LRUCache()
+
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    views = {
+        "this week": (today, today + timedelta(days=7)),
+        "old month": (today - timedelta(days=730), today - timedelta(days=700)),
+    }
+    print(f"{args.rules} rules started {args.years} years ago")
+    print(f"{'view':>10} {'mode':>13} {'ms':>9} {'sessions':>9} {'expanded':>9}")
+    for view, (start, end) in views.items():
+        materialized(start, end)  # warm the cache
+        seconds, (sessions, expanded) = measure(lambda: eager(rules, start, end), max(1, args.repeat // 10))
+        print(f"{view:>10} {'eager':>13} {seconds * 1000:>9.3f} {len(sessions):>9} {expanded:>9}")
+        seconds, sessions = measure(lambda: lazy(rules, start, end), args.repeat)
+        print(f"{view:>10} {'lazy':>13} {seconds * 1000:>9.3f} {len(sessions):>9} {len(sessions):>9}")
+        # One event loop for all repetitions, so loop startup isn't timed
+        seconds, sessions = measure(lambda: materialized(start, end, args.repeat), 1)
+        seconds /= args.repeat
+        print(f"{view:>10} {'materialized':>13} {seconds * 1000:>9.3f} {len(sessions):>9} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,127 @@
+"""
+Benchmark GET /users/{id} against a faulty database, with and without the
+deadlines, retries, hedging and circuit breaker of resilience.py.
+
+Runs the real PostgREST client (db.create_client) against a local stub
+PostgREST server that adds --latency seconds to every round trip and
+injects one kind of fault per scenario:
+
+- flaky: --fault-rate of round trips answer 503. "off" sends each read
+  once, "on" retries it up to DB_READ_RETRIES times with jittered backoff.
+- slow-tail: --spike-rate of round trips take --spike-latency seconds.
+  "on" hedges reads still unanswered after --hedge-after seconds.
+- outage: every round trip hangs until the HTTP timeout. The cache was
+  warmed beforehand and has since expired. "off" waits out the --deadline
+  on every request and answers 503; "on" opens the circuit breaker after
+  DB_BREAKER_FAILURES failures, after which requests fail fast and are
+  answered from the expired cache entries.
+
+Reports the share of requests that did not answer 200, p50/p99 latency,
+throughput and database round trips per request. Requests are served on one
+process, so when it is CPU bound p50 tracks throughput: a fault that parks
+workers (slow-tail "off") can lower p50 along with req/s.
+
+Run from the backend directory:
+    python benchmarks/bench_resilience.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import db
+import main
+import resilience
+from cache import LRUCache
+from benchmarks.stub_postgrest import StubPostgrestServer
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+async def drive(concurrency, total, user_ids):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        next_request = iter(range(total))
+        latencies = []
+        failures = 0
+
+        async def worker():
+            nonlocal failures
+            for i in next_request:
+                start = time.perf_counter()
+                response = await http.get(f"/users/{user_ids[i % len(user_ids)]}")
+                latencies.append(time.perf_counter() - start)
+                failures += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        throughput = total / (time.perf_counter() - start)
+    latencies.sort()
+    p50, p99 = (latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 for p in (0.5, 0.99))
+    return failures / total, p50, p99, throughput
+
+
+def configure(resilient, args):
+    db.DB_DEADLINE = args.deadline
+    db.DB_READ_RETRIES = resilience.DB_READ_RETRIES if resilient else 0
+    db.DB_HEDGE_AFTER = args.hedge_after if resilient else 0
+    db.breaker = resilience.CircuitBreaker(failures=resilience.DB_BREAKER_FAILURES if resilient else 0)
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--fault-rate", type=float, default=0.1)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--spike-latency", type=float, default=0.5)
+    parser.add_argument("--hedge-after", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    args = parser.parse_args()
+
+    stub = StubSupabase(latency=args.latency)
+    user_ids = seed_squad(stub, "squad", 200)
+    # The HTTP timeout follows the deadline, as it does by default
+    db.DB_TIMEOUT = args.deadline
+    faults = {
+        "flaky": {"fault_rate": args.fault_rate},
+        "slow-tail": {"spike_rate": args.spike_rate, "spike_latency": args.spike_latency},
+        "outage": {"fault_rate": 1.0, "spike_rate": 1.0, "spike_latency": args.deadline * 3},
+    }
+
+    with StubPostgrestServer(stub) as server:
+        main.supabase = db.create_client(server.url, "stub-key")
+
+        print(f"{'scenario':>10} {'resilience':>10} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>7} {'trips/req':>10}")
+        for scenario, fault in faults.items():
+            for resilient in (False, True):
+                configure(resilient, args)
+                stub.fault_rate = stub.spike_rate = stub.spike_latency = 0.0
+                stub.random.seed(0)
+                if scenario == "outage":
+                    # Warm the cache while the database is up, then let it expire
+                    main.cache = LRUCache(ttl=0.1, stale_ttl=600 if resilient else 0)
+                    asyncio.run(drive(args.concurrency, len(user_ids), user_ids))
+                    time.sleep(0.2)
+                    requests = len(user_ids)
+                else:
+                    # Measure the round trips themselves, not the read-through cache
+                    main.cache = LRUCache(maxsize=0)
+                    requests = args.requests
+                for name, value in fault.items():
+                    setattr(stub, name, value)
+
+                trips = stub.round_trips
+                errors, p50, p99, throughput = asyncio.run(drive(args.concurrency, requests, user_ids))
+                trips = (stub.round_trips - trips) / requests
+                mode = "on" if resilient else "off"
+                print(f"{scenario:>10} {mode:>10} {errors:>7.1%} {p50:>8.1f} {p99:>8.1f} {throughput:>7.1f} {trips:>10.2f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,128 @@
+"""
+Benchmark care totals from precomputed rollups against recomputing them from
+the completed sessions.
+
+Read path, for one user with N completed sessions across 3 squads:
+- rollups:   GET /users/{user_id}/stats (a membership query plus one lookup
+             of the rollup rows by id)
+- recompute: read every completion of the user, PAGE_SIZE per round trip,
+             and sum them
+
+Write path: completing a session through the record_care_completion function
+(one round trip) and through the fallback without it.
+
+Rebuild: rollups.fold() over all completions, and the whole nightly
+rebuild_rollups() against the stub up to --rebuild-max sessions (the stub
+scans its table on every page, so it stops being representative beyond).
+
+Run from the backend directory:
+    python benchmarks/bench_rollups.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+import rollups
+from cache import LRUCache
+from memberships import MembershipIndex
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+SQUADS = ("squad-a", "squad-b", "squad-c")
+
+
+def seed(stub, completions):
+    user_ids = [seed_squad(stub, squad_id, 2)[0] for squad_id in SQUADS]
+    user_id = user_ids[0]
+    for squad_id in SQUADS[1:]:
+        stub.tables["user_squad_memberships"].append({"id": f"{squad_id}-extra", "user_id": user_id, "squad_id": squad_id})
+    start = datetime.utcnow() - timedelta(days=completions // 2)
+    rows = stub.tables.setdefault("care_session_completions", [])
+    for i in range(completions):
+        starts_at = start + timedelta(hours=12 * i)
+        rows.append({
+            "id": f"completion-{i:08d}",
+            "session_id": f"session-{i}",
+            "squad_id": SQUADS[i % len(SQUADS)],
+            "user_id": user_id,
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=3)).isoformat(),
+            "hours": 3.0,
+            "completed_at": starts_at.isoformat(),
+        })
+    return user_id
+
+
+async def recompute(user_id, weeks=8):
+    completions = await main.fetch_all_rows(
+        "care_session_completions", "id, user_id, squad_id, starts_at, hours", [("user_id", user_id)]
+    )
+    rows = rollups.fold(completions)
+    periods = main.recent_weeks(weeks)
+    scope = rollups.user_scope(user_id)
+    return rows.get(rollups.rollup_id(scope)), [rows.get(rollups.rollup_id(scope, period)) for period in periods]
+
+
+def timed(stub, function):
+    trips = stub.round_trips
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, stub.round_trips - trips, result
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--rebuild-max", type=int, default=10000)
+    args = parser.parse_args()
+    main.cache = LRUCache(maxsize=0)
+
+    print(f"{'sessions':>9} {'path':>16} {'ms':>9} {'trips':>6}")
+    for size in args.sizes:
+        stub = StubSupabase()
+        user_id = seed(stub, size)
+        main.supabase = stub
+        main.membership_index = MembershipIndex()
+        asyncio.run(main.rebuild_rollups())
+        asyncio.run(main.fetch_user_squad_ids(user_id))
+        stub.latency = args.latency
+        http = TestClient(main.app)
+        http.get("/health")
+
+        seconds, trips, response = timed(stub, lambda: http.get(f"/users/{user_id}/stats"))
+        total = response.json()["data"]["total"]
+        print(f"{size:>9} {'read rollups':>16} {seconds * 1000:>9.1f} {trips:>6}")
+        seconds, trips, (recomputed, _) = timed(stub, lambda: asyncio.run(recompute(user_id)))
+        assert recomputed["sessions"] == total["sessions"] == size
+        print(f"{size:>9} {'read recompute':>16} {seconds * 1000:>9.1f} {trips:>6}")
+
+        stub.latency = 0
+        completions = stub.tables["care_session_completions"]
+        seconds, _, rows = timed(stub, lambda: rollups.fold(completions))
+        print(f"{size:>9} {'fold':>16} {seconds * 1000:>9.1f} {0:>6}   {size / seconds:,.0f} sessions/s, {len(rows)} rows")
+        if size <= args.rebuild_max:
+            seconds, trips, _ = timed(stub, lambda: asyncio.run(main.rebuild_rollups()))
+            print(f"{size:>9} {'rebuild':>16} {seconds * 1000:>9.1f} {trips:>6}")
+
+    stub.latency = args.latency
+    for mode in ("rpc", "fallback"):
+        main.completion_rpc_available = mode == "rpc"
+        completion = {
+            "id": f"bench-{mode}", "session_id": f"bench-{mode}", "squad_id": SQUADS[0], "user_id": user_id,
+            "starts_at": datetime.utcnow().isoformat(), "ends_at": datetime.utcnow().isoformat(),
+            "hours": 1.0, "completed_at": datetime.utcnow().isoformat(),
+        }
+        seconds, trips, _ = timed(stub, lambda: asyncio.run(main.record_care_completion(completion)))
+        print(f"{'-':>9} {'complete ' + mode:>16} {seconds * 1000:>9.1f} {trips:>6}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,124 @@
+"""
+Benchmark rendering JSON responses with the standard library versus orjson
+(responses.JSONResponse), and what validating them against their response
+models (schemas.py) would cost.
+
+Two parts, both on a squad of --rows members, i.e. --rows users and
+memberships:
+
+- render: the time to turn the /users and /squad-memberships bodies into
+  bytes, best of --repeat runs. "stdlib" is Starlette's JSONResponse, as
+  before; "orjson" is responses.JSONResponse; "pydantic" validates the body
+  against the route's model and dumps it, which is what FastAPI does with a
+  returned dict; "orjson+check" renders with orjson and then validates the
+  bytes, as RESPONSE_VALIDATION does.
+- requests: CPU seconds per request (time.process_time) for GET
+  /squad-memberships/{squad_id}/members served end to end through the ASGI
+  app, with each response class and with RESPONSE_VALIDATION's middleware.
+  The members are answered from the cache, so this is the server's own
+  work; /users and /squad-memberships would mostly time the stub database
+  filtering --rows rows in Python on every request.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+import main
+import responses
+import schemas
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+def best_of(repeat, function):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_render(stub, args):
+    users = [{field: user[field] for field in main.USER_FIELDS} for user in stub.tables["users"]]
+    bodies = {
+        "users": (schemas.Page[schemas.User], {"message": "Users fetched successfully", "data": users}),
+        "memberships": (schemas.Page[schemas.Membership], {"message": "Squad memberships fetched successfully", "data": stub.tables["user_squad_memberships"]}),
+    }
+    stdlib, fast = StarletteJSONResponse(None), responses.JSONResponse(None)
+
+    print(f"{'body':>12} {'renderer':>13} {'ms':>8} {'bytes':>9}")
+    for name, (model, body) in bodies.items():
+        adapter = TypeAdapter(model)
+        renderers = {
+            "stdlib": lambda: stdlib.render(body),
+            "orjson": lambda: fast.render(body),
+            "pydantic": lambda: adapter.dump_json(adapter.validate_python(body)),
+            "orjson+check": lambda: adapter.validate_json(fast.render(body)),
+        }
+        size = len(fast.render(body))
+        for renderer, function in renderers.items():
+            seconds = best_of(args.repeat, function)
+            print(f"{name:>12} {renderer:>13} {seconds * 1000:>8.2f} {size:>9}")
+
+
+async def serve(app, path, count):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        # The first request warms the cache and builds the validators
+        assert (await http.get(path)).status_code == 200
+        start = time.process_time()
+        for _ in range(count):
+            response = await http.get(path)
+            assert response.status_code == 200, response.text
+        return (time.process_time() - start) / count
+
+
+def bench_requests(args):
+    modes = {
+        "stdlib": (StarletteJSONResponse.render, False),
+        "orjson": (responses.JSONResponse.render, False),
+        "orjson+check": (responses.JSONResponse.render, True),
+    }
+    render = responses.JSONResponse.render
+
+    print(f"\n{'response':>13} {'cpu ms/req':>11}")
+    try:
+        for mode, (mode_render, validate) in modes.items():
+            responses.JSONResponse.render = mode_render
+            main.cache = LRUCache()
+            app = responses.ResponseValidationMiddleware(main.app) if validate else main.app
+            seconds = asyncio.run(serve(app, "/squad-memberships/squad/members", args.requests))
+            print(f"{mode:>13} {seconds * 1000:>11.2f}")
+    finally:
+        responses.JSONResponse.render = render
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = StubSupabase()
+    seed_squad(stub, "squad", args.rows)
+    main.supabase = stub
+
+    bench_render(stub, args)
+    bench_requests(args)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,83 @@
+"""
+Benchmark a thundering herd of identical reads, with and without
+single-flight (see singleflight.py and db.execute()).
+
+--clients requests for the same resource arrive at once on a cold cache, as
+when a whole family opens the squad page together or every open tab
+refreshes after an event:
+
+- members: GET /squad-memberships/{squad_id}/members
+- squads:  GET /squads
+- user:    GET /users/{user_id}
+
+Every request misses the cache, so without single-flight each one sends its
+own queries; with it, the requests share one round trip per distinct query.
+Reports database round trips and p50/p99 latency per run. The in-memory
+StubSupabase waits --latency seconds per round trip on the database thread
+pool, so unshared reads also queue for DB_MAX_WORKERS threads.
+
+Run from the backend directory:
+    python benchmarks/bench_single_flight.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import db
+import main
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+async def herd(path, clients):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def request():
+            start = time.perf_counter()
+            response = await http.get(path)
+            assert response.status_code == 200, response.text
+            return time.perf_counter() - start
+
+        latencies = sorted(await asyncio.gather(*(request() for _ in range(clients))))
+    return [latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 for p in (0.5, 0.99)]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--members", type=int, default=8)
+    args = parser.parse_args()
+
+    stub = StubSupabase(latency=args.latency)
+    user_ids = seed_squad(stub, "squad", args.members)
+    main.supabase = stub
+    paths = {
+        "members": "/squad-memberships/squad/members",
+        "squads": "/squads",
+        "user": f"/users/{user_ids[0]}",
+    }
+
+    print(f"{'endpoint':>8} {'clients':>8} {'single-flight':>14} {'trips':>6} {'shared':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, path in paths.items():
+        for clients in args.clients:
+            for single_flight in (False, True):
+                db.DB_SINGLE_FLIGHT = single_flight
+                main.cache = LRUCache()
+                shared = db.reads_in_flight.shared
+                trips = stub.round_trips
+                p50, p99 = asyncio.run(herd(path, clients))
+                trips = stub.round_trips - trips
+                shared = db.reads_in_flight.shared - shared
+                mode = "on" if single_flight else "off"
+                print(f"{name:>8} {clients:>8} {mode:>14} {trips:>6} {shared:>7} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
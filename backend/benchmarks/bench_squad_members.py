@@ -0,0 +1,76 @@
+"""
+Benchmark GET /squad-memberships/{squad_id}/members as the squad grows.
+
+Each round trip to the stub backend costs --latency seconds, so the endpoint
+should stay flat (two round trips) regardless of squad size, while the old
+per-membership lookup grows linearly.
+
+Run from the backend directory:
+    python benchmarks/bench_squad_members.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+from cache import LRUCache
+from benchmarks.stub_supabase import StubSupabase, seed_squad
+
+
+def per_membership_lookup(client, squad_id):
+    """The previous implementation: one users query per membership row."""
+    memberships = client.table("user_squad_memberships").select("*").eq("squad_id", squad_id).execute().data
+    for membership in memberships:
+        user = client.table("users").select("id, nameFirst, nameLast").eq("id", membership["user_id"]).execute()
+        if user.data:
+            membership["user"] = user.data[0]
+    return memberships
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated round trip in seconds")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 30, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'trips':>6} {'hydrated ms':>12} {'old trips':>10} {'old ms':>8}")
+    for size in args.sizes:
+        stub = StubSupabase(latency=args.latency)
+        main.supabase = stub
+        # Measure the round trips themselves, not the read-through cache
+        main.cache = LRUCache(maxsize=0)
+        seed_squad(stub, "squad", size)
+        http = TestClient(main.app)
+
+        timings = []
+        for _ in range(args.repeat):
+            stub.round_trips = 0
+            start = time.perf_counter()
+            response = http.get("/squad-memberships/squad/members")
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200 and len(response.json()["data"]) == size
+        trips = stub.round_trips
+
+        old_timings = []
+        for _ in range(args.repeat):
+            stub.round_trips = 0
+            start = time.perf_counter()
+            per_membership_lookup(stub, "squad")
+            old_timings.append(time.perf_counter() - start)
+        old_trips = stub.round_trips
+
+        print(
+            f"{size:>8} {trips:>6} {statistics.median(timings) * 1000:>12.1f} "
+            f"{old_trips:>10} {statistics.median(old_timings) * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,63 @@
+"""
+Benchmark the per-request cost of TokenMiddleware.
+
+Calls the middleware directly around a no-op ASGI app, so the numbers are
+the middleware's own overhead: no header, a valid access token, and a
+tampered token. A client reuses its token, so after the first request the
+valid case is served from the verified-token cache; the tampered case always
+pays the full signature check. For scale, the last row is one users-table round trip at
+--latency, which is what an identity check against Supabase would cost.
+
+Run from the backend directory:
+    python benchmarks/bench_token_middleware.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tokens
+
+
+async def noop_app(scope, receive, send):
+    pass
+
+
+async def discard(message):
+    pass
+
+
+async def measure(middleware, headers, iterations):
+    scope = {"type": "http", "method": "GET", "path": "/squads", "headers": headers}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await middleware(dict(scope), None, discard)
+    return (time.perf_counter() - start) / iterations
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Supabase round trip in seconds")
+    args = parser.parse_args()
+
+    middleware = tokens.TokenMiddleware(noop_app)
+    token = tokens.issue_token("550e8400-e29b-41d4-a716-446655440000", "access", 900)
+    cases = [
+        ("no token", []),
+        ("valid token", [(b"authorization", f"Bearer {token}".encode())]),
+        ("bad signature", [(b"authorization", f"Bearer {token[:-4]}AAAA".encode())]),
+    ]
+
+    print(f"{'case':>15} {'us/request':>11}")
+    for name, headers in cases:
+        per_request = asyncio.run(measure(middleware, headers, args.iterations))
+        print(f"{name:>15} {per_request * 1e6:>11.1f}")
+    print(f"{'db lookup':>15} {args.latency * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
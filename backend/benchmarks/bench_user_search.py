@@ -0,0 +1,81 @@
+"""
+Benchmark the in-process user search index at a large user count.
+
+Builds a UserSearchIndex over --users synthetic users, then times prefix,
+substring, multi-word and miss queries, plus incremental add() as done by
+create_user.
+
+Run from the backend directory:
+    python benchmarks/bench_user_search.py --users 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import UserSearchIndex
+
+SYLLABLES = ["an", "ber", "cor", "da", "el", "fi", "gra", "han", "is", "jo", "ka", "li",
+             "mar", "no", "ol", "pe", "qui", "ro", "sa", "ti", "ul", "vi", "wen", "xa", "yo", "zo"]
+
+QUERIES = ["jo", "mar", "ann", "sati", "roel", "jo ka", "zzzz", "e"]
+
+
+def make_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_users(count, seed=7):
+    rng = random.Random(seed)
+    first_names = [make_name(rng) for _ in range(20000)]
+    last_names = [make_name(rng) for _ in range(50000)]
+    return [
+        {"id": f"user-{i}", "nameFirst": rng.choice(first_names), "nameLast": rng.choice(last_names)}
+        for i in range(count)
+    ]
+
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    users = make_users(args.users)
+    index = UserSearchIndex()
+    start = time.perf_counter()
+    index.load(users)
+    print(f"loaded {len(index)} users in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'query':>8} {'hits':>5} {'p50 us':>8} {'p99 us':>8}")
+    for query in QUERIES:
+        hits = len(index.search(query, args.limit))
+        p50, p99 = time_calls(lambda: index.search(query, args.limit), args.repeat)
+        print(f"{query!r:>8} {hits:>5} {p50 * 1e6:>8.1f} {p99 * 1e6:>8.1f}")
+
+    counter = iter(range(args.repeat * 10))
+    rng = random.Random(11)
+    p50, p99 = time_calls(
+        lambda: index.add({"id": f"new-{next(counter)}", "nameFirst": make_name(rng), "nameLast": make_name(rng)}),
+        args.repeat,
+    )
+    print(f"{'add()':>8} {'':>5} {p50 * 1e6:>8.1f} {p99 * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
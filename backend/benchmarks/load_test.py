@@ -0,0 +1,278 @@
+"""
+Load test the app end to end with the requests real pages make.
+
+Runs the real FastAPI app in-process (httpx's ASGI transport) against the
+in-memory StubSupabase, seeded deterministically from --seed with --users
+users in --squads squads. Every round trip waits --latency seconds on the
+database thread pool, like a call to Supabase would. With --backend
+postgrest, the real PostgREST client (db.create_client) talks HTTP to StubPostgrestServer
+instead, so its connection pool and serialization are measured as well.
+
+Scenarios; one iteration is one page load or interaction:
+- login:     POST /login (scrypt verification, distinct salt per user)
+- dashboard: GET /dashboard/{user_id}, as Dashboard.tsx does
+- squad:     GET /squad-memberships/{squad_id}/members and
+             GET /squads/{squad_id}/caretaker, as Squad.tsx does on load
+- search:    GET /users/search?q= for every prefix of a name typed into
+             the add-people box
+
+--concurrency clients run each scenario for --iterations iterations after
+--warmup unmeasured ones, starting from empty caches. Reports iterations/s,
+p50/p99 latency per iteration, requests, DB round trips and response body
+bytes per iteration and CPU time per iteration (this process only, so not scrypt), each the
+median of --repeat runs. Round trips and CPU time vary least from run to
+run; latency and throughput depend on what else the machine is doing.
+
+To compare commits, save a run with --json and pass it to --compare on the
+next one; runs are only comparable with the same parameters.
+
+Run from the backend directory:
+    python benchmarks/load_test.py --json before.json
+    python benchmarks/load_test.py --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import db
+import main
+import passwords
+from cache import LRUCache
+from memberships import MembershipIndex
+from search import UserSearchIndex
+from benchmarks.stub_postgrest import StubPostgrestServer
+from benchmarks.stub_supabase import StubSupabase
+
+FIRST_NAMES = ("Ada", "Bea", "Carl", "Dana", "Eli", "Fay", "Gus", "Hana", "Ivan", "June",
+               "Kai", "Lena", "Milo", "Nora", "Otto", "Pia", "Quinn", "Rosa", "Sam", "Tess")
+LAST_NAMES = ("Abbott", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Hughes", "Ito", "Jones",
+              "Kim", "Lopez", "Moore", "Nguyen", "Okafor", "Patel", "Quist", "Rossi", "Silva", "Tanaka")
+
+SCENARIOS = ("login", "dashboard", "squad", "search")
+
+
+def seed(stub, args, rng):
+    users = [
+        {
+            "id": f"user-{i:06d}",
+            "username": f"user{i}",
+            "password": "password123",
+            "nameFirst": rng.choice(FIRST_NAMES),
+            "nameLast": rng.choice(LAST_NAMES),
+            "email": f"user{i}@example.com",
+            "phoneNumber": "123-456-7890",
+            "hours": rng.randint(0, 200),
+            "sessions": rng.randint(0, 40),
+        }
+        for i in range(args.users)
+    ]
+    squads = [{"id": f"squad-{i:05d}", "name": f"Squad {i}", "nameMom": rng.choice(FIRST_NAMES)} for i in range(args.squads)]
+    memberships, assignments = [], []
+    for squad in squads:
+        members = rng.sample(users, min(len(users), rng.randint(2, 2 * args.squad_size - 2)))
+        for j, user in enumerate(members):
+            memberships.append({
+                "id": f"membership-{len(memberships):07d}",
+                "user_id": user["id"],
+                "squad_id": squad["id"],
+                "primary": j == 0,
+                "joined_at": "2024-01-15T10:30:00",
+            })
+        assignments.append({
+            "id": f"assignment-{len(assignments):05d}",
+            "squad_id": squad["id"],
+            "user_id": members[0]["id"],
+            "assigned_on": "2024-01-15",
+            "assigned_at": "2024-01-15T10:30:00",
+            "probability": round(1 / len(members), 4),
+        })
+    stub.tables.update({
+        "users": users,
+        "squad": squads,
+        "user_squad_memberships": memberships,
+        "caretaker_assignments": assignments,
+    })
+
+    # Only the users that log in need real hashes; distinct salts keep the
+    # verified-hash cache from answering for each other
+    login_users = rng.sample(users, min(len(users), args.login_users))
+
+    async def hash_all():
+        return await asyncio.gather(*(passwords.hash_password("password123") for _ in login_users))
+    for user, password_hash in zip(login_users, asyncio.run(hash_all())):
+        user["password"] = password_hash
+    return login_users
+
+
+def plan(scenario, data, rng):
+    """The requests of one iteration: a list of steps, each sent concurrently."""
+    users, squads, login_users = data
+    if scenario == "login":
+        user = rng.choice(login_users)
+        return [[("POST", "/login", {"username": user["username"], "password": "password123"})]]
+    if scenario == "dashboard":
+        return [[("GET", f"/dashboard/{rng.choice(users)['id']}", None)]]
+    if scenario == "squad":
+        squad_id = rng.choice(squads)["id"]
+        return [[("GET", f"/squad-memberships/{squad_id}/members", None), ("GET", f"/squads/{squad_id}/caretaker", None)]]
+    name = rng.choice(users)["nameFirst"]
+    return [[("GET", f"/users/search?q={name[:length]}", None)] for length in range(1, len(name) + 1)]
+
+
+async def run_scenario(scenario, data, stub, args):
+    rng = random.Random(f"{args.seed}-{scenario}")
+    plans = [plan(scenario, data, rng) for _ in range(args.warmup + args.iterations)]
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        received = 0
+
+        async def send(method, path, body):
+            nonlocal received
+            response = await http.request(method, path, json=body)
+            assert response.status_code < 400, f"{method} {path}: {response.status_code} {response.text}"
+            received += len(response.content)
+
+        async def iterate(steps):
+            start = time.perf_counter()
+            for step in steps:
+                await asyncio.gather(*(send(*request) for request in step))
+            return time.perf_counter() - start
+
+        async def clients(iterations):
+            pending = iter(iterations)
+            latencies = []
+
+            async def client():
+                for steps in pending:
+                    latencies.append(await iterate(steps))
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+            return latencies
+
+        await clients(plans[:args.warmup])
+        trips = stub.round_trips
+        received = 0
+        cpu = time.process_time()
+        start = time.perf_counter()
+        latencies = await clients(plans[args.warmup:])
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        trips = stub.round_trips - trips
+
+    latencies.sort()
+    measured = plans[args.warmup:]
+    return {
+        "iterations_per_second": round(len(measured) / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "requests_per_iteration": round(sum(len(step) for steps in measured for step in steps) / len(measured), 2),
+        "round_trips_per_iteration": round(trips / len(measured), 2),
+        "response_bytes_per_iteration": round(received / len(measured)),
+        "cpu_ms_per_iteration": round(cpu / len(measured) * 1000, 2),
+    }
+
+
+def median_result(runs):
+    """Each metric's median over repeated runs, which damps a noisy host."""
+    return {metric: sorted(run[metric] for run in runs)[len(runs) // 2] for metric in runs[0]}
+
+
+def reset_caches():
+    main.cache = LRUCache()
+    main.user_search_index = UserSearchIndex()
+    main.membership_index = MembershipIndex()
+    passwords.verified_cache = LRUCache(ttl=passwords.PASSWORD_CACHE_TTL)
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(baseline, results):
+    if baseline["params"] != results["params"]:
+        print("warning: the baseline was run with different parameters")
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'}")
+    print(f"{'scenario':>10} {'metric':>26} {'before':>9} {'after':>9} {'change':>8}")
+    for scenario, after in results["results"].items():
+        before = baseline["results"].get(scenario)
+        if before is None:
+            continue
+        for metric, value in after.items():
+            if metric not in before:
+                continue
+            change = f"{(value - before[metric]) / before[metric] * 100:+.1f}%" if before[metric] else "-"
+            print(f"{scenario:>10} {metric:>26} {before[metric]:>9} {value:>9} {change:>8}")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--backend", choices=("stub", "postgrest"), default="stub")
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated round trip in seconds")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--squads", type=int, default=500)
+    parser.add_argument("--squad-size", type=int, default=6, help="average members per squad")
+    parser.add_argument("--login-users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    args = parser.parse_args()
+    params = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+
+    stub = StubSupabase()
+    login_users = seed(stub, args, random.Random(args.seed))
+    data = (stub.tables["users"], stub.tables["squad"], login_users)
+    stub.latency = args.latency
+
+    results = {
+        "commit": commit_id(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": {},
+    }
+    with StubPostgrestServer(stub) if args.backend == "postgrest" else contextlib.nullcontext() as server:
+        if server is not None:
+            main.supabase = db.create_client(server.url, "stub-key")
+        else:
+            main.supabase = stub
+
+        print(f"{args.backend} backend, {args.latency * 1000:g} ms per round trip, {args.users} users, "
+              f"{args.squads} squads, concurrency {args.concurrency}")
+        print(f"{'scenario':>10} {'iter/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/iter':>9} {'trips/iter':>11} {'bytes/iter':>11} {'cpu ms/iter':>12}")
+        for scenario in args.scenarios:
+            runs = []
+            for _ in range(args.repeat):
+                reset_caches()
+                runs.append(asyncio.run(run_scenario(scenario, data, stub, args)))
+            result = results["results"][scenario] = median_result(runs)
+            print(f"{scenario:>10} {result['iterations_per_second']:>9} {result['p50_ms']:>9} {result['p99_ms']:>9} "
+                  f"{result['requests_per_iteration']:>9} {result['round_trips_per_iteration']:>11} "
+                  f"{result['response_bytes_per_iteration']:>11} {result['cpu_ms_per_iteration']:>12}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,158 @@
+"""
+Local HTTP stand-in for Supabase's PostgREST endpoint.
+
+Serves /rest/v1/<table> over real HTTP so the real PostgREST client (and
+its connection pool) can be benchmarked without a Supabase project. Requests
+are translated into StubQuery calls on a StubSupabase instance, which applies
+its configured latency in the server thread handling the request. Injected
+faults are answered with a plain-text 503, as Supabase's gateway does.
+
+    stub = StubSupabase(latency=0.01)
+    with StubPostgrestServer(stub) as server:
+        client = db.create_client(server.url, "stub-key")
+"""
+import functools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from postgrest.exceptions import APIError
+
+from benchmarks.stub_supabase import InjectedFault
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or"}
+
+
+def _split_list(value):
+    """Parse a PostgREST list literal such as (a,"b c",d)."""
+    value = value.strip()[1:-1]
+    return [item.strip().strip('"') for item in value.split(",") if item.strip()]
+
+
+def apply_params(query, params):
+    """Apply PostgREST query-string parameters to a StubQuery."""
+    for column, value in params:
+        if column in RESERVED_PARAMS:
+            continue
+        operator, _, operand = value.partition(".")
+        if operator == "eq":
+            query.eq(column, operand)
+        elif operator == "gt":
+            query.gt(column, operand)
+        elif operator == "in":
+            query.in_(column, _split_list(operand))
+    params = dict(params)
+    if "or" in params:
+        query.or_(params["or"][1:-1])
+    if "order" in params:
+        column, _, direction = params["order"].partition(".")
+        query.order(column, desc=direction.startswith("desc"))
+    if "limit" in params:
+        offset = int(params.get("offset", 0))
+        query.range(offset, offset + int(params["limit"]) - 1)
+    return query
+
+
+def _injected_faults(handler):
+    @functools.wraps(handler)
+    def wrapper(self):
+        try:
+            handler(self)
+        except InjectedFault:
+            body = b"Service Unavailable"
+            self.send_response(503)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    return wrapper
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one write so keep-alive requests don't stall
+    # on delayed ACKs
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _table_and_params(self):
+        parts = urlsplit(self.path)
+        table = parts.path.rstrip("/").rsplit("/", 1)[-1]
+        return table, parse_qsl(parts.query, keep_blank_values=True)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    @_injected_faults
+    def do_GET(self):
+        table, params = self._table_and_params()
+        query = self.server.stub.table(table).select(dict(params).get("select", "*"))
+        self._send(200, apply_params(query, params).execute().data)
+
+    @_injected_faults
+    def do_POST(self):
+        table, params = self._table_and_params()
+        if "/rpc/" in self.path:
+            try:
+                self._send(200, self.server.stub.rpc(table, self._read_json()).execute().data)
+            except APIError as e:
+                status = 404 if e.code == "PGRST202" else 409
+                self._send(status, {"code": e.code, "message": e.message, "hint": e.hint, "details": e.details})
+            return
+        query = self.server.stub.table(table)
+        if "resolution=merge-duplicates" in self.headers.get("Prefer", ""):
+            query = query.upsert(self._read_json())
+        else:
+            query = query.insert(self._read_json())
+        try:
+            rows = query.execute().data
+        except APIError as e:
+            self._send(409, {"code": e.code, "message": e.message, "hint": e.hint, "details": e.details})
+            return
+        self._send(201, rows)
+
+    @_injected_faults
+    def do_PATCH(self):
+        table, params = self._table_and_params()
+        query = apply_params(self.server.stub.table(table).update(self._read_json()), params)
+        self._send(200, query.execute().data)
+
+    @_injected_faults
+    def do_DELETE(self):
+        table, params = self._table_and_params()
+        query = apply_params(self.server.stub.table(table).delete(), params)
+        self._send(200, query.execute().data)
+
+
+class StubPostgrestServer:
+    def __init__(self, stub, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = stub
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,400 @@
+"""
+In-process stand-in for the Supabase client used by the benchmarks.
+
+Implements the subset of the postgrest query builder that main.py uses and
+sleeps for a configurable latency on every execute() to model the network
+round trip to Supabase. Every execute() is counted so benchmarks can report
+round trips per request.
+
+Faults can be injected into a share of round trips: latency spikes, and
+InjectedFault, the error postgrest raises when Supabase's gateway answers
+503 (see bench_resilience.py).
+"""
+import copy
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from postgrest.exceptions import APIError
+
+
+def _split_or_terms(filters):
+    # Split on commas outside double quotes, unquoting values as PostgREST does
+    terms, current, quoted, escaped = [], [], False, False
+    for char in filters:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            terms.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    terms.append("".join(current))
+    return terms
+
+
+class InjectedFault(APIError):
+    """What postgrest raises for a 503 from the gateway, whose body is not JSON."""
+
+    def __init__(self):
+        super().__init__({
+            "code": 503,
+            "message": "JSON could not be generated",
+            "hint": "Refer to full message for details",
+            "details": "Service Unavailable",
+        })
+
+
+class StubResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# HTTP method PostgREST uses for each operation
+OPERATION_METHODS = {"select": "GET", "insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE"}
+
+
+class StubQuery:
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+        self.operation = "select"
+        self.columns = None
+        self.filters = []
+        self.payload = None
+        self.order_by = None
+        self.row_range = None
+        # PostgREST query parameters the same calls would send
+        self.params = []
+
+    @property
+    def request(self):
+        """
+        Method, path and query parameters as on a postgrest request builder
+        (see metrics.query_label and db.query_key).
+        """
+        return SimpleNamespace(
+            http_method=OPERATION_METHODS[self.operation],
+            path=f"/rest/v1/{self.table_name}",
+            params=list(self.params),
+            headers={},
+        )
+
+    def select(self, columns="*", count=None):
+        self.operation = "select"
+        if columns.strip() != "*":
+            self.columns = [column.strip() for column in columns.split(",")]
+        self.params.append(("select", columns))
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        self.params.append((column, f"eq.{value}"))
+        return self
+
+    def or_(self, filters):
+        """Support PostgREST or=(...) filters made of col.eq.value terms."""
+        conditions = []
+        for term in _split_or_terms(filters):
+            column, operator, value = term.split(".", 2)
+            if operator != "eq":
+                raise NotImplementedError(f"or_ operator {operator}")
+            conditions.append((column, value))
+        self.filters.append(lambda row: any(row.get(column) == value for column, value in conditions))
+        self.params.append(("or", f"({filters})"))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        self.params.append((column, f"gt.{value}"))
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.params.append((column, f"in.({','.join(map(str, values))})"))
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        self.params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        self.params.append(("offset", str(start)))
+        self.params.append(("limit", str(end - start + 1)))
+        return self
+
+    def limit(self, count):
+        self.row_range = (0, count - 1)
+        self.params.append(("limit", str(count)))
+        return self
+
+    def insert(self, payload):
+        self.operation = "insert"
+        self.payload = payload if isinstance(payload, list) else [payload]
+        return self
+
+    def upsert(self, payload):
+        self.operation = "upsert"
+        self.payload = payload if isinstance(payload, list) else [payload]
+        return self
+
+    def update(self, payload):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def execute(self):
+        self.client.round_trip()
+        failure = self.client.failures.get((self.table_name, self.operation))
+        if failure:
+            raise failure
+
+        rows = self.client.tables.setdefault(self.table_name, [])
+        if self.operation == "insert":
+            inserted = [dict(row) for row in self.payload]
+            for columns in self.client.unique.get(self.table_name, ()):
+                # A column name, or a tuple of them for a multi-column constraint
+                columns = columns if isinstance(columns, tuple) else (columns,)
+                taken = {tuple(row.get(column) for column in columns) for row in rows}
+                for row in inserted:
+                    key = tuple(row.get(column) for column in columns)
+                    if key in taken:
+                        raise APIError({
+                            "code": "23505",
+                            "message": f'duplicate key value violates unique constraint "{self.table_name}_{"_".join(columns)}_key"',
+                            "details": f"Key ({', '.join(columns)})=({', '.join(map(str, key))}) already exists.",
+                            "hint": None,
+                        })
+                    taken.add(key)
+            rows.extend(inserted)
+            return StubResponse(copy.deepcopy(inserted))
+        if self.operation == "upsert":
+            # Conflicts resolve on id, merging into the existing row
+            by_id = {row.get("id"): row for row in rows}
+            upserted = []
+            for row in self.payload:
+                existing = by_id.get(row.get("id"))
+                if existing is None:
+                    existing = by_id[row.get("id")] = dict(row)
+                    rows.append(existing)
+                else:
+                    existing.update(row)
+                upserted.append(existing)
+            return StubResponse(copy.deepcopy(upserted))
+        if self.operation == "update":
+            updated = [row for row in rows if all(f(row) for f in self.filters)]
+            for row in updated:
+                row.update(self.payload)
+            return StubResponse(copy.deepcopy(updated))
+        if self.operation == "delete":
+            deleted = [row for row in rows if all(f(row) for f in self.filters)]
+            rows[:] = [row for row in rows if row not in deleted]
+            return StubResponse(copy.deepcopy(deleted))
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.order_by:
+            column, desc = self.order_by
+            matched.sort(key=lambda row: row.get(column), reverse=desc)
+        if self.row_range:
+            start, end = self.row_range
+            matched = matched[start:end + 1]
+        if self.columns:
+            matched = [{column: row.get(column) for column in self.columns} for row in matched]
+        return StubResponse(copy.deepcopy(matched))
+
+
+class StubRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    @property
+    def request(self):
+        return SimpleNamespace(http_method="POST", path=f"/rest/v1/rpc/{self.name}")
+
+    def execute(self):
+        self.client.round_trip()
+        function = self.client.functions.get(self.name)
+        if function is None:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self.name}"})
+        return StubResponse(copy.deepcopy(function(self.client, **self.params)))
+
+
+def create_squad_with_admin(client, p_squad_id, p_name, p_name_mom, p_membership_id, p_user_id, p_joined_at):
+    """Mirror of sql/create_squad_with_admin.sql."""
+    squad = {"id": p_squad_id, "name": p_name, "nameMom": p_name_mom}
+    membership = {
+        "id": p_membership_id,
+        "user_id": p_user_id,
+        "squad_id": p_squad_id,
+        "primary": True,
+        "joined_at": p_joined_at,
+    }
+    client.tables.setdefault("squad", []).append(squad)
+    client.tables.setdefault("user_squad_memberships", []).append(membership)
+    return {"squad": squad, "membership": membership}
+
+
+def record_care_completion(client, p_id, p_session_id, p_squad_id, p_user_id, p_starts_at, p_ends_at,
+                           p_hours, p_completed_at, p_rollup_ids):
+    """Mirror of sql/care_rollups.sql."""
+    completions = client.tables.setdefault("care_session_completions", [])
+    if any(row["session_id"] == p_session_id for row in completions):
+        raise APIError({
+            "code": "23505",
+            "message": 'duplicate key value violates unique constraint "care_session_completions_session_id_key"',
+            "details": f"Key (session_id)=({p_session_id}) already exists.",
+            "hint": None,
+        })
+    completion = {
+        "id": p_id, "session_id": p_session_id, "squad_id": p_squad_id, "user_id": p_user_id,
+        "starts_at": p_starts_at, "ends_at": p_ends_at, "hours": p_hours, "completed_at": p_completed_at,
+    }
+    completions.append(completion)
+    rollups = {row["id"]: row for row in client.tables.setdefault("care_rollups", [])}
+    for rollup_id in p_rollup_ids:
+        row = rollups.get(rollup_id)
+        if row is None:
+            scope, _, period = rollup_id.partition("|")
+            row = rollups[rollup_id] = {"id": rollup_id, "scope": scope, "period": period, "hours": 0.0, "sessions": 0}
+            client.tables["care_rollups"].append(row)
+        row["hours"] += p_hours
+        row["sessions"] += 1
+    for user in client.tables.get("users", []):
+        if user["id"] == p_user_id:
+            user["hours"] = (user.get("hours") or 0) + p_hours
+            user["sessions"] = (user.get("sessions") or 0) + 1
+    return completion
+
+
+def squad_summaries(client, p_squad_ids):
+    """Mirror of sql/squad_summaries.sql."""
+    memberships = client.tables.get("user_squad_memberships", [])
+    squad_ids = set(p_squad_ids)
+    users = {user["id"]: user for user in client.tables.get("users", [])}
+    summaries = []
+    for squad in client.tables.get("squad", []):
+        if squad["id"] not in squad_ids:
+            continue
+        assignments = [
+            row for row in client.tables.get("caretaker_assignments", [])
+            if row["squad_id"] == squad["id"] and row["user_id"] in users
+        ]
+        caretaker = None
+        if assignments:
+            latest = max(assignments, key=lambda row: row["assigned_at"])
+            user = users[latest["user_id"]]
+            caretaker = {
+                **{field: latest[field] for field in ("id", "squad_id", "user_id", "assigned_on", "assigned_at", "probability")},
+                "user": {"id": user["id"], "nameFirst": user["nameFirst"], "nameLast": user["nameLast"]},
+            }
+        summaries.append({
+            "id": squad["id"],
+            "name": squad["name"],
+            "nameMom": squad["nameMom"],
+            "member_count": sum(1 for row in memberships if row["squad_id"] == squad["id"]),
+            "caretaker": caretaker,
+        })
+    return sorted(summaries, key=lambda summary: (summary["name"], summary["id"]))
+
+
+class StubSupabase:
+    """Drop-in replacement for main.supabase backed by plain lists of dicts."""
+
+    def __init__(self, latency=0.0, tables=None):
+        self.latency = latency
+        self.tables = tables if tables is not None else {}
+        self.round_trips = 0
+        # Postgres functions callable through rpc()
+        self.functions = {
+            "create_squad_with_admin": create_squad_with_admin,
+            "record_care_completion": record_care_completion,
+            "squad_summaries": squad_summaries,
+        }
+        # (table, operation) -> exception raised instead of executing
+        self.failures = {}
+        # Share of round trips that fail with InjectedFault, and of those that
+        # take spike_latency seconds instead of latency
+        self.fault_rate = 0.0
+        self.spike_rate = 0.0
+        self.spike_latency = 0.0
+        self.random = random.Random(0)
+        # Columns with unique constraints, enforced on insert
+        self.unique = {
+            "users": ("email", "username"),
+            "care_session_completions": ("session_id",),
+            "user_squad_memberships": (("user_id", "squad_id"),),
+        }
+
+    def table(self, table_name):
+        return StubQuery(self, table_name)
+
+    def round_trip(self):
+        """Count one round trip and wait it out, failing it if a fault is due."""
+        self.round_trips += 1
+        spike = self.spike_rate and self.random.random() < self.spike_rate
+        latency = self.spike_latency if spike else self.latency
+        if latency:
+            time.sleep(latency)
+        if self.fault_rate and self.random.random() < self.fault_rate:
+            raise InjectedFault()
+
+    def rpc(self, name, params=None):
+        return StubRpc(self, name, params or {})
+
+
+def auth_headers(user_id):
+    """Authorization header with an access token for user_id, which every write needs."""
+    import tokens
+    return {"Authorization": f"Bearer {tokens.issue_token(user_id, 'access', tokens.ACCESS_TOKEN_TTL)}"}
+
+
+def seed_squad(client, squad_id, member_count):
+    """
+    Create a squad with member_count members and return their user ids,
+    UUIDs like the real users.id, derived from squad_id so reruns match.
+    """
+    users = client.tables.setdefault("users", [])
+    memberships = client.tables.setdefault("user_squad_memberships", [])
+    client.tables.setdefault("squad", []).append(
+        {"id": squad_id, "name": f"Squad {squad_id}", "nameMom": "Mom"}
+    )
+    user_ids = []
+    for i in range(member_count):
+        user_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{squad_id}/user/{i}"))
+        users.append({
+            "id": user_id,
+            "username": f"user_{squad_id}_{i}",
+            "password": "password123",
+            "nameFirst": f"First{i}",
+            "nameLast": f"Last{i}",
+            "email": f"user{i}@{squad_id}.example.com",
+            "phoneNumber": "123-456-7890",
+            "hours": 0,
+            "sessions": 0,
+        })
+        memberships.append({
+            "id": f"{squad_id}-membership-{i}",
+            "user_id": user_id,
+            "squad_id": squad_id,
+            "primary": i == 0,
+            "joined_at": "2024-01-15T10:30:00",
+        })
+        user_ids.append(user_id)
+    return user_ids
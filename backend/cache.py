@@ -0,0 +1,292 @@
+"""
+Read-through cache for entities read on every page load.
+
+Keys are entity-scoped strings such as "user:<id>", "squads" or
+"squad_members:<squad_id>". Handlers read through get_or_load() and the write
+endpoints call set()/delete() on exactly the keys they change. get_many() and
+set_many() do the same for a batch of keys in one call (one Redis round trip).
+
+Two backends share the same async interface:
+
+- LRUCache: in-process, bounded by CACHE_MAXSIZE entries and CACHE_TTL
+  seconds. The default; each worker/instance has its own copy, so TTL bounds
+  how stale another instance's view can get.
+- RedisCache: shared between instances, used when CACHE_REDIS_URL is set.
+  Requires the optional `redis` package.
+
+Expired entries are kept for another CACHE_STALE_TTL seconds. They are
+never served while the database answers, but when get_or_load()'s loader
+fails with DatabaseUnavailable (see resilience.py) the stale value is
+returned instead, so pages keep loading through a database outage.
+
+A load can race a write: the loader reads the database, a write lands and
+deletes the key, and the loader's result, read before the write, would then
+be cached until it expires. So every fill of the cache from the database
+(get_or_load(), or start_fill()/finish_fill() around a load of several
+keys) is tracked while it runs, and finish_fill() only caches the keys that
+were not deleted in the meantime. The tracking is per instance: with
+RedisCache, a delete made through another instance is not seen, and TTL
+bounds how long such a value can be served, as before.
+
+Both count hits, misses, evictions, expirations and stale values served;
+stats() exposes them.
+Lookups are also reported to metrics.record_cache_lookup() per request.
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+from resilience import DatabaseUnavailable
+
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "60"))
+CACHE_MAXSIZE = int(os.environ.get("CACHE_MAXSIZE", "10000"))
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+
+# Seconds an expired entry can still be served while the database is unavailable
+CACHE_STALE_TTL = float(os.environ.get("CACHE_STALE_TTL", "600"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    backend = "memory"
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL, stale_ttl=CACHE_STALE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+        # key -> [loads in flight, deletes since the first of them started]
+        self._fills = {}
+
+    async def get(self, key, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            metrics.record_cache_lookup(False)
+            return default
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            metrics.record_cache_lookup(False)
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.record_cache_lookup(True)
+        return value
+
+    async def get_stale(self, key, default=None):
+        """
+        The value for key even if it has expired, as long as it expired less
+        than stale_ttl seconds ago. Counted in stale_served rather than as a
+        hit or a miss.
+        """
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING or entry[0] + self.stale_ttl <= time.monotonic():
+            return default
+        self.stale_served += 1
+        return entry[1]
+
+    async def set(self, key, value, ttl=None):
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_many(self, keys):
+        """
+        Cached values of those keys that are present, as a dict.
+        """
+        values = {}
+        for key in keys:
+            value = await self.get(key, _MISSING)
+            if value is not _MISSING:
+                values[key] = value
+        return values
+
+    async def set_many(self, items, ttl=None):
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def delete(self, *keys):
+        self._invalidate_fills(keys)
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        self._invalidate_fills(list(self._fills))
+        self._entries.clear()
+
+    def start_fill(self, keys):
+        """
+        Note that the values of keys are about to be loaded from the
+        database. Returns what finish_fill() needs, which must be called
+        once the load is over, whether it succeeded or not.
+        """
+        generations = {}
+        for key in keys:
+            fill = self._fills.setdefault(key, [0, 0])
+            fill[0] += 1
+            generations[key] = fill[1]
+        return generations
+
+    async def finish_fill(self, generations, values=None, ttl=None):
+        """
+        Cache those of values (a dict by key, from a load started with
+        start_fill()) whose key has not been deleted since, and return them.
+        None values are not cached.
+        """
+        fresh = {}
+        for key, generation in generations.items():
+            fill = self._fills[key]
+            if values and values.get(key) is not None and fill[1] == generation:
+                fresh[key] = values[key]
+            fill[0] -= 1
+            if not fill[0]:
+                del self._fills[key]
+        await self.set_many(fresh, ttl)
+        return fresh
+
+    def _invalidate_fills(self, keys):
+        for key in keys:
+            fill = self._fills.get(key)
+            if fill is not None:
+                fill[1] += 1
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value for key, or await loader() and cache its result.
+        None results are returned but not cached, and neither is a result
+        whose key was deleted while loader() ran. If loader() raises
+        DatabaseUnavailable, an expired value still within stale_ttl is
+        returned instead.
+        """
+        value = await self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generations = self.start_fill([key])
+        loaded = {}
+        try:
+            value = loaded[key] = await loader()
+        except DatabaseUnavailable:
+            value = await self.get_stale(key, _MISSING)
+            if value is _MISSING:
+                raise
+        finally:
+            await self.finish_fill(generations, loaded, ttl)
+        return value
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_served": self.stale_served,
+        }
+
+
+class RedisCache(LRUCache):
+    """
+    Shared cache stored in Redis as JSON. Eviction is left to Redis' own
+    maxmemory policy, so only hits and misses are counted here. With a
+    stale_ttl, each value is also written under "stale:<key>" to outlive
+    the entry by stale_ttl seconds.
+    """
+    backend = "redis"
+
+    def __init__(self, redis_url, ttl=CACHE_TTL, prefix="wgm:", stale_ttl=CACHE_STALE_TTL):
+        super().__init__(maxsize=None, ttl=ttl, stale_ttl=stale_ttl)
+        import redis.asyncio as redis
+        self._redis = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    async def get(self, key, default=None):
+        raw = await self._redis.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            metrics.record_cache_lookup(False)
+            return default
+        self.hits += 1
+        metrics.record_cache_lookup(True)
+        return json.loads(raw)
+
+    async def get_stale(self, key, default=None):
+        if not self.stale_ttl:
+            return default
+        raw = await self._redis.get(self.prefix + "stale:" + key)
+        if raw is None:
+            return default
+        self.stale_served += 1
+        return json.loads(raw)
+
+    def _set(self, pipe, key, value, ttl):
+        raw = json.dumps(value)
+        ttl = ttl or self.ttl
+        pipe.set(self.prefix + key, raw, ex=max(1, int(ttl)))
+        if self.stale_ttl:
+            pipe.set(self.prefix + "stale:" + key, raw, ex=max(1, int(ttl + self.stale_ttl)))
+
+    async def set(self, key, value, ttl=None):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            self._set(pipe, key, value, ttl)
+            await pipe.execute()
+
+    async def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = {}
+        for key, raw in zip(keys, await self._redis.mget([self.prefix + key for key in keys])):
+            if raw is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                values[key] = json.loads(raw)
+            metrics.record_cache_lookup(raw is not None)
+        return values
+
+    async def set_many(self, items, ttl=None):
+        if items:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    self._set(pipe, key, value, ttl)
+                await pipe.execute()
+
+    async def delete(self, *keys):
+        self._invalidate_fills(keys)
+        if keys:
+            await self._redis.delete(*(self.prefix + kind + key for key in keys for kind in ("", "stale:")))
+
+    async def clear(self):
+        self._invalidate_fills(list(self._fills))
+        async for key in self._redis.scan_iter(match=self.prefix + "*"):
+            await self._redis.delete(key)
+
+    def stats(self):
+        stats = super().stats()
+        stats["size"] = None
+        return stats
+
+
+def create_cache():
+    if CACHE_REDIS_URL:
+        return RedisCache(CACHE_REDIS_URL)
+    return LRUCache()
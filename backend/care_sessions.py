@@ -0,0 +1,98 @@
+"""
+In-process calendar index over a squad's care sessions.
+
+Sessions are kept in a list sorted by (start, id), so range and "who's on
+duty" queries are a binary search instead of a scan of the squad's sessions:
+a session overlaps [start, end) when it starts before `end` and ends after
+`start`, and since no session lasts longer than the longest one indexed,
+only sessions starting after `start - longest` can qualify. Queries cost
+O(log n) plus the sessions that start inside that window.
+
+Times are naive UTC datetimes, matching how the backend stores timestamps.
+The index is loaded in bulk with load() and kept current with add()/remove()
+as sessions are written.
+"""
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+SESSION_TIME_FIELDS = ("starts_at", "ends_at")
+
+
+def to_utc(value):
+    """Parse an ISO string or datetime into a naive UTC datetime."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class CareSessionIndex:
+    def __init__(self):
+        self._keys = []
+        self._sessions = {}
+        self._longest = timedelta(0)
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def is_stale(self, max_age):
+        """True if the index was never loaded or was loaded more than max_age seconds ago."""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def load(self, sessions):
+        """Replace the index contents with `sessions` (dicts with id, starts_at, ends_at)."""
+        self._sessions = {}
+        self._longest = timedelta(0)
+        for session in sessions:
+            start, end, session = self._record(session)
+            self._sessions[session["id"]] = (start, end, session)
+            self._longest = max(self._longest, end - start)
+        self._keys = sorted((start, session_id) for session_id, (start, _, _) in self._sessions.items())
+        self.loaded_at = time.monotonic()
+
+    def add(self, session):
+        """Index a new session, or re-index an existing one that changed."""
+        start, end, session = self._record(session)
+        if session["id"] in self._sessions:
+            self.remove(session["id"])
+        self._sessions[session["id"]] = (start, end, session)
+        self._longest = max(self._longest, end - start)
+        insort(self._keys, (start, session["id"]))
+
+    def remove(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return
+        position = bisect_left(self._keys, (entry[0], session_id))
+        if position < len(self._keys) and self._keys[position] == (entry[0], session_id):
+            del self._keys[position]
+        # _longest stays as an upper bound; it is exact again after load()
+
+    def get(self, session_id):
+        entry = self._sessions.get(session_id)
+        return entry[2] if entry else None
+
+    def overlapping(self, start, end, exclude_id=None):
+        """Sessions overlapping [start, end), ordered by start."""
+        start, end = to_utc(start), to_utc(end)
+        low = bisect_left(self._keys, (start - self._longest,))
+        high = bisect_left(self._keys, (end,))
+        results = []
+        for _, session_id in self._keys[low:high]:
+            _, session_end, session = self._sessions[session_id]
+            if session_end > start and session_id != exclude_id:
+                results.append(session)
+        return results
+
+    def at(self, moment):
+        """Sessions in progress at `moment` (start <= moment < end)."""
+        moment = to_utc(moment)
+        return self.overlapping(moment, moment + timedelta(microseconds=1))
+
+    @staticmethod
+    def _record(session):
+        start, end = (to_utc(session[field]) for field in SESSION_TIME_FIELDS)
+        return start, end, dict(session)
@@ -0,0 +1,110 @@
+"""
+Fair caretaker selection.
+
+A squad's caretaker is drawn at random, weighted towards the members who have
+put in the least care so far. Each member's load is their hours and sessions
+relative to the squad average,
+
+    load = CARETAKER_HOURS_WEIGHT * hours / mean(hours)
+         + CARETAKER_SESSIONS_WEIGHT * sessions / mean(sessions)
+
+and their weight is (1 + load) ** -CARETAKER_FAIRNESS. A fairness of 0 is a
+uniform draw, like the old client-side wheel; higher values favour whoever
+is behind more strongly, while everyone keeps a non-zero chance.
+
+pick_caretakers() works on flat NumPy arrays holding the members of many
+squads at once, so the nightly pass assigns every squad with a handful of
+vectorized operations instead of a Python loop per squad.
+
+NumPy is imported by the functions that use it rather than at the top, so
+cold starts of requests that never pick a caretaker skip its import.
+"""
+import os
+
+CARETAKER_HOURS_WEIGHT = float(os.environ.get("CARETAKER_HOURS_WEIGHT", "1"))
+CARETAKER_SESSIONS_WEIGHT = float(os.environ.get("CARETAKER_SESSIONS_WEIGHT", "1"))
+CARETAKER_FAIRNESS = float(os.environ.get("CARETAKER_FAIRNESS", "2"))
+
+
+def _relative(values, groups, counts):
+    import numpy as np
+
+    # values divided by their squad's mean; all-zero squads stay at zero
+    means = np.bincount(groups, weights=values, minlength=len(counts)) / np.maximum(counts, 1)
+    group_means = means[groups]
+    return np.divide(values, group_means, out=np.zeros_like(values), where=group_means > 0)
+
+
+def member_weights(groups, hours, sessions, squad_count):
+    """
+    Selection weight of every member.
+
+    groups[i] is the index (0..squad_count-1) of member i's squad; hours and
+    sessions are the member's totals. Missing values count as zero.
+    """
+    import numpy as np
+
+    groups = np.asarray(groups, dtype=np.intp)
+    hours = np.nan_to_num(np.asarray(hours, dtype=np.float64))
+    sessions = np.nan_to_num(np.asarray(sessions, dtype=np.float64))
+    counts = np.bincount(groups, minlength=squad_count)
+
+    load = (CARETAKER_HOURS_WEIGHT * _relative(hours, groups, counts)
+            + CARETAKER_SESSIONS_WEIGHT * _relative(sessions, groups, counts))
+    return (1.0 + load) ** -CARETAKER_FAIRNESS
+
+
+def pick_caretakers(groups, hours, sessions, squad_count, rng=None):
+    """
+    Draw one caretaker per squad.
+
+    Returns (picks, probabilities): picks[s] is the index of the member chosen
+    for squad s, or -1 if the squad has no members, and probabilities[s] is
+    the chance that member had of being chosen.
+    """
+    import numpy as np
+
+    rng = rng or np.random.default_rng()
+    groups = np.asarray(groups, dtype=np.intp)
+    weights = member_weights(groups, hours, sessions, squad_count)
+    counts = np.bincount(groups, minlength=squad_count)
+
+    # Lay the members out squad by squad and build one running total of
+    # weights; each squad's draw is then a point inside its own stretch of
+    # the running total, found for every squad with a single searchsorted
+    order = np.argsort(groups, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    before = np.concatenate(([0.0], cumulative))[starts]
+    totals = np.concatenate(([0.0], cumulative))[ends] - before
+
+    targets = before + rng.random(squad_count) * totals
+    positions = np.searchsorted(cumulative, targets, side="right")
+    positions = np.clip(positions, starts, np.maximum(ends - 1, starts))
+
+    occupied = counts > 0
+    picks = np.full(squad_count, -1, dtype=np.intp)
+    probabilities = np.zeros(squad_count)
+    picks[occupied] = order[positions[occupied]]
+    probabilities[occupied] = weights[picks[occupied]] / totals[occupied]
+    return picks, probabilities
+
+
+def pick_caretaker(members, rng=None):
+    """
+    Draw the caretaker for one squad from member dicts with "hours" and
+    "sessions". Returns (member, probability), or (None, 0.0) when empty.
+    """
+    if not members:
+        return None, 0.0
+    import numpy as np
+
+    picks, probabilities = pick_caretakers(
+        np.zeros(len(members), dtype=np.intp),
+        [member.get("hours") or 0 for member in members],
+        [member.get("sessions") or 0 for member in members],
+        1,
+        rng,
+    )
+    return members[picks[0]], float(probabilities[0])
@@ -0,0 +1,208 @@
+"""
+gzip and brotli compression of JSON responses.
+
+CompressionMiddleware compresses a response when:
+
+- the client's Accept-Encoding allows br or gzip (br is preferred at equal
+  q-values, and only offered if the optional `brotli` package is installed);
+- it is a JSON or text body sent in one piece, so NDJSON and event streams
+  pass through untouched;
+- the body is at least COMPRESSION_MIN_SIZE bytes. Smaller bodies fit in a
+  packet or two anyway and are not worth the CPU.
+
+Responses whose body may be compressed carry Vary: Accept-Encoding, so
+shared caches keep one copy per encoding. A compressed response's ETag is
+made weak (W/"<token>"): it is the same resource, but not the same bytes.
+If-None-Match already uses the weak comparison (versions.etag_matches), so
+revalidating it still gets 304.
+
+Responses with an ETag (squads, squad members, users) are the hot cached
+payloads. Their compressed bodies are kept in a CompressedBodies LRU keyed
+by ETag and encoding, bounded by COMPRESSION_CACHE_BYTES, so a payload is
+compressed once per version rather than once per request. An entry is only
+used if the body it was made from has the same length and CRC-32 as the one
+being sent, which costs well under a tenth of compressing it again.
+"""
+import asyncio
+import gzip
+import os
+import zlib
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Smallest body, in bytes, that is compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+
+# gzip level (1-9) and brotli quality (0-11): fast settings for bodies
+# compressed while the client waits
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# Bytes of compressed bodies kept for responses with an ETag
+COMPRESSION_CACHE_BYTES = int(os.environ.get("COMPRESSION_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+# Bodies at least this large are compressed on a worker thread (zlib and
+# brotli release the GIL), so they do not hold up the event loop
+THREAD_MIN_SIZE = 64 * 1024
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts several equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding, encodings=ENCODINGS):
+    """The encoding to use for an Accept-Encoding header value, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 makes the output depend on the body alone
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodies:
+    """LRU of compressed bodies by (ETag, encoding), bounded in bytes."""
+
+    def __init__(self, max_bytes=COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        # (etag, encoding) -> (length, crc32 of the body, compressed body)
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, etag, encoding, body):
+        entry = self._entries.get((etag, encoding))
+        if entry is not None and entry[0] == len(body) and entry[1] == zlib.crc32(body):
+            self._entries.move_to_end((etag, encoding))
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def set(self, etag, encoding, body, compressed):
+        if len(compressed) > self.max_bytes:
+            return
+        old = self._entries.pop((etag, encoding), None)
+        if old is not None:
+            self.size -= len(old[2])
+        self._entries[(etag, encoding)] = (len(body), zlib.crc32(body), compressed)
+        self.size += len(compressed)
+        while self.size > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self):
+        return {"entries": len(self), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+compressed_bodies = CompressedBodies()
+
+# Totals across responses, for /metrics
+stats = {"compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses response bodies as described above.
+    Written against raw ASGI, like metrics.MetricsMiddleware, so streaming
+    responses pass through untouched.
+    """
+
+    def __init__(self, app, min_size=None, bodies=None):
+        self.app = app
+        self.min_size = COMPRESSION_MIN_SIZE if min_size is None else min_size
+        self.bodies = compressed_bodies if bodies is None else bodies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding"))
+        held = {"start": None}
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if message["status"] == 304:
+                    self._not_modified(message, request_headers)
+                elif (
+                    headers.get("content-type", "").encode().startswith(COMPRESSIBLE_TYPES)
+                    and "content-encoding" not in headers
+                ):
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                    if encoding is not None:
+                        # Wait for the body to decide
+                        held["start"] = message
+                        return
+            elif message["type"] == "http.response.body" and held["start"] is not None:
+                start, held["start"] = held["start"], None
+                body = message.get("body", b"")
+                if not message.get("more_body", False) and len(body) >= self.min_size:
+                    message = {"type": "http.response.body", "body": await self._compress(start, body, encoding)}
+                await send(start)
+            await send(message)
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _compress(self, start, body, encoding):
+        headers = MutableHeaders(raw=start["headers"])
+        etag = headers.get("etag")
+        compressed = self.bodies.get(etag, encoding, body) if etag else None
+        if compressed is None:
+            if len(body) >= THREAD_MIN_SIZE:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            if etag:
+                self.bodies.set(etag, encoding, body, compressed)
+        stats["compressed"] += 1
+        stats["bytes_in"] += len(body)
+        stats["bytes_out"] += len(compressed)
+
+        headers["content-encoding"] = encoding
+        headers["content-length"] = str(len(compressed))
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag
+        return compressed
+
+    @staticmethod
+    def _not_modified(start, request_headers):
+        # Answer with the ETag as the client has it, weak if it got a compressed body
+        headers = MutableHeaders(raw=start["headers"])
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/") and "W/" + etag in request_headers.get("if-none-match", ""):
+            headers["etag"] = "W/" + etag
+        headers.add_vary_header("Accept-Encoding")
@@ -0,0 +1,252 @@
+"""
+Non-blocking access to the synchronous Supabase client.
+
+Every route in main.py is `async def`, but supabase-py's client is blocking:
+calling .execute() directly inside a handler stalls the event loop for a full
+round trip, so one worker could only serve one request at a time. Instead,
+handlers build the query as usual and await execute(query), which runs the
+round trip on a bounded thread pool. All threads share one pooled httpx
+client, sized to the pool, so connections are reused rather than reopened.
+
+Each round trip is timed and reported to metrics.record_query(), which
+counts it against the request being served.
+
+Identical reads that overlap in time share one round trip (see
+singleflight.py): a select whose method, path, query parameters and
+result-shaping headers match one already in flight waits for that one's
+response instead of sending its own. Writes and rpc() calls always run.
+
+Each call has a deadline, reads are retried and optionally hedged, and a
+circuit breaker fails calls fast while the database is down (see
+resilience.py); all of those failures raise DatabaseUnavailable.
+
+The client is built on first use (see LazyClient), and only its PostgREST
+part is built at all: importing httpx, postgrest and especially the rest of
+supabase-py is a large share of a serverless cold start, and requests that
+never reach the database (CORS preflights, /health) should not pay for it.
+"""
+import asyncio
+import copy
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from resilience import (
+    DB_DEADLINE, DB_HEDGE_AFTER, DB_READ_RETRIES,
+    CircuitBreaker, DatabaseUnavailable, backoff, is_transient,
+)
+from singleflight import SingleFlight
+
+# Maximum number of Supabase round trips in flight per worker
+DB_MAX_WORKERS = int(os.environ.get("DB_MAX_WORKERS", "32"))
+
+# HTTP timeout of each round trip. Defaults to the call deadline, so a pool
+# thread left running by a call that missed its deadline is freed soon after
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", str(DB_DEADLINE)))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="supabase")
+
+
+def create_http_client():
+    """
+    Build the pooled HTTP client handed to create_client().
+    """
+    import httpx
+
+    return httpx.Client(
+        timeout=DB_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=DB_MAX_WORKERS,
+            max_keepalive_connections=DB_MAX_WORKERS,
+        ),
+    )
+
+
+def create_client(url, key):
+    """
+    PostgREST client for the Supabase project at url, sending key as both
+    apiKey and bearer token, as supabase.create_client() does. The backend
+    only uses .table() and .rpc(), so the auth, storage, realtime and
+    functions clients supabase-py would also build are skipped.
+    """
+    from postgrest import SyncPostgrestClient
+
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY (or SUPABASE_ANON_KEY) are required")
+    headers = {"apiKey": key, "Authorization": f"Bearer {key}"}
+    return SyncPostgrestClient(f"{url.rstrip('/')}/rest/v1", headers=headers, http_client=create_http_client())
+
+
+class LazyClient:
+    """
+    Stands in for the database client and builds it with factory() on first
+    attribute access. The client is then kept for the life of the process,
+    so warm invocations reuse it and its open connections.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self.load_seconds = None
+
+    def connect(self):
+        if self._client is None:
+            started = time.perf_counter()
+            try:
+                self._client = self._factory()
+                print("Supabase client created successfully")
+            except Exception as e:
+                print(f"ERROR creating Supabase client: {str(e)}")
+                raise
+            self.load_seconds = time.perf_counter() - started
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+
+def __getattr__(name):
+    # db.APIError, resolved when an except clause needs it; by then a query
+    # has run and postgrest is imported anyway
+    if name == "APIError":
+        from postgrest.exceptions import APIError
+        return APIError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Set to false to send every read even when an identical one is in flight
+DB_SINGLE_FLIGHT = os.environ.get("DB_SINGLE_FLIGHT", "true").lower() == "true"
+
+# Request headers that change what a select returns, and so are part of its key
+RESULT_HEADERS = ("accept", "accept-profile", "prefer", "range", "range-unit")
+
+# Reads in flight, shared by identical concurrent reads
+reads_in_flight = SingleFlight()
+
+# Shared by every call, so one process stops calling a database that is down
+breaker = CircuitBreaker()
+
+
+def query_key(query):
+    """
+    Key identifying a read by what it asks for, with the query parameters
+    sorted so filter order does not matter; None for anything that is not
+    a GET, which is never shared.
+    """
+    request = getattr(query, "request", None)
+    if request is None or request.http_method != "GET" or getattr(request, "params", None) is None:
+        return None
+    params = request.params
+    params = params.multi_items() if hasattr(params, "multi_items") else params
+    headers = getattr(request, "headers", None) or {}
+    return (
+        str(request.path),
+        tuple(sorted(params)),
+        tuple((name, headers[name]) for name in RESULT_HEADERS if name in headers),
+    )
+
+
+def copy_response(response):
+    """A copy of response whose rows can be changed without affecting it."""
+    duplicate = copy.copy(response)
+    duplicate.data = copy.deepcopy(response.data)
+    return duplicate
+
+
+def is_read(query):
+    request = getattr(query, "request", None)
+    return request is not None and request.http_method in ("GET", "HEAD")
+
+
+async def execute(query):
+    """
+    Run query.execute() on the database thread pool and return its response,
+    or share the response of an identical read already in flight.
+
+    Raises DatabaseUnavailable if the circuit is open, the deadline passes or
+    a transient error outlasts the retries; any other error is raised as is.
+    """
+    key = query_key(query) if DB_SINGLE_FLIGHT else None
+    if key is None:
+        return await _call(query)
+    response, shared = await reads_in_flight.do(key, lambda: _call(query), copy_response)
+    metrics.record_single_flight(query, shared)
+    return response
+
+
+async def _call(query):
+    read = is_read(query)
+    if hasattr(query, "retry"):
+        # postgrest's own retries sleep on the pool thread, past any deadline
+        query.retry(False)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + DB_DEADLINE
+    attempt = 0
+    while True:
+        ticket = breaker.allow()
+        if ticket is None:
+            metrics.record_unavailable(query, "rejected")
+            retry_after = breaker.retry_after()
+            raise DatabaseUnavailable(f"Database unavailable, retry in {max(1, math.ceil(retry_after))}s", retry_after)
+        ok = None
+        try:
+            response = await asyncio.wait_for(_attempt(query, read), max(0, deadline - loop.time()))
+            ok = True
+            return response
+        except Exception as e:
+            ok = not is_transient(e)
+            if ok:
+                raise
+            delay = backoff(attempt)
+            if not read or attempt >= DB_READ_RETRIES or loop.time() + delay >= deadline:
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                metrics.record_unavailable(query, "timeout" if timed_out else "error")
+                message = f"Database timed out after {DB_DEADLINE:g}s" if timed_out else f"Database unavailable: {e}"
+                raise DatabaseUnavailable(message) from e
+        finally:
+            breaker.record(ticket, ok)
+        metrics.record_retry(query)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def _attempt(query, read):
+    if not read or not DB_HEDGE_AFTER or breaker.state != CircuitBreaker.CLOSED:
+        return await _execute(query)
+    first = asyncio.ensure_future(_execute(query))
+    tasks = [first]
+    error = None
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=DB_HEDGE_AFTER)
+        if done:
+            return first.result()
+        hedge = asyncio.ensure_future(_execute(query))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    metrics.record_hedge(query, "hedge" if task is hedge else "first")
+                    return task.result()
+                error = task.exception()
+                if not is_transient(error):
+                    raise error
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+            # Nobody waits for the loser, or for either if the call was cancelled
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+async def _execute(query):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, query.execute)
+    finally:
+        metrics.record_query(query, time.perf_counter() - started)
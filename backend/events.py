@@ -0,0 +1,189 @@
+"""
+In-process pub/sub for real-time squad updates.
+
+Handlers publish events (membership added, session created, caretaker
+picked, ...) to a squad's channel and every client streaming
+/squads/{squad_id}/events receives them as server-sent events:
+
+    id: <epoch>-<sequence>
+    event: <type>
+    data: <json>
+
+Each event is encoded once and handed to every subscriber's bounded queue
+without waiting, so one slow client never delays the publisher or the other
+clients. A subscriber whose queue fills up has its backlog dropped and gets
+a single `resync` event instead, telling it to refetch. The last
+EVENT_REPLAY_SIZE events of each squad are kept so a client reconnecting
+with Last-Event-ID catches up on what it missed; if the gap is older than
+that (or the process restarted), it gets `resync` too.
+
+The hub lives in one process: clients only see events published by the
+instance they are connected to.
+"""
+import asyncio
+import os
+import secrets
+from collections import OrderedDict, deque
+
+from responses import dumps
+
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "64"))
+EVENT_REPLAY_SIZE = int(os.environ.get("EVENT_REPLAY_SIZE", "100"))
+EVENT_HISTORY_SQUADS = int(os.environ.get("EVENT_HISTORY_SQUADS", "1000"))
+EVENT_HEARTBEAT = float(os.environ.get("EVENT_HEARTBEAT", "15"))
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+def encode_event(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+class Subscription:
+    def __init__(self, hub, squad_id, queue_size):
+        self.hub = hub
+        self.squad_id = squad_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def deliver(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too far behind: drop the backlog and ask the client to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.hub.resync_frame(self.squad_id))
+            self.resyncs += 1
+            self.hub.resyncs += 1
+
+    async def frames(self, heartbeat=EVENT_HEARTBEAT, duration=None):
+        """
+        Yield encoded frames as they arrive, everything already queued joined
+        into one chunk, and a heartbeat comment after `heartbeat` idle
+        seconds. Stops after `duration` seconds if given.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration if duration else None
+        while True:
+            timeout = heartbeat
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+                if timeout <= 0:
+                    return
+            if self.queue.empty():
+                try:
+                    frames = [await asyncio.wait_for(self.queue.get(), timeout)]
+                except asyncio.TimeoutError:
+                    if deadline is not None and loop.time() >= deadline:
+                        return
+                    yield HEARTBEAT_FRAME
+                    continue
+            else:
+                frames = []
+            while not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+            yield b"".join(frames)
+
+
+class EventHistory:
+    """A squad's recent events; floor is the newest one no longer kept."""
+
+    def __init__(self, floor, size):
+        self.floor = floor
+        self.events = deque(maxlen=size)
+
+    def append(self, sequence, frame):
+        if len(self.events) == self.events.maxlen:
+            self.floor = self.events[0][0]
+        self.events.append((sequence, frame))
+
+
+class SquadEventHub:
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE, replay_size=EVENT_REPLAY_SIZE, history_squads=EVENT_HISTORY_SQUADS):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.history_squads = history_squads
+        # Event ids from an earlier process can't be replayed
+        self.epoch = secrets.token_hex(4)
+        self._subscribers = {}
+        self._history = OrderedDict()
+        self._sequence = 0
+        # Newest event of any squad whose history was dropped altogether
+        self._evicted = 0
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def subscribe(self, squad_id, last_event_id=None):
+        """
+        Register a subscriber for the squad. With last_event_id, events
+        published after it are queued first (or resync if they are gone).
+        """
+        subscription = Subscription(self, squad_id, self.queue_size)
+        self._subscribers.setdefault(squad_id, set()).add(subscription)
+        if last_event_id:
+            for frame in self._missed(squad_id, last_event_id):
+                subscription.deliver(frame)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.squad_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.squad_id]
+
+    def publish(self, squad_id, event_type, data):
+        """Send an event to every subscriber of the squad. Returns how many got it."""
+        self._sequence += 1
+        frame = encode_event(f"{self.epoch}-{self._sequence}", event_type, data)
+
+        history = self._history.get(squad_id)
+        if history is None:
+            history = self._history[squad_id] = EventHistory(self._evicted, self.replay_size)
+            while len(self._history) > self.history_squads:
+                _, evicted = self._history.popitem(last=False)
+                if evicted.events:
+                    self._evicted = max(self._evicted, evicted.events[-1][0])
+        self._history.move_to_end(squad_id)
+        history.append(self._sequence, frame)
+
+        subscribers = self._subscribers.get(squad_id, ())
+        for subscription in subscribers:
+            subscription.deliver(frame)
+        self.published += 1
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    def resync_frame(self, squad_id):
+        return encode_event(f"{self.epoch}-{self._sequence}", "resync", {"squad_id": squad_id})
+
+    def subscriber_count(self, squad_id=None):
+        if squad_id is not None:
+            return len(self._subscribers.get(squad_id, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def stats(self):
+        return {
+            "squads": len(self._subscribers),
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
+
+    def _missed(self, squad_id, last_event_id):
+        epoch, _, sequence = last_event_id.partition("-")
+        try:
+            sequence = int(sequence)
+        except ValueError:
+            return [self.resync_frame(squad_id)]
+        history = self._history.get(squad_id)
+        floor = history.floor if history is not None else self._evicted
+        # Events after last_event_id may have been dropped from the buffer
+        if epoch != self.epoch or sequence < floor:
+            return [self.resync_frame(squad_id)]
+        if history is None:
+            return []
+        return [frame for event_sequence, frame in history.events if event_sequence > sequence]
@@ -1,16 +1,45 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+
+# Taken first, so startup_import_seconds in /metrics covers every import
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
-import uvicorn
+import asyncio
+import csv
+import heapq
+import io
+import json
+import math
 import os
 import uuid
 import re
-from datetime import datetime
-from dotenv import load_dotenv
-from supabase import create_client, Client
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import List
+import caretakers
+import compression
+import db
+import metrics
+import passwords
+import rollups
+import schemas
+import tokens
+from cache import create_cache
+from care_sessions import CareSessionIndex, to_utc
+from events import SquadEventHub
+from memberships import create_membership_index
+from recurrence import RecurrenceRule
+from responses import JSONResponse, ResponseValidationMiddleware, RESPONSE_VALIDATION, dumps
+from search import UserSearchIndex
+from versions import create_version_table, etag, etag_matches
 
-load_dotenv()
+# Vercel provides the environment itself; .env files are for local runs
+if not os.environ.get("VERCEL"):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 url: str = os.environ.get("SUPABASE_URL")
 # Use service key for backend operations (bypasses RLS)
@@ -43,66 +72,2706 @@ class CreateSquadMembershipRequest(BaseModel):
     user_id: str = Field(..., description="ID of the user to add")
     squad_id: str = Field(..., description="ID of the squad")
 
-# Use this client for standard user-scoped operations
-try:
-    supabase: Client = create_client(url, key)
-    print("Supabase client created successfully")
-except Exception as e:
-    print(f"ERROR creating Supabase client: {str(e)}")
+# Pydantic model for refreshing session tokens
+class RefreshTokenRequest(BaseModel):
+    refreshToken: str = Field(..., min_length=1, description="Refresh token issued by /login")
 
-app = FastAPI()
+# Pydantic model for care session creation
+class CreateCareSessionRequest(BaseModel):
+    starts_at: datetime = Field(..., description="Session start (ISO 8601, UTC if no offset is given)")
+    ends_at: datetime = Field(..., description="Session end (ISO 8601, UTC if no offset is given)")
+    caretaker_id: str | None = Field(None, description="ID of the squad member taking care")
+    notes: str | None = Field(None, max_length=1000, description="Notes for the caretaker")
 
-# Configure CORS to allow frontend requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=False,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-)
+# Pydantic model for assigning a care session's caretaker
+class AssignCaretakerRequest(BaseModel):
+    user_id: str = Field(..., description="ID of the squad member taking care")
 
+# Pydantic model for recurring care session creation
+class CreateCareSessionRuleRequest(BaseModel):
+    rrule: str = Field(..., min_length=1, max_length=200, description="Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,TH")
+    starts_at: datetime = Field(..., description="Start of the first occurrence (ISO 8601, UTC if no offset is given)")
+    duration_minutes: int = Field(..., gt=0, description="Length of each occurrence in minutes")
+    caretaker_id: str | None = Field(None, description="ID of the squad member taking care")
+    notes: str | None = Field(None, max_length=1000, description="Notes for the caretaker")
 
-# Handle OPTIONS preflight requests explicitly
-@app.options("/{path:path}")
-async def options_handler(path: str):
-    return Response(
+# Pydantic model for cancelling or reassigning one occurrence of a rule
+class CreateCareSessionExceptionRequest(BaseModel):
+    occurs_at: datetime = Field(..., description="Original start of the occurrence")
+    cancelled: bool = Field(True, description="Skip this occurrence")
+    caretaker_id: str | None = Field(None, description="Caretaker for this occurrence only, if not cancelled")
+
+# How long the in-process user search index may serve results before it is
+# reloaded, so users created on other instances eventually become searchable
+SEARCH_INDEX_MAX_AGE = int(os.environ.get("SEARCH_INDEX_MAX_AGE", "300"))
+
+# Supabase caps how many rows a single select returns
+PAGE_SIZE = 1000
+
+# Columns the list endpoints may return, and therefore accept in `fields=`.
+# Passwords are never listed.
+USER_FIELDS = ("id", "username", "nameFirst", "nameLast", "email", "phoneNumber", "hours", "sessions")
+SQUAD_FIELDS = ("id", "name", "nameMom")
+MEMBERSHIP_FIELDS = ("id", "user_id", "squad_id", "primary", "joined_at")
+
+# Set to true once users has unique constraints on email and username
+# (sql/users_unique_constraints.sql). Until then create_user checks first,
+# since nothing else would stop a duplicate registration.
+USERS_UNIQUE_CONSTRAINTS = os.environ.get("USERS_UNIQUE_CONSTRAINTS", "false").lower() == "true"
+
+# 409 messages for duplicate registrations, by conflicting column
+USER_CONFLICT_MESSAGES = {
+    "email": "A user with this email already exists",
+    "username": "This username is already taken",
+}
+
+# Most users a single bulk membership import may contain
+MAX_BULK_MEMBERSHIPS = 5000
+
+# Ids per `in` filter, keeping request URLs well under PostgREST's limits
+IN_FILTER_CHUNK = 200
+
+# Columns of a caretaker assignment (sql/caretaker_assignments.sql)
+CARETAKER_FIELDS = ("id", "squad_id", "user_id", "assigned_on", "assigned_at", "probability")
+
+# Columns of a care session (sql/care_sessions.sql)
+CARE_SESSION_FIELDS = ("id", "squad_id", "caretaker_id", "starts_at", "ends_at", "notes")
+
+# Longest care session accepted; also bounds the calendar index's query window
+CARE_SESSION_MAX_HOURS = int(os.environ.get("CARE_SESSION_MAX_HOURS", str(7 * 24)))
+
+# Squads whose calendar index is kept in memory, and how long an index may
+# serve before it is reloaded to pick up sessions written by other instances
+CARE_SESSION_INDEX_SQUADS = int(os.environ.get("CARE_SESSION_INDEX_SQUADS", "1000"))
+CARE_SESSION_INDEX_MAX_AGE = int(os.environ.get("CARE_SESSION_INDEX_MAX_AGE", "300"))
+
+# Columns of recurring session rules and their exceptions (sql/care_session_rules.sql)
+CARE_RULE_FIELDS = ("id", "squad_id", "caretaker_id", "rrule", "starts_at", "duration_minutes", "notes")
+CARE_EXCEPTION_FIELDS = ("id", "rule_id", "squad_id", "occurs_at", "cancelled", "caretaker_id")
+
+# Weeks from the start of today whose recurring occurrences are kept
+# materialized in the cache; other ranges are expanded on demand
+RECURRENCE_WINDOW_WEEKS = int(os.environ.get("RECURRENCE_WINDOW_WEEKS", "4"))
+
+# Weeks ahead, from the later of today and its start, in which a new
+# recurring session's occurrences are checked against the squad's calendar
+RECURRENCE_CONFLICT_WEEKS = int(os.environ.get("RECURRENCE_CONFLICT_WEEKS", "52"))
+
+# Longest an event stream stays open before the client is asked to reconnect
+# (EventSource does so with Last-Event-ID); keep it under the platform's
+# function timeout
+EVENT_STREAM_SECONDS = int(os.environ.get("EVENT_STREAM_SECONDS", "240"))
+
+# lazy: build the database client and import numpy on first use, so a cold
+# start of the serverless function only pays for what its request needs.
+# eager: do both at import, for long-running servers.
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "lazy")
+
+# Use this client for standard user-scoped operations (see db.py)
+supabase = db.LazyClient(lambda: db.create_client(url, key))
+if STARTUP_MODE == "eager":
+    try:
+        supabase.connect()
+    except Exception:
+        pass
+    import numpy  # noqa: F401, used by caretakers
+
+
+async def hydrate_users(rows, user_key="user_id", fields="id, nameFirst, nameLast", target="user"):
+    """
+    Attach user details to each row using bulk queries.
+
+    Collects the distinct ids found under rows[i][user_key], fetches them with
+    fetch_in_chunks() (one `in` filter per IN_FILTER_CHUNK ids, so a large
+    squad does not overflow the request URL) and stores each matching user
+    under rows[i][target].
+    Rows whose user no longer exists are left without the target key.
+    `fields` must include "id".
+    """
+    user_ids = list({row[user_key] for row in rows if row.get(user_key)})
+    if not user_ids:
+        return rows
+
+    users_by_id = {user["id"]: user for user in await fetch_in_chunks("users", fields, "id", user_ids)}
+
+    for row in rows:
+        user = users_by_id.get(row.get(user_key))
+        if user:
+            row[target] = user
+    return rows
+
+
+async def fetch_page(table, fields, limit=PAGE_SIZE, cursor=None, filters=()):
+    """
+    Fetch one page of rows ordered by id using keyset pagination.
+
+    Returns (rows, next_cursor). Pass next_cursor back as `cursor` to get the
+    following page; it is None once a short page shows the table is exhausted.
+    `filters` is a sequence of (column, value) equality filters.
+    """
+    query = supabase.table(table).select(fields)
+    for column, value in filters:
+        query = query.eq(column, value)
+    if cursor:
+        query = query.gt("id", cursor)
+    response = await db.execute(query.order("id").limit(limit))
+    rows = response.data or []
+    next_cursor = rows[-1]["id"] if len(rows) == limit else None
+    return rows, next_cursor
+
+
+async def iter_pages(table, fields, cursor=None, filters=(), page_size=PAGE_SIZE):
+    """
+    Yield successive pages of rows after `cursor`, one round trip per page,
+    so callers never hold more than one page in memory.
+    """
+    while True:
+        rows, cursor = await fetch_page(table, fields, page_size, cursor, filters)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+async def fetch_all_rows(table, fields, filters=()):
+    """
+    Read every matching row of a table, PAGE_SIZE rows per round trip.
+    """
+    return [row async for page in iter_pages(table, fields, filters=filters) for row in page]
+
+
+async def fetch_user_profile(user_id):
+    response = await db.execute(supabase.table("users").select("id, nameFirst, nameLast, email, phoneNumber, hours, sessions").eq("id", user_id))
+    return response.data[0] if response.data else None
+
+
+async def fetch_squads():
+    return await fetch_all_rows("squad", ", ".join(SQUAD_FIELDS))
+
+
+async def fetch_squad_members(squad_id):
+    memberships_response = await db.execute(supabase.table("user_squad_memberships").select("*").eq("squad_id", squad_id))
+    # Get user details for every membership in one bulk query
+    return await hydrate_users(memberships_response.data or [])
+
+
+async def fetch_current_caretaker(squad_id):
+    """
+    The squad's most recent caretaker assignment with the user's name, or
+    None if no caretaker has been picked yet.
+    """
+    response = await db.execute(
+        supabase.table("caretaker_assignments").select(", ".join(CARETAKER_FIELDS))
+        .eq("squad_id", squad_id).order("assigned_at", desc=True).limit(1)
+    )
+    if not response.data:
+        return None
+    rows = await hydrate_users(response.data)
+    return rows[0]
+
+
+# Set to False the first time the squad_summaries function turns out not to
+# be installed (see sql/squad_summaries.sql)
+summaries_rpc_available = True
+
+
+async def fetch_squad_summaries(squad_ids):
+    """
+    The given squads with their member_count and current caretaker (or
+    None), ordered by name.
+
+    Uses the squad_summaries Postgres function so all of them come back in
+    one round trip. If the function is not installed, falls back to one
+    query per table and one per squad for its caretaker, run concurrently.
+    """
+    global summaries_rpc_available
+    if summaries_rpc_available:
+        try:
+            response = await db.execute(supabase.rpc("squad_summaries", {"p_squad_ids": squad_ids}))
+            return response.data or []
+        except db.APIError as e:
+            # PGRST202: function not found in the schema cache
+            if e.code != "PGRST202":
+                raise
+            print("squad_summaries function not found, summarizing squads with separate queries")
+            summaries_rpc_available = False
+
+    squads, memberships, *current_caretakers = await asyncio.gather(
+        fetch_in_chunks("squad", ", ".join(SQUAD_FIELDS), "id", squad_ids),
+        fetch_in_chunks("user_squad_memberships", "squad_id", "squad_id", squad_ids),
+        *(fetch_current_caretaker(squad_id) for squad_id in squad_ids),
+    )
+    member_counts = Counter(row["squad_id"] for row in memberships)
+    caretaker_by_squad = dict(zip(squad_ids, current_caretakers))
+    summaries = [
+        {**squad, "member_count": member_counts[squad["id"]], "caretaker": caretaker_by_squad[squad["id"]]}
+        for squad in squads
+    ]
+    return sorted(summaries, key=lambda summary: (summary["name"], summary["id"]))
+
+
+async def fetch_dashboard_squads(user_id):
+    """
+    Summaries of the user's squads, read through the cache.
+
+    The user's squads come from the membership index and each summary is
+    cached under "squad_summary:<squad_id>", so a change to one squad only
+    invalidates that squad for all of its members. Misses cost a single
+    fetch_squad_summaries() call for just the squads whose summaries are
+    not cached.
+    """
+    squad_ids = await fetch_user_squad_ids(user_id)
+    summaries = await cache.get_many(f"squad_summary:{squad_id}" for squad_id in squad_ids)
+    missing = [squad_id for squad_id in squad_ids if f"squad_summary:{squad_id}" not in summaries]
+    if missing:
+        # Only summaries not invalidated while they load are cached
+        generations = cache.start_fill(f"squad_summary:{squad_id}" for squad_id in missing)
+        try:
+            loaded = {f"squad_summary:{summary['id']}": summary for summary in await fetch_squad_summaries(missing)}
+        except db.DatabaseUnavailable:
+            await cache.finish_fill(generations)
+            # Serve expired summaries until the database is back, if the cache still has them all
+            loaded = {f"squad_summary:{squad_id}": await cache.get_stale(f"squad_summary:{squad_id}") for squad_id in missing}
+            if None in loaded.values():
+                raise
+        except BaseException:
+            await cache.finish_fill(generations)
+            raise
+        else:
+            await cache.finish_fill(generations, loaded)
+        summaries.update(loaded)
+    return sorted(summaries.values(), key=lambda summary: (summary["name"], summary["id"]))
+
+
+def parse_fields(fields, allowed_fields):
+    """
+    Turn a comma-separated `fields=` parameter into a select list.
+
+    Returns (select, unknown_fields). "id" is always selected because it is
+    the pagination key. No parameter selects every allowed field.
+    """
+    if not fields:
+        return ", ".join(allowed_fields), []
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown_fields = [field for field in requested if field not in allowed_fields]
+    return ", ".join(dict.fromkeys(["id", *requested])), unknown_fields
+
+
+def unavailable_response(error, data=None):
+    """
+    503 for a db.DatabaseUnavailable, telling the client when to retry.
+    """
+    retry_after = error.retry_after if error.retry_after is not None else 1
+    return JSONResponse(
+        status_code=503,
+        content={"message": f"Service unavailable: {str(error)}", "data": data},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+async def list_response(table, allowed_fields, message, limit=None, cursor=None, fields=None, response_format="json", filters=()):
+    """
+    Shared implementation of the list endpoints.
+
+    - format=ndjson streams every row after `cursor` as newline-delimited
+      JSON, one page per round trip, so memory stays flat however large the
+      table is. `limit` sets the page size.
+    - limit and/or cursor returns one page plus `next_cursor`.
+    - otherwise every row is returned in one JSON body, as before.
+    """
+    select, unknown_fields = parse_fields(fields, allowed_fields)
+    if unknown_fields:
+        return JSONResponse(
+            status_code=400,
+            content={"message": f"Unknown field(s): {', '.join(unknown_fields)}", "data": []}
+        )
+    if response_format not in ("json", "ndjson"):
+        return JSONResponse(
+            status_code=400,
+            content={"message": "Invalid format. Use json or ndjson.", "data": []}
+        )
+
+    page_size = max(1, min(limit or PAGE_SIZE, PAGE_SIZE))
+
+    if response_format == "ndjson":
+        async def ndjson_lines():
+            async for page in iter_pages(table, select, cursor, filters, page_size):
+                yield b"".join(dumps(row) + b"\n" for row in page)
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        rows = await fetch_all_rows(table, select, filters)
+        return JSONResponse(
+            status_code=200,
+            content={"message": message, "data": rows}
+        )
+
+    rows, next_cursor = await fetch_page(table, select, page_size, cursor, filters)
+    return JSONResponse(
         status_code=200,
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization",
+        content={"message": message, "data": rows, "next_cursor": next_cursor}
+    )
+
+
+def postgrest_quote(value):
+    """Quote a value for use inside a PostgREST or=(...) filter."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def user_conflict_message(error):
+    """
+    Map a unique_violation raised by inserting into users to its 409 message,
+    using the column or constraint named in the Postgres error.
+    """
+    text = f"{error.message} {error.details}"
+    for column, message in USER_CONFLICT_MESSAGES.items():
+        if f"({column})" in text or f"users_{column}_key" in text:
+            return message
+    return "A user with this email or phone number already exists"
+
+
+def parse_bulk_user_ids(content_type, body):
+    """
+    Read the user ids of a bulk membership import.
+
+    Accepts JSON ({"user_ids": [...]} or a bare list), NDJSON (one id or
+    {"user_id": ...} object per line) and CSV (a user_id column, or ids in
+    the first column when there is no header). Raises ValueError on bodies
+    that cannot be parsed.
+    """
+    text = body.decode("utf-8-sig")
+    if "ndjson" in content_type:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif "csv" in content_type:
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        column = 0
+        if rows and "user_id" in rows[0]:
+            column = rows[0].index("user_id")
+            rows = rows[1:]
+        items = [row[column] if len(row) > column else "" for row in rows]
+    else:
+        payload = json.loads(text or "null")
+        items = payload.get("user_ids") if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            raise ValueError('expected {"user_ids": [...]}')
+
+    user_ids = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("user_id")
+        user_ids.append(str(item).strip() if item is not None else "")
+    return user_ids
+
+
+def is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+async def fetch_in_chunks(table, fields, column, values, filters=()):
+    """
+    Fetch rows whose `column` is in `values`, IN_FILTER_CHUNK ids per query,
+    with the chunk queries running concurrently.
+    """
+    async def fetch_chunk(chunk):
+        query = supabase.table(table).select(fields).in_(column, chunk)
+        for filter_column, value in filters:
+            query = query.eq(filter_column, value)
+        response = await db.execute(query)
+        return response.data or []
+
+    chunks = [values[i:i + IN_FILTER_CHUNK] for i in range(0, len(values), IN_FILTER_CHUNK)]
+    pages = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+    return [row for page in pages for row in page]
+
+
+async def insert_squad_memberships(squad_id, user_ids, joined_at):
+    """
+    Insert non-admin memberships of user_ids in squad_id in one round trip
+    and return the created rows. Raises db.APIError with code 23505 if any
+    of them is already a member, in which case none is inserted.
+    """
+    if not user_ids:
+        return []
+    response = await db.execute(supabase.table("user_squad_memberships").insert([
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "squad_id": squad_id,
+            "primary": False,  # New members are not admins
+            "joined_at": joined_at
         }
+        for user_id in user_ids
+    ]))
+    return response.data or []
+
+
+# Set to False the first time the create_squad_with_admin function turns out
+# not to be installed (see sql/create_squad_with_admin.sql)
+squad_rpc_available = True
+
+
+async def create_squad_with_admin(squad_data, membership_data):
+    """
+    Insert a squad and its creator's admin membership.
+
+    Uses the create_squad_with_admin Postgres function so both rows are
+    written atomically in one round trip. If the function is not installed,
+    falls back to two inserts and deletes the squad again when the
+    membership insert fails, so no admin-less squad is left behind.
+    Returns (squad, membership), or (None, None) if the squad insert returned
+    nothing.
+    """
+    global squad_rpc_available
+    if squad_rpc_available:
+        try:
+            response = await db.execute(supabase.rpc("create_squad_with_admin", {
+                "p_squad_id": squad_data["id"],
+                "p_name": squad_data["name"],
+                "p_name_mom": squad_data["nameMom"],
+                "p_membership_id": membership_data["id"],
+                "p_user_id": membership_data["user_id"],
+                "p_joined_at": membership_data["joined_at"],
+            }))
+            return response.data["squad"], response.data["membership"]
+        except db.APIError as e:
+            # PGRST202: function not found in the schema cache
+            if e.code != "PGRST202":
+                raise
+            print("create_squad_with_admin function not found, using two-step squad creation")
+            squad_rpc_available = False
+
+    squad_response = await db.execute(supabase.table("squad").insert(squad_data))
+    if not squad_response.data:
+        return None, None
+    try:
+        membership_response = await db.execute(supabase.table("user_squad_memberships").insert(membership_data))
+        if not membership_response.data:
+            raise RuntimeError("Failed to create admin membership")
+    except Exception:
+        await db.execute(supabase.table("squad").delete().eq("id", squad_data["id"]))
+        raise
+    return squad_response.data[0], membership_response.data[0]
+
+
+def new_caretaker_assignment(squad_id, user_id, probability, assigned_at):
+    return {
+        "id": str(uuid.uuid4()),
+        "squad_id": squad_id,
+        "user_id": user_id,
+        "assigned_on": assigned_at.date().isoformat(),
+        "assigned_at": assigned_at.isoformat(),
+        "probability": probability
+    }
+
+
+async def assign_all_caretakers(assigned_at):
+    """
+    Pick a caretaker for every squad that has none for assigned_at's day yet.
+
+    Reads all memberships and every member's all-time hours and sessions in
+    their squad (see rollups.py), draws every squad's caretaker in one
+    vectorized caretakers.pick_caretakers() call and
+    inserts the assignments PAGE_SIZE rows per round trip. Squads already
+    assigned that day are skipped, so re-running the pass is harmless.
+    Returns (squads considered, assignments created).
+    """
+    memberships, totals, assigned = await asyncio.gather(
+        fetch_all_rows("user_squad_memberships", "id, user_id, squad_id"),
+        fetch_all_rows("care_rollups", "id, scope, hours, sessions", [("period", "all")]),
+        fetch_all_rows("caretaker_assignments", "id, squad_id", [("assigned_on", assigned_at.date().isoformat())]),
     )
+    totals_by_scope = {row["scope"]: row for row in totals}
+    already_assigned = {row["squad_id"] for row in assigned}
 
-@app.get("/")
-def root():
-    return {"status": "Is this even updating bro"}
+    squad_ids = []
+    squad_index = {}
+    member_ids, groups, hours, sessions = [], [], [], []
+    for membership in memberships:
+        if membership["squad_id"] in already_assigned:
+            continue
+        index = squad_index.get(membership["squad_id"])
+        if index is None:
+            index = squad_index[membership["squad_id"]] = len(squad_ids)
+            squad_ids.append(membership["squad_id"])
+        total = totals_by_scope.get(rollups.member_scope(membership["squad_id"], membership["user_id"]), {})
+        member_ids.append(membership["user_id"])
+        groups.append(index)
+        hours.append(total.get("hours") or 0)
+        sessions.append(total.get("sessions") or 0)
 
-@app.get("/health")
-def health_check():
-    return {"status": "OK"}
+    picks, probabilities = caretakers.pick_caretakers(groups, hours, sessions, len(squad_ids))
+    new_assignments = [
+        new_caretaker_assignment(squad_id, member_ids[pick], float(probability), assigned_at)
+        for squad_id, pick, probability in zip(squad_ids, picks, probabilities)
+        if pick >= 0
+    ]
+    for i in range(0, len(new_assignments), PAGE_SIZE):
+        await db.execute(supabase.table("caretaker_assignments").insert(new_assignments[i:i + PAGE_SIZE]))
+    await cache.delete(*(f"squad_summary:{assignment['squad_id']}" for assignment in new_assignments))
+    for assignment in new_assignments:
+        event_hub.publish(assignment["squad_id"], "caretaker.selected", assignment)
+    return len(squad_ids), len(new_assignments)
 
 
-@app.post(
-    "/login",
-    responses={
-        200: {
-            "description": "Login successful",
+async def fetch_rollups(rollup_ids):
+    """
+    Hours and sessions of the given rollup rows by id, zero for rows that
+    don't exist yet (nothing completed in that scope and period).
+    """
+    rows = await fetch_in_chunks("care_rollups", "id, hours, sessions", "id", list(rollup_ids))
+    found = {row["id"]: row for row in rows}
+    return {
+        rollup_id: {"hours": found[rollup_id]["hours"], "sessions": found[rollup_id]["sessions"]}
+        if rollup_id in found else {"hours": 0, "sessions": 0}
+        for rollup_id in rollup_ids
+    }
+
+
+def recent_weeks(weeks):
+    """week: periods of the last `weeks` weeks, most recent first."""
+    today = datetime.utcnow()
+    return [rollups.week_period(today - timedelta(weeks=i)) for i in range(weeks)]
+
+
+# Set to False the first time the record_care_completion function turns out
+# not to be installed (see sql/care_rollups.sql)
+completion_rpc_available = True
+
+
+async def record_care_completion(completion):
+    """
+    Log a completed care session and add it to its rollups and to the
+    caretaker's hours/sessions counters.
+
+    Uses the record_care_completion Postgres function so everything is
+    written atomically in one round trip. If the function is not installed,
+    falls back to a read-modify-write of the rollup rows, which can lose
+    updates under concurrent completions until the next rebuild_rollups().
+    Raises db.APIError with code 23505 if the session was already completed.
+    """
+    global completion_rpc_available
+    rollup_ids = rollups.rollup_ids(completion["user_id"], completion["squad_id"], completion["starts_at"])
+    if completion_rpc_available:
+        try:
+            response = await db.execute(supabase.rpc("record_care_completion", {
+                **{f"p_{field}": value for field, value in completion.items()},
+                "p_rollup_ids": rollup_ids,
+            }))
+            return response.data
+        except db.APIError as e:
+            # PGRST202: function not found in the schema cache
+            if e.code != "PGRST202":
+                raise
+            print("record_care_completion function not found, updating rollups without it")
+            completion_rpc_available = False
+
+    response = await db.execute(supabase.table("care_session_completions").insert(completion))
+    current, user_response = await asyncio.gather(
+        fetch_rollups(rollup_ids),
+        db.execute(supabase.table("users").select("id, hours, sessions").eq("id", completion["user_id"])),
+    )
+    rows = [
+        rollups.rollup_row(rollup_id, current[rollup_id]["hours"] + completion["hours"], current[rollup_id]["sessions"] + 1)
+        for rollup_id in rollup_ids
+    ]
+    user = user_response.data[0] if user_response.data else {}
+    await asyncio.gather(
+        db.execute(supabase.table("care_rollups").upsert(rows)),
+        db.execute(supabase.table("users").update({
+            "hours": (user.get("hours") or 0) + completion["hours"],
+            "sessions": (user.get("sessions") or 0) + 1
+        }).eq("id", completion["user_id"])),
+    )
+    return response.data[0]
+
+
+async def rebuild_rollups():
+    """
+    Recompute every care_rollups row from care_session_completions.
+
+    Writes the recomputed rows PAGE_SIZE per round trip and then deletes rows
+    no completion contributes to any more. Meant for the nightly cron, when
+    few completions race with it. The flat users.hours/sessions counters are
+    left alone, since they may include hours logged before completions were.
+    Returns (rows written, rows deleted).
+    """
+    completions, existing = await asyncio.gather(
+        fetch_all_rows("care_session_completions", "id, user_id, squad_id, starts_at, hours"),
+        fetch_all_rows("care_rollups", "id"),
+    )
+    rows = rollups.fold(completions)
+    values = list(rows.values())
+    for i in range(0, len(values), PAGE_SIZE):
+        await db.execute(supabase.table("care_rollups").upsert(values[i:i + PAGE_SIZE]))
+
+    stale = [row["id"] for row in existing if row["id"] not in rows]
+    for i in range(0, len(stale), IN_FILTER_CHUNK):
+        await db.execute(supabase.table("care_rollups").delete().in_("id", stale[i:i + IN_FILTER_CHUNK]))
+    return len(values), len(stale)
+
+
+# Read-through cache for users, squads and squad members (see cache.py)
+cache = create_cache()
+
+# Version tokens behind the ETags of cached resources (see versions.py)
+versions = create_version_table()
+
+
+async def get_or_load_versioned(key, loader, token):
+    """
+    cache.get_or_load() for a resource whose version `token` was read just
+    before. Returns (value, token): if the value had to be (re)loaded, its
+    version is bumped and the new token returned, so the ETag sent with it
+    never vouches for content fetched earlier.
+
+    A write landing during the load replaces the token, and the value may
+    predate it: the token returned is then None, so no ETag is sent, and
+    the value is dropped from the cache. The same goes for a stale value
+    served through a database outage.
+    """
+    state = "cached"
+
+    async def load():
+        nonlocal state
+        state = "loading"
+        value = await loader()
+        state = "loaded"
+        return value
+
+    value = await cache.get_or_load(key, load)
+    if state == "cached":
+        return value, token
+    if state == "loaded":
+        token = await versions.bump_if(key, token)
+        if token is not None:
+            return value, token
+        # The write may have gone through another instance, unseen by the cache
+        await cache.delete(key)
+    return value, None
+
+
+def etag_headers(token):
+    # Browsers keep the response but revalidate it with If-None-Match on every use
+    headers = {"Cache-Control": "private, no-cache"}
+    if token is not None:
+        headers["ETag"] = etag(token)
+    return headers
+
+
+def not_modified_response(token):
+    return Response(status_code=304, headers=etag_headers(token))
+
+user_search_index = UserSearchIndex()
+
+
+async def get_user_search_index():
+    """
+    Return the user search index, (re)loading it from Supabase if it is stale.
+    """
+    if user_search_index.is_stale(SEARCH_INDEX_MAX_AGE):
+        user_search_index.load(await fetch_all_rows("users", "id, nameFirst, nameLast"))
+    return user_search_index
+
+
+# Who is a member of which squad (see memberships.py)
+membership_index = create_membership_index()
+
+
+async def fetch_user_squad_ids(user_id):
+    """
+    Sorted ids of the squads the user is a member of, from the membership
+    index. Only a user the index has not loaded yet costs a query.
+    """
+    async def load():
+        rows = await fetch_all_rows("user_squad_memberships", "id, squad_id", [("user_id", user_id)])
+        return [row["squad_id"] for row in rows]
+
+    return sorted(await membership_index.squads_of(user_id, load))
+
+
+async def fetch_squad_member_ids(squad_id):
+    """
+    Sorted ids of the squad's members, from the membership index. Only a
+    squad the index has not loaded yet costs a query.
+    """
+    async def load():
+        rows = await fetch_all_rows("user_squad_memberships", "id, user_id", [("squad_id", squad_id)])
+        return [row["user_id"] for row in rows]
+
+    return sorted(await membership_index.members_of(squad_id, load))
+
+
+async def add_memberships(squad_id, *user_ids):
+    """Record in the membership index that user_ids have joined squad_id."""
+    for user_id in user_ids:
+        await membership_index.add(user_id, squad_id)
+
+
+# Per-squad calendar indexes (see care_sessions.py), least recently used first
+care_session_indexes = OrderedDict()
+
+
+async def get_care_session_index(squad_id):
+    """
+    Return the squad's calendar index, (re)loading it from Supabase if it is
+    missing or stale and evicting the least recently used squad past
+    CARE_SESSION_INDEX_SQUADS.
+    """
+    index = care_session_indexes.get(squad_id)
+    if index is None:
+        index = care_session_indexes[squad_id] = CareSessionIndex()
+        while len(care_session_indexes) > CARE_SESSION_INDEX_SQUADS:
+            care_session_indexes.popitem(last=False)
+    care_session_indexes.move_to_end(squad_id)
+    if index.is_stale(CARE_SESSION_INDEX_MAX_AGE):
+        index.load(await fetch_all_rows("care_sessions", ", ".join(CARE_SESSION_FIELDS), [("squad_id", squad_id)]))
+    return index
+
+
+# Push channel behind GET /squads/{squad_id}/events (see events.py)
+event_hub = SquadEventHub()
+
+# Publishing tasks still running, referenced so they are not garbage collected
+publish_tasks = set()
+
+
+async def publish_members(squad_id, memberships):
+    """
+    Publish membership.created with the new members' user details, shaped
+    like GET /squad-memberships/{squad_id}/members, so clients can append
+    them instead of refetching the list.
+    """
+    rows = await hydrate_users([dict(membership) for membership in memberships])
+    event_hub.publish(squad_id, "membership.created", {"members": rows})
+
+
+def publish_members_later(squad_id, memberships):
+    # The user lookup runs after the response is sent
+    task = asyncio.create_task(publish_members(squad_id, memberships))
+    publish_tasks.add(task)
+    task.add_done_callback(publish_tasks.discard)
+
+
+async def is_squad_member(squad_id, user_id):
+    return squad_id in await fetch_user_squad_ids(user_id)
+
+
+async def non_member_response(request, squad_id, message):
+    """
+    A 403 response unless the caller (from their session token, which every
+    write must carry; see tokens.py) is a member of squad_id, otherwise None.
+    """
+    if not request.state.user_id or not await is_squad_member(squad_id, request.state.user_id):
+        return JSONResponse(
+            status_code=403,
+            content={"message": message, "data": None}
+        )
+    return None
+
+
+def session_time_error(starts_at, ends_at):
+    if ends_at <= starts_at:
+        return "ends_at must be after starts_at"
+    if ends_at - starts_at > timedelta(hours=CARE_SESSION_MAX_HOURS):
+        return f"A care session may last at most {CARE_SESSION_MAX_HOURS} hours"
+    return None
+
+
+async def fetch_care_rules(squad_id):
+    rules, exceptions = await asyncio.gather(
+        fetch_all_rows("care_session_rules", ", ".join(CARE_RULE_FIELDS), [("squad_id", squad_id)]),
+        fetch_all_rows("care_session_exceptions", ", ".join(CARE_EXCEPTION_FIELDS), [("squad_id", squad_id)]),
+    )
+    return {"rules": rules, "exceptions": exceptions}
+
+
+def expand_care_rules(rules, exceptions, start, end):
+    """
+    Lazily yield the occurrences of `rules` overlapping [start, end) as
+    session dicts ordered by start, with `exceptions` applied.
+    """
+    exceptions_by_rule = {}
+    for exception in exceptions:
+        exceptions_by_rule.setdefault(exception["rule_id"], {})[to_utc(exception["occurs_at"])] = exception
+
+    def expand(rule):
+        duration = timedelta(minutes=rule["duration_minutes"])
+        rule_exceptions = exceptions_by_rule.get(rule["id"], {})
+        for occurrence in RecurrenceRule.parse(rule["rrule"]).occurrences(rule["starts_at"], duration, start, end):
+            exception = rule_exceptions.get(occurrence)
+            if exception and exception["cancelled"]:
+                continue
+            yield occurrence, {
+                "id": f"{rule['id']}:{occurrence.isoformat()}",
+                "squad_id": rule["squad_id"],
+                "caretaker_id": (exception or {}).get("caretaker_id") or rule["caretaker_id"],
+                "starts_at": occurrence.isoformat(),
+                "ends_at": (occurrence + duration).isoformat(),
+                "notes": rule["notes"],
+                "rule_id": rule["id"]
+            }
+
+    for _, session in heapq.merge(*(expand(rule) for rule in rules), key=lambda pair: pair[0]):
+        yield session
+
+
+async def fetch_recurring_sessions(squad_id, start, end):
+    """
+    Occurrences of the squad's recurring sessions overlapping [start, end).
+
+    Ranges inside the next RECURRENCE_WINDOW_WEEKS weeks are served from a
+    materialized copy of that window, cached until a rule or exception of the
+    squad changes or the day rolls over; anything else is expanded on demand.
+    """
+    # The window is only cached if the rules were not invalidated since they were read
+    generations = cache.start_fill([f"care_occurrences:{squad_id}"])
+    expanded = None
+    try:
+        data = await cache.get_or_load(f"care_rules:{squad_id}", lambda: fetch_care_rules(squad_id))
+        if not data["rules"]:
+            return []
+
+        window_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        window_end = window_start + timedelta(weeks=RECURRENCE_WINDOW_WEEKS)
+        if start < window_start or end > window_end:
+            return list(expand_care_rules(data["rules"], data["exceptions"], start, end))
+
+        window = await cache.get(f"care_occurrences:{squad_id}")
+        if window is None or window["start"] != window_start.isoformat():
+            window = {
+                "start": window_start.isoformat(),
+                "sessions": list(expand_care_rules(data["rules"], data["exceptions"], window_start, window_end))
+            }
+            expanded = {f"care_occurrences:{squad_id}": window}
+    finally:
+        await cache.finish_fill(generations, expanded)
+    return [
+        session for session in window["sessions"]
+        if to_utc(session["starts_at"]) < end and to_utc(session["ends_at"]) > start
+    ]
+
+
+async def invalidate_care_rules(squad_id):
+    await cache.delete(f"care_rules:{squad_id}", f"care_occurrences:{squad_id}")
+
+
+async def fetch_calendar(squad_id, start, end):
+    """
+    All care sessions overlapping [start, end), one-off and recurring,
+    ordered by start.
+    """
+    index, recurring = await asyncio.gather(
+        get_care_session_index(squad_id),
+        fetch_recurring_sessions(squad_id, start, end),
+    )
+    sessions = [dict(session) for session in index.overlapping(start, end)] + recurring
+    sessions.sort(key=lambda session: to_utc(session["starts_at"]))
+    return sessions
+
+
+async def fetch_rule_conflicts(squad_id, rule):
+    """
+    Sessions of the squad's calendar, one-off and recurring, that overlap an
+    occurrence of `rule` (a care_session_rules row) within
+    RECURRENCE_CONFLICT_WEEKS weeks, ordered by start.
+    """
+    start = max(to_utc(rule["starts_at"]), datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))
+    end = start + timedelta(weeks=RECURRENCE_CONFLICT_WEEKS)
+    calendar = CareSessionIndex()
+    calendar.load(await fetch_calendar(squad_id, start, end))
+    conflicts = {}
+    for occurrence in expand_care_rules([rule], [], start, end):
+        for session in calendar.overlapping(occurrence["starts_at"], occurrence["ends_at"]):
+            conflicts.setdefault(session["id"], session)
+    return sorted(conflicts.values(), key=lambda session: to_utc(session["starts_at"]))
+
+
+# Responses render with orjson; routes' response_model documents them (see responses.py)
+app = FastAPI(default_response_class=JSONResponse)
+
+# Resolve the caller from their signed access token (see tokens.py)
+app.add_middleware(tokens.TokenMiddleware)
+
+# Configure CORS to allow frontend requests
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=False,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["*"],
+)
+
+# Check bodies against their response_model, in development (see responses.py)
+if RESPONSE_VALIDATION:
+    app.add_middleware(ResponseValidationMiddleware)
+
+# Compress large JSON bodies for clients that accept it; outside the
+# validation so that sees plain JSON (see compression.py)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Outermost, so it times everything else (see metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+# Handle OPTIONS preflight requests explicitly
+@app.options("/{path:path}")
+async def options_handler(path: str):
+    return Response(
+        status_code=200,
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization",
+        }
+    )
+
+@app.get("/", response_model=schemas.Status)
+def root():
+    return {"status": "Is this even updating bro"}
+
+@app.get("/health", response_model=schemas.Status)
+def health_check():
+    return {"status": "OK"}
+
+@app.get("/cache-stats", response_model=schemas.CacheStats)
+def cache_stats():
+    return {"message": "Cache stats fetched successfully", "data": cache.stats()}
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus metrics of this process (see metrics.py). Scrapers
+    authenticate with METRICS_SECRET when it is set (see tokens.py).
+    """
+    cache_stats, event_stats = cache.stats(), event_hub.stats()
+    compressed_stats = compression.compressed_bodies.stats()
+    extra = [
+        ("cache_hits_total", "counter", "Read-through cache hits.", cache_stats["hits"]),
+        ("cache_misses_total", "counter", "Read-through cache misses.", cache_stats["misses"]),
+        ("cache_evictions_total", "counter", "Entries evicted to stay under CACHE_MAXSIZE.", cache_stats["evictions"]),
+        ("event_subscribers", "gauge", "Open squad event streams.", event_stats["subscribers"]),
+        ("events_published_total", "counter", "Squad events published.", event_stats["published"]),
+        ("events_delivered_total", "counter", "Squad events queued for subscribers.", event_stats["delivered"]),
+        ("event_resyncs_total", "counter", "Subscribers that fell behind and were told to resync.", event_stats["resyncs"]),
+        ("version_bumps_total", "counter", "ETag version tokens replaced by writes and cache reloads.", versions.stats()["bumps"]),
+        ("db_reads_in_flight", "gauge", "Distinct reads in flight, each possibly shared by several callers.", len(db.reads_in_flight)),
+        ("db_circuit_open", "gauge", "1 while the database circuit breaker is open or probing, else 0.", int(db.breaker.state != db.CircuitBreaker.CLOSED)),
+        ("db_circuit_opened_total", "counter", "Times the database circuit breaker opened.", db.breaker.opened),
+        ("cache_stale_served_total", "counter", "Expired cache entries served while the database was unavailable.", cache_stats["stale_served"]),
+        ("responses_compressed_total", "counter", "Responses sent gzip or brotli compressed.", compression.stats["compressed"]),
+        ("response_compression_in_bytes_total", "counter", "Bytes of the responses compressed, before compression.", compression.stats["bytes_in"]),
+        ("response_compression_out_bytes_total", "counter", "Bytes of the responses compressed, after compression.", compression.stats["bytes_out"]),
+        ("compressed_body_cache_hits_total", "counter", "Compressed bodies reused for an unchanged ETag.", compressed_stats["hits"]),
+        ("compressed_body_cache_bytes", "gauge", "Bytes of compressed bodies kept for reuse.", compressed_stats["bytes"]),
+        ("startup_import_seconds", "gauge", "Time this process took to import the app.", IMPORT_SECONDS),
+        ("startup_db_client_seconds", "gauge", "Time taken to build the database client; 0 until first use.", getattr(supabase, "load_seconds", None) or 0),
+    ]
+    if cache_stats["size"] is not None:
+        extra.append(("cache_entries", "gauge", "Entries in the in-process cache.", cache_stats["size"]))
+    index_stats = membership_index.stats()
+    if index_stats["entries"] is not None:
+        extra.append(("membership_index_entries", "gauge", "Users and squads in the in-process membership index.", index_stats["entries"]))
+    return Response(content=metrics.render(extra), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post(
+    "/login",
+    response_model=schemas.Login,
+    responses={
+        200: {
+            "description": "Login successful",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Login successful",
+                        "userId": "550e8400-e29b-41d4-a716-446655440000",
+                        "username": "john_doe",
+                        "accessToken": "eyJhbGciOiJIUzI1NiIsImtpZCI6ImRldiJ9...",
+                        "refreshToken": "eyJhbGciOiJIUzI1NiIsImtpZCI6ImRldiJ9...",
+                        "expiresIn": 900
+                    }
+                }
+            }
+        },
+        403: {
+            "description": "Invalid credentials",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid username or password. Please try again."}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed"}
+                }
+            }
+        }
+    }
+)
+async def login(credentials: LoginRequest):
+    try:
+        # Query Supabase for user with matching username
+        response = await db.execute(supabase.table("users").select("id, username, password").eq("username", credentials.username))
+        
+        user = response.data[0] if response.data else None
+        
+        # Check if password matches the stored scrypt hash. Unknown usernames
+        # pay for a hash too, so they cannot be told apart by response time.
+        if user is None:
+            valid, rehash = await passwords.reject_password(credentials.password)
+        else:
+            valid, rehash = await passwords.verify_password(credentials.password, user["password"])
+        if not valid:
+            return JSONResponse(
+                status_code=403,
+                content={"message": "Invalid username or password. Please try again."}
+            )
+        
+        # Upgrade plaintext passwords and hashes made with old cost settings
+        if rehash:
+            try:
+                new_hash = await passwords.hash_password(credentials.password)
+                await db.execute(supabase.table("users").update({"password": new_hash}).eq("id", user["id"]))
+            except Exception as e:
+                print(f"Password rehash failed for user {user['id']}: {str(e)}")
+        
+        # Login successful
+        return JSONResponse(
+            status_code=200,
+            content={
+                "message": "Login successful",
+                "userId": user["id"],
+                "username": user["username"],
+                **tokens.issue_token_pair(user["id"])
+            }
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}"}
+        )
+
+
+@app.post(
+    "/token/refresh",
+    response_model=schemas.Tokens,
+    responses={
+        200: {
+            "description": "Tokens refreshed",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Token refreshed",
+                        "userId": "550e8400-e29b-41d4-a716-446655440000",
+                        "accessToken": "eyJhbGciOiJIUzI1NiIsImtpZCI6ImRldiJ9...",
+                        "refreshToken": "eyJhbGciOiJIUzI1NiIsImtpZCI6ImRldiJ9...",
+                        "expiresIn": 900
+                    }
+                }
+            }
+        },
+        401: {
+            "description": "Invalid or expired refresh token",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid or expired refresh token"}
+                }
+            }
+        }
+    }
+)
+async def refresh_token(body: RefreshTokenRequest):
+    """
+    Exchange a refresh token for a new access and refresh token pair.
+    Checked against the signing keys only, without a database round trip.
+    """
+    try:
+        claims = tokens.verify_token(body.refreshToken, "refresh")
+    except tokens.jwt.InvalidTokenError:
+        return JSONResponse(
+            status_code=401,
+            content={"message": "Invalid or expired refresh token"}
+        )
+    
+    return JSONResponse(
+        status_code=200,
+        content={"message": "Token refreshed", "userId": claims["sub"], **tokens.issue_token_pair(claims["sub"])}
+    )
+
+
+@app.get(
+    "/users/search",
+    response_model=schemas.Envelope[List[schemas.UserName]],
+    responses={
+        200: {
+            "description": "Users found",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Users found",
+                        "data": [
+                            {
+                                "id": "user-uuid",
+                                "nameFirst": "John",
+                                "nameLast": "Doe"
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error", "data": []}
+                }
+            }
+        }
+    }
+)
+async def search_users(q: str = "", limit: int = 20):
+    """
+    Search users by first or last name (case-insensitive partial match).
+    Names starting with the query are ranked before names that only contain it.
+    
+    Query parameters:
+    - q: Search query to match against nameFirst and nameLast
+    - limit (optional): Maximum number of users to return (default 20, max 100)
+    """
+    try:
+        if not q.strip():
+            return JSONResponse(
+                status_code=200,
+                content={"message": "No search query provided", "data": []}
+            )
+        
+        limit = max(1, min(limit, 100))
+        matched_users = [dict(user) for user in (await get_user_search_index()).search(q, limit)]
+        
+        if not matched_users:
+            return JSONResponse(
+                status_code=200,
+                content={"message": "No users found", "data": []}
+            )
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Users found", "data": matched_users}
+        )
+    
+    except Exception as e:
+        print(f"Search error: {str(e)}")  # Log the error for debugging
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.get(
+    "/users/{user_id}",
+    response_model=schemas.Envelope[schemas.User],
+    responses={
+        200: {
+            "description": "User fetched successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "User fetched successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "nameFirst": "John",
+                            "nameLast": "Doe",
+                            "email": "john@example.com",
+                            "phoneNumber": "123-456-7890",
+                            "hours": 10,
+                            "sessions": 5
+                        }
+                    }
+                }
+            }
+        },
+        304: {
+            "description": "Unchanged since the ETag sent in If-None-Match; no body"
+        },
+        404: {
+            "description": "User not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "User not found", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        },
+        503: {
+            "description": "Database unavailable and nothing cached",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Service unavailable: Database unavailable, retry in 7s", "data": None}
+                }
+            }
+        }
+    }
+)
+async def get_user_by_id(user_id: str, request: Request):
+    """
+    Get a user's profile. The response carries an ETag; sending it back in
+    If-None-Match gets 304 Not Modified while the profile is unchanged.
+    """
+    try:
+        token = await versions.get(f"user:{user_id}")
+        if etag_matches(request.headers.get("if-none-match"), token):
+            return not_modified_response(token)
+        
+        user, token = await get_or_load_versioned(f"user:{user_id}", lambda: fetch_user_profile(user_id), token)
+        
+        if not user:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "User not found", "data": None}
+            )
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "User fetched successfully", "data": user},
+            headers=etag_headers(token)
+        )
+    
+    except db.DatabaseUnavailable as e:
+        return unavailable_response(e, None)
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.get(
+    "/users",
+    response_model=schemas.Page[schemas.User],
+    responses={
+        200: {
+            "description": "Users fetched successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Users fetched successfully",
+                        "data": [
+                            {
+                                "id": "123",
+                                "nameFirst": "John",
+                                "nameLast": "Doe",
+                                "email": "john@example.com",
+                                "phoneNumber": "123-456-7890",
+                                "hours": 10,
+                                "sessions": 5
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid query parameters",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unknown field(s): password", "data": []}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        }
+    }
+)
+
+async def get_users(limit: int = None, cursor: str = None, fields: str = None, response_format: str = Query("json", alias="format")):
+    """
+    Get all users. Passwords are never returned.
+    
+    Query parameters:
+    - limit (optional): Page size; returns one page plus `next_cursor`
+    - cursor (optional): `next_cursor` from the previous page
+    - fields (optional): Comma-separated columns to return, e.g. id,nameFirst
+    - format (optional): json (default) or ndjson to stream every row
+    """
+    try:
+        return await list_response(
+            "users", USER_FIELDS, "Users fetched successfully",
+            limit, cursor, fields, response_format
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.post(
+    "/create-user",
+    response_model=schemas.Envelope[schemas.User],
+    status_code=201,
+    responses={
+        201: {
+            "description": "User created successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "User created successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "nameFirst": "John",
+                            "nameLast": "Doe",
+                            "username": "john_doe",
+                            "email": "john@example.com",
+                            "phoneNumber": "123-456-7890",
+                            "hours": 0,
+                            "sessions": 0
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid request data",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid email format", "data": None}
+                }
+            }
+        },
+        409: {
+            "description": "User already exists",
+            "content": {
+                "application/json": {
+                    "example": {"message": "A user with this email already exists", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def create_user(user: CreateUserRequest):
+    try:
+        # Validate phone number format (basic validation for digits, dashes, spaces, parentheses)
+        phone_pattern = re.compile(r'^[\d\s\-\(\)\+]+$')
+        if not phone_pattern.match(user.phoneNumber):
+            return JSONResponse(
+                status_code=400,
+                content={"message": "Invalid phone number format. Use only digits, spaces, dashes, and parentheses.", "data": None}
+            )
+        
+        username = user.username.strip()
+        email = user.email.lower().strip()
+        
+        if not USERS_UNIQUE_CONSTRAINTS:
+            # Without the unique constraints, check both fields in one query
+            existing = await db.execute(
+                supabase.table("users").select("email, username")
+                .or_(f"email.eq.{postgrest_quote(email)},username.eq.{postgrest_quote(username)}")
+            )
+            if existing.data:
+                conflict = "email" if any(row.get("email") == email for row in existing.data) else "username"
+                return JSONResponse(
+                    status_code=409,
+                    content={"message": USER_CONFLICT_MESSAGES[conflict], "data": None}
+                )
+        
+        # Generate unique ID and prepare user data
+        user_id = str(uuid.uuid4())
+        user_data = {
+            "id": user_id,
+            "username": username,
+            "password": await passwords.hash_password(user.password),
+            "nameFirst": user.nameFirst.strip(),
+            "nameLast": user.nameLast.strip(),
+            "email": email,
+            "phoneNumber": user.phoneNumber.strip(),
+            "hours": 0,
+            "sessions": 0
+        }
+        
+        # Insert user into Supabase; the unique constraints on email and
+        # username reject duplicates in the same round trip
+        try:
+            response = await db.execute(supabase.table("users").insert(user_data))
+        except db.APIError as e:
+            if e.code != "23505":  # unique_violation
+                raise
+            return JSONResponse(
+                status_code=409,
+                content={"message": user_conflict_message(e), "data": None}
+            )
+        
+        if response.data:
+            created_user = response.data[0]
+            # Never send the password hash back to the client
+            created_user.pop("password", None)
+            # Make the new user searchable without reloading the index
+            user_search_index.add(created_user)
+            await cache.set(f"user:{user_id}", {
+                field: created_user.get(field)
+                for field in ("id", "nameFirst", "nameLast", "email", "phoneNumber", "hours", "sessions")
+            })
+            await versions.bump(f"user:{user_id}")
+            return JSONResponse(
+                status_code=201,
+                content={"message": "User created successfully", "data": created_user}
+            )
+        else:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to create user", "data": None}
+            )
+    
+    except Exception as e:
+        error_message = str(e)
+        # Check for common Supabase errors
+        if "duplicate" in error_message.lower() or "unique" in error_message.lower():
+            return JSONResponse(
+                status_code=409,
+                content={"message": "A user with this email or phone number already exists", "data": None}
+            )
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {error_message}", "data": None}
+        )
+
+
+@app.get(
+    "/squads",
+    response_model=schemas.Page[schemas.Squad],
+    responses={
+        200: {
+            "description": "Squads fetched successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Squads fetched successfully",
+                        "data": [
+                            {
+                                "id": "550e8400-e29b-41d4-a716-446655440000",
+                                "name": "Smith Family",
+                                "nameMom": "Jane Smith"
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        304: {
+            "description": "Unchanged since the ETag sent in If-None-Match; no body"
+        },
+        400: {
+            "description": "Invalid query parameters",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unknown field(s): password", "data": []}
+                }
+            }
+        },
+        404: {
+            "description": "No squads found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "No squads found", "data": []}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        },
+        503: {
+            "description": "Database unavailable and nothing cached",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Service unavailable: Database unavailable, retry in 7s", "data": []}
+                }
+            }
+        }
+    }
+)
+async def get_squads(request: Request, limit: int = None, cursor: str = None, fields: str = None, response_format: str = Query("json", alias="format")):
+    """
+    Get all squads.
+    
+    Query parameters:
+    - limit (optional): Page size; returns one page plus `next_cursor`
+    - cursor (optional): `next_cursor` from the previous page
+    - fields (optional): Comma-separated columns to return, e.g. id,nameFirst
+    - format (optional): json (default) or ndjson to stream every row
+    
+    Without parameters the response carries an ETag; sending it back in
+    If-None-Match gets 304 Not Modified until a squad is created.
+    """
+    try:
+        if limit is not None or cursor or fields or response_format != "json":
+            return await list_response(
+                "squad", SQUAD_FIELDS, "Squads fetched successfully",
+                limit, cursor, fields, response_format
+            )
+        
+        token = await versions.get("squads")
+        if etag_matches(request.headers.get("if-none-match"), token):
+            return not_modified_response(token)
+        
+        squads_data, token = await get_or_load_versioned("squads", fetch_squads, token)
+        
+        if squads_data is None:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "No squads found", "data": []}
+            )
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Squads fetched successfully", "data": squads_data},
+            headers=etag_headers(token)
+        )
+    
+    except db.DatabaseUnavailable as e:
+        return unavailable_response(e, [])
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.post(
+    "/squads",
+    response_model=schemas.SquadCreated,
+    status_code=201,
+    responses={
+        201: {
+            "description": "Squad created successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Squad created successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "name": "Smith Family",
+                            "nameMom": "Jane Smith"
+                        },
+                        "membership": {
+                            "id": "660e8400-e29b-41d4-a716-446655440000",
+                            "user_id": "user-uuid",
+                            "squad_id": "550e8400-e29b-41d4-a716-446655440000",
+                            "primary": True,
+                            "joined_at": "2024-01-15T10:30:00"
+                        }
+                    }
+                }
+            }
+        },
+        403: {
+            "description": "Squad creator does not match the session token",
+            "content": {
+                "application/json": {
+                    "example": {"message": "You can only create squads for yourself", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def create_squad(squad: CreateSquadRequest, request: Request):
+    """
+    Create a new squad with auto-generated UUID.
+    Also creates a squad membership for the creator as admin.
+    
+    Sample Postman request body:
+    {
+        "name": "Smith Family",
+        "nameMom": "Jane Smith",
+        "user_id": "550e8400-e29b-41d4-a716-446655440000"
+    }
+    """
+    # Only the caller can be made the squad's admin
+    if request.state.user_id != squad.user_id:
+        return JSONResponse(
+            status_code=403,
+            content={"message": "You can only create squads for yourself", "data": None}
+        )
+    
+    try:
+        # Generate unique IDs and prepare squad and admin membership data
+        squad_id = str(uuid.uuid4())
+        squad_data = {
+            "id": squad_id,
+            "name": squad.name.strip(),
+            "nameMom": squad.nameMom.strip()
+        }
+        membership_data = {
+            "id": str(uuid.uuid4()),
+            "user_id": squad.user_id,
+            "squad_id": squad_id,
+            "primary": True,  # Creator is admin
+            "joined_at": datetime.utcnow().isoformat()
+        }
+        
+        created_squad, created_membership = await create_squad_with_admin(squad_data, membership_data)
+        
+        if created_squad:
+            await cache.delete("squads", f"squad_members:{squad_id}")
+            await versions.bump("squads", f"squad_members:{squad_id}")
+            await add_memberships(squad_id, squad.user_id)
+            
+            return JSONResponse(
+                status_code=201,
+                content={"message": "Squad created successfully", "data": created_squad, "membership": created_membership}
+            )
+        else:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to create squad", "data": None}
+            )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.post(
+    "/squads/{squad_id}/caretaker",
+    response_model=schemas.Envelope[schemas.CaretakerAssignment],
+    status_code=201,
+    responses={
+        201: {
+            "description": "Caretaker selected and recorded",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Caretaker selected successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "user_id": "user-uuid",
+                            "assigned_on": "2024-01-15",
+                            "assigned_at": "2024-01-15T10:30:00",
+                            "probability": 0.42,
+                            "user": {
+                                "id": "user-uuid",
+                                "nameFirst": "John",
+                                "nameLast": "Doe"
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can pick a caretaker", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "Squad has no members",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Squad has no members", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def select_caretaker(squad_id: str, request: Request):
+    """
+    Pick the squad's next caretaker and record the pick.
+    
+    The draw is weighted towards members with fewer hours and sessions in
+    this squad (see caretakers.py and rollups.py) and stored in
+    caretaker_assignments together with the chance the chosen member had.
+    """
+    try:
+        memberships = [{"user_id": user_id} for user_id in await fetch_squad_member_ids(squad_id)]
+        rows, totals = await asyncio.gather(
+            hydrate_users(memberships),
+            fetch_rollups([rollups.rollup_id(rollups.member_scope(squad_id, row["user_id"])) for row in memberships]),
+        )
+        members = [
+            {**row["user"], **totals[rollups.rollup_id(rollups.member_scope(squad_id, row["user_id"]))]}
+            for row in rows if "user" in row
+        ]
+        
+        if not members:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "Squad has no members", "data": None}
+            )
+        
+        # Only members of the squad may spin
+        if request.state.user_id not in {member["id"] for member in members}:
+            return JSONResponse(
+                status_code=403,
+                content={"message": "Only squad members can pick a caretaker", "data": None}
+            )
+        
+        member, probability = caretakers.pick_caretaker(members)
+        assignment = new_caretaker_assignment(squad_id, member["id"], probability, datetime.utcnow())
+        response = await db.execute(supabase.table("caretaker_assignments").insert(assignment))
+        
+        if not response.data:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to record caretaker", "data": None}
+            )
+        
+        data = response.data[0]
+        data["user"] = {field: member[field] for field in ("id", "nameFirst", "nameLast")}
+        await cache.delete(f"squad_summary:{squad_id}")
+        event_hub.publish(squad_id, "caretaker.selected", data)
+        return JSONResponse(
+            status_code=201,
+            content={"message": "Caretaker selected successfully", "data": data}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.get(
+    "/squads/{squad_id}/caretaker",
+    response_model=schemas.Envelope[schemas.CaretakerAssignment],
+    responses={
+        200: {
+            "description": "Most recent caretaker of the squad",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Caretaker fetched successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "user_id": "user-uuid",
+                            "assigned_on": "2024-01-15",
+                            "assigned_at": "2024-01-15T10:30:00",
+                            "probability": 0.42,
+                            "user": {
+                                "id": "user-uuid",
+                                "nameFirst": "John",
+                                "nameLast": "Doe"
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        404: {
+            "description": "No caretaker picked yet",
+            "content": {
+                "application/json": {
+                    "example": {"message": "No caretaker has been picked for this squad", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def get_caretaker(squad_id: str):
+    """
+    Get the squad's current caretaker, i.e. the most recent pick.
+    """
+    try:
+        caretaker = await fetch_current_caretaker(squad_id)
+        
+        if not caretaker:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "No caretaker has been picked for this squad", "data": None}
+            )
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Caretaker fetched successfully", "data": caretaker}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.get(
+    "/caretakers/nightly",
+    response_model=schemas.Envelope[schemas.NightlyAssignment],
+    responses={
+        200: {
+            "description": "Nightly caretaker pass completed",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Caretakers assigned",
+                        "data": {"squads": 1200, "assigned": 1200, "seconds": 3.2}
+                    }
+                }
+            }
+        },
+        401: {
+            "description": "Missing or wrong cron secret",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Cron secret required"}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def assign_caretakers_nightly():
+    """
+    Assign today's caretaker for every squad in one batch.
+    
+    Run by the Vercel cron in vercel.json, authenticated with CRON_SECRET
+    (see tokens.py). Squads that already have a caretaker for today are
+    left alone.
+    """
+    try:
+        started = asyncio.get_running_loop().time()
+        squads, assigned = await assign_all_caretakers(datetime.utcnow())
+        seconds = round(asyncio.get_running_loop().time() - started, 3)
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Caretakers assigned", "data": {"squads": squads, "assigned": assigned, "seconds": seconds}}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.post(
+    "/squads/{squad_id}/sessions",
+    response_model=schemas.Envelope[schemas.CareSession],
+    status_code=201,
+    responses={
+        201: {
+            "description": "Care session created successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Care session created successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "caretaker_id": "user-uuid",
+                            "starts_at": "2024-01-15T09:00:00",
+                            "ends_at": "2024-01-15T13:00:00",
+                            "notes": "Doctor's appointment at 10"
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid session times or caretaker",
+            "content": {
+                "application/json": {
+                    "example": {"message": "ends_at must be after starts_at", "data": None}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can add care sessions", "data": None}
+                }
+            }
+        },
+        409: {
+            "description": "Session overlaps existing sessions of the squad",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Session overlaps existing sessions",
+                        "data": [
+                            {
+                                "id": "660e8400-e29b-41d4-a716-446655440000",
+                                "squad_id": "squad-uuid",
+                                "caretaker_id": "other-user-uuid",
+                                "starts_at": "2024-01-15T12:00:00",
+                                "ends_at": "2024-01-15T18:00:00",
+                                "notes": None
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def create_care_session(squad_id: str, session: CreateCareSessionRequest, request: Request):
+    """
+    Add a care session to the squad's calendar.
+    
+    Sessions of a squad may not overlap each other or an occurrence of a
+    recurring session; a conflicting session is answered with 409 and the
+    sessions it overlaps. caretaker_id is optional and must be a member of
+    the squad.
+    
+    Sample Postman request body:
+    {
+        "starts_at": "2024-01-15T09:00:00",
+        "ends_at": "2024-01-15T13:00:00",
+        "caretaker_id": "550e8400-e29b-41d4-a716-446655440000",
+        "notes": "Doctor's appointment at 10"
+    }
+    """
+    starts_at, ends_at = to_utc(session.starts_at), to_utc(session.ends_at)
+    error = session_time_error(starts_at, ends_at)
+    if error:
+        return JSONResponse(
+            status_code=400,
+            content={"message": error, "data": None}
+        )
+    
+    try:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can add care sessions")
+        if forbidden:
+            return forbidden
+        
+        if session.caretaker_id and not await is_squad_member(squad_id, session.caretaker_id):
+            return JSONResponse(
+                status_code=400,
+                content={"message": "The caretaker must be a member of this squad", "data": None}
+            )
+        
+        conflicts = await fetch_calendar(squad_id, starts_at, ends_at)
+        if conflicts:
+            return JSONResponse(
+                status_code=409,
+                content={"message": "Session overlaps existing sessions", "data": conflicts}
+            )
+        
+        session_data = {
+            "id": str(uuid.uuid4()),
+            "squad_id": squad_id,
+            "caretaker_id": session.caretaker_id,
+            "starts_at": starts_at.isoformat(),
+            "ends_at": ends_at.isoformat(),
+            "notes": session.notes
+        }
+        try:
+            response = await db.execute(supabase.table("care_sessions").insert(session_data))
+        except db.APIError as e:
+            # 23P01: exclusion_violation, a session written through another
+            # instance that this index has not seen yet
+            if e.code != "23P01":
+                raise
+            care_session_indexes.pop(squad_id, None)
+            return JSONResponse(
+                status_code=409,
+                content={"message": "Session overlaps existing sessions", "data": []}
+            )
+        
+        if response.data:
+            if squad_id in care_session_indexes:
+                care_session_indexes[squad_id].add(response.data[0])
+            event_hub.publish(squad_id, "session.created", response.data[0])
+            return JSONResponse(
+                status_code=201,
+                content={"message": "Care session created successfully", "data": response.data[0]}
+            )
+        else:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to create care session", "data": None}
+            )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.get(
+    "/squads/{squad_id}/sessions",
+    response_model=schemas.Envelope[List[schemas.CareSession]],
+    responses={
+        200: {
+            "description": "Care sessions in the requested range",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Care sessions fetched successfully",
+                        "data": [
+                            {
+                                "id": "550e8400-e29b-41d4-a716-446655440000",
+                                "squad_id": "squad-uuid",
+                                "caretaker_id": "user-uuid",
+                                "starts_at": "2024-01-15T09:00:00",
+                                "ends_at": "2024-01-15T13:00:00",
+                                "notes": "Doctor's appointment at 10",
+                                "caretaker": {
+                                    "id": "user-uuid",
+                                    "nameFirst": "John",
+                                    "nameLast": "Doe"
+                                }
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid range",
+            "content": {
+                "application/json": {
+                    "example": {"message": "end must be after start", "data": []}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        }
+    }
+)
+async def get_care_sessions(squad_id: str, start: datetime, end: datetime):
+    """
+    List the squad's care sessions overlapping a date range, ordered by start.
+    Occurrences of recurring sessions are included, with the id
+    "<rule_id>:<start>" and their rule_id.
+    
+    Query parameters:
+    - start: beginning of the range (ISO 8601)
+    - end: end of the range (ISO 8601, exclusive)
+    """
+    start, end = to_utc(start), to_utc(end)
+    if end <= start:
+        return JSONResponse(
+            status_code=400,
+            content={"message": "end must be after start", "data": []}
+        )
+    
+    try:
+        sessions = await fetch_calendar(squad_id, start, end)
+        await hydrate_users(sessions, user_key="caretaker_id", target="caretaker")
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Care sessions fetched successfully", "data": sessions}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.get(
+    "/squads/{squad_id}/sessions/on-duty",
+    response_model=schemas.Envelope[List[schemas.CareSession]],
+    responses={
+        200: {
+            "description": "Sessions in progress at the given time",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "On-duty sessions fetched successfully",
+                        "data": [
+                            {
+                                "id": "550e8400-e29b-41d4-a716-446655440000",
+                                "squad_id": "squad-uuid",
+                                "caretaker_id": "user-uuid",
+                                "starts_at": "2024-01-15T09:00:00",
+                                "ends_at": "2024-01-15T13:00:00",
+                                "notes": "Doctor's appointment at 10",
+                                "caretaker": {
+                                    "id": "user-uuid",
+                                    "nameFirst": "John",
+                                    "nameLast": "Doe"
+                                }
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        }
+    }
+)
+async def get_on_duty(squad_id: str, at: datetime = None):
+    """
+    Who's on duty: the squad's care sessions in progress at a given time.
+    
+    Query parameters:
+    - at: the time to check (ISO 8601, defaults to now)
+    """
+    try:
+        moment = to_utc(at or datetime.utcnow())
+        sessions = await fetch_calendar(squad_id, moment, moment + timedelta(microseconds=1))
+        await hydrate_users(sessions, user_key="caretaker_id", target="caretaker")
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "On-duty sessions fetched successfully", "data": sessions}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.put(
+    "/squads/{squad_id}/sessions/{session_id}/caretaker",
+    response_model=schemas.Envelope[schemas.CareSession],
+    responses={
+        200: {
+            "description": "Caretaker assigned successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Caretaker assigned successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "caretaker_id": "user-uuid",
+                            "starts_at": "2024-01-15T09:00:00",
+                            "ends_at": "2024-01-15T13:00:00",
+                            "notes": "Doctor's appointment at 10"
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Caretaker is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "The caretaker must be a member of this squad", "data": None}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can assign caretakers", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "Session not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Care session not found", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def assign_session_caretaker(squad_id: str, session_id: str, assignment: AssignCaretakerRequest, request: Request):
+    """
+    Assign a squad member as the caretaker of a care session.
+    
+    Sample Postman request body:
+    {
+        "user_id": "550e8400-e29b-41d4-a716-446655440000"
+    }
+    """
+    try:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can assign caretakers")
+        if forbidden:
+            return forbidden
+        
+        if not await is_squad_member(squad_id, assignment.user_id):
+            return JSONResponse(
+                status_code=400,
+                content={"message": "The caretaker must be a member of this squad", "data": None}
+            )
+        
+        response = await db.execute(
+            supabase.table("care_sessions").update({"caretaker_id": assignment.user_id})
+            .eq("id", session_id).eq("squad_id", squad_id)
+        )
+        
+        if not response.data:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "Care session not found", "data": None}
+            )
+        
+        if squad_id in care_session_indexes:
+            care_session_indexes[squad_id].add(response.data[0])
+        event_hub.publish(squad_id, "session.updated", response.data[0])
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Caretaker assigned successfully", "data": response.data[0]}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.post(
+    "/squads/{squad_id}/session-rules",
+    response_model=schemas.Envelope[schemas.CareRule],
+    status_code=201,
+    responses={
+        201: {
+            "description": "Recurring care session created successfully",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Recurring care session created successfully",
+                        "data": {
+                            "id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "caretaker_id": "user-uuid",
+                            "rrule": "FREQ=WEEKLY;BYDAY=MO,TH",
+                            "starts_at": "2024-01-15T09:00:00",
+                            "duration_minutes": 240,
+                            "notes": "Groceries and lunch"
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid rule or caretaker",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid rrule: FREQ must be DAILY or WEEKLY", "data": None}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can add care sessions", "data": None}
+                }
+            }
+        },
+        409: {
+            "description": "Occurrences overlap existing sessions of the squad",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Recurring session overlaps existing sessions",
+                        "data": [
+                            {
+                                "id": "660e8400-e29b-41d4-a716-446655440000",
+                                "squad_id": "squad-uuid",
+                                "caretaker_id": "other-user-uuid",
+                                "starts_at": "2024-01-18T12:00:00",
+                                "ends_at": "2024-01-18T18:00:00",
+                                "notes": None
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def create_care_session_rule(squad_id: str, rule: CreateCareSessionRuleRequest, request: Request):
+    """
+    Add a recurring care session to the squad's calendar.
+    
+    rrule supports FREQ=DAILY|WEEKLY with INTERVAL, BYDAY (weekly only) and
+    COUNT or UNTIL (see recurrence.py). Occurrences are expanded when the
+    calendar is read rather than stored.
+    
+    Like one-off sessions, occurrences may not overlap other sessions of
+    the squad. They are checked over the next RECURRENCE_CONFLICT_WEEKS
+    weeks; a conflicting rule is answered with 409 and the sessions it
+    overlaps.
+    
+    Sample Postman request body:
+    {
+        "rrule": "FREQ=WEEKLY;BYDAY=MO,TH",
+        "starts_at": "2024-01-15T09:00:00",
+        "duration_minutes": 240,
+        "caretaker_id": "550e8400-e29b-41d4-a716-446655440000",
+        "notes": "Groceries and lunch"
+    }
+    """
+    try:
+        RecurrenceRule.parse(rule.rrule)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"message": f"Invalid rrule: {str(e)}", "data": None}
+        )
+    if rule.duration_minutes > CARE_SESSION_MAX_HOURS * 60:
+        return JSONResponse(
+            status_code=400,
+            content={"message": f"A care session may last at most {CARE_SESSION_MAX_HOURS} hours", "data": None}
+        )
+    
+    try:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can add care sessions")
+        if forbidden:
+            return forbidden
+        
+        if rule.caretaker_id and not await is_squad_member(squad_id, rule.caretaker_id):
+            return JSONResponse(
+                status_code=400,
+                content={"message": "The caretaker must be a member of this squad", "data": None}
+            )
+        
+        rule_data = {
+            "id": str(uuid.uuid4()),
+            "squad_id": squad_id,
+            "caretaker_id": rule.caretaker_id,
+            "rrule": rule.rrule.strip().upper(),
+            "starts_at": to_utc(rule.starts_at).isoformat(),
+            "duration_minutes": rule.duration_minutes,
+            "notes": rule.notes
+        }
+        conflicts = await fetch_rule_conflicts(squad_id, rule_data)
+        if conflicts:
+            return JSONResponse(
+                status_code=409,
+                content={"message": "Recurring session overlaps existing sessions", "data": conflicts}
+            )
+        
+        response = await db.execute(supabase.table("care_session_rules").insert(rule_data))
+        
+        if response.data:
+            await invalidate_care_rules(squad_id)
+            event_hub.publish(squad_id, "rule.created", response.data[0])
+            return JSONResponse(
+                status_code=201,
+                content={"message": "Recurring care session created successfully", "data": response.data[0]}
+            )
+        else:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to create recurring care session", "data": None}
+            )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.get(
+    "/squads/{squad_id}/session-rules",
+    response_model=schemas.Envelope[List[schemas.CareRule]],
+    responses={
+        200: {
+            "description": "Recurring care sessions of the squad",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Recurring care sessions fetched successfully",
+                        "data": [
+                            {
+                                "id": "550e8400-e29b-41d4-a716-446655440000",
+                                "squad_id": "squad-uuid",
+                                "caretaker_id": "user-uuid",
+                                "rrule": "FREQ=WEEKLY;BYDAY=MO,TH",
+                                "starts_at": "2024-01-15T09:00:00",
+                                "duration_minutes": 240,
+                                "notes": "Groceries and lunch",
+                                "exceptions": [
+                                    {
+                                        "id": "660e8400-e29b-41d4-a716-446655440000",
+                                        "rule_id": "550e8400-e29b-41d4-a716-446655440000",
+                                        "squad_id": "squad-uuid",
+                                        "occurs_at": "2024-01-18T09:00:00",
+                                        "cancelled": True,
+                                        "caretaker_id": None
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        },
+        503: {
+            "description": "Database unavailable and nothing cached",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Service unavailable: Database unavailable, retry in 7s", "data": []}
+                }
+            }
+        }
+    }
+)
+async def get_care_session_rules(squad_id: str):
+    """
+    Get the squad's recurring care sessions with their exceptions.
+    """
+    try:
+        data = await cache.get_or_load(f"care_rules:{squad_id}", lambda: fetch_care_rules(squad_id))
+        rules = [{**rule, "exceptions": []} for rule in data["rules"]]
+        rules_by_id = {rule["id"]: rule for rule in rules}
+        for exception in data["exceptions"]:
+            if exception["rule_id"] in rules_by_id:
+                rules_by_id[exception["rule_id"]]["exceptions"].append(exception)
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Recurring care sessions fetched successfully", "data": rules}
+        )
+    
+    except db.DatabaseUnavailable as e:
+        return unavailable_response(e, [])
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+@app.delete(
+    "/squads/{squad_id}/session-rules/{rule_id}",
+    response_model=schemas.Envelope[None],
+    responses={
+        200: {
+            "description": "Recurring care session deleted",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Recurring care session deleted successfully", "data": None}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can remove care sessions", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "Rule not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Recurring care session not found", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
+                }
+            }
+        }
+    }
+)
+async def delete_care_session_rule(squad_id: str, rule_id: str, request: Request):
+    """
+    Stop a recurring care session. Its exceptions are deleted with it.
+    """
+    try:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can remove care sessions")
+        if forbidden:
+            return forbidden
+        
+        response = await db.execute(supabase.table("care_session_rules").delete().eq("id", rule_id).eq("squad_id", squad_id))
+        await invalidate_care_rules(squad_id)
+        
+        if not response.data:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "Recurring care session not found", "data": None}
+            )
+        
+        event_hub.publish(squad_id, "rule.deleted", {"id": rule_id})
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Recurring care session deleted successfully", "data": None}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": None}
+        )
+
+
+@app.post(
+    "/squads/{squad_id}/session-rules/{rule_id}/exceptions",
+    response_model=schemas.Envelope[schemas.CareException],
+    status_code=201,
+    responses={
+        201: {
+            "description": "Occurrence cancelled or reassigned",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Exception created successfully",
+                        "data": {
+                            "id": "660e8400-e29b-41d4-a716-446655440000",
+                            "rule_id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "occurs_at": "2024-01-18T09:00:00",
+                            "cancelled": True,
+                            "caretaker_id": None
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Not an occurrence of the rule, or invalid caretaker",
             "content": {
                 "application/json": {
-                    "example": {
-                        "message": "Login successful",
-                        "userId": "550e8400-e29b-41d4-a716-446655440000",
-                        "username": "john_doe"
-                    }
+                    "example": {"message": "occurs_at is not an occurrence of this rule", "data": None}
                 }
             }
         },
         403: {
-            "description": "Invalid credentials",
+            "description": "Caller is not a member of the squad",
             "content": {
                 "application/json": {
-                    "example": {"message": "Invalid username or password. Please try again."}
+                    "example": {"message": "Only squad members can change care sessions", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "Rule not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Recurring care session not found", "data": None}
+                }
+            }
+        },
+        409: {
+            "description": "The occurrence already has an exception",
+            "content": {
+                "application/json": {
+                    "example": {"message": "This occurrence already has an exception", "data": None}
                 }
             }
         },
@@ -110,155 +2779,275 @@ def health_check():
             "description": "Internal server error",
             "content": {
                 "application/json": {
-                    "example": {"message": "Internal server error: Database connection failed"}
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
                 }
             }
         }
     }
 )
-async def login(credentials: LoginRequest):
+async def create_care_session_exception(squad_id: str, rule_id: str, exception: CreateCareSessionExceptionRequest, request: Request):
+    """
+    Cancel one occurrence of a recurring care session, or hand it to another
+    caretaker.
+    
+    Sample Postman request body:
+    {
+        "occurs_at": "2024-01-18T09:00:00",
+        "cancelled": false,
+        "caretaker_id": "550e8400-e29b-41d4-a716-446655440000"
+    }
+    """
     try:
-        # Query Supabase for user with matching username
-        response = supabase.table("users").select("id, username, password").eq("username", credentials.username).execute()
+        forbidden = await non_member_response(request, squad_id, "Only squad members can change care sessions")
+        if forbidden:
+            return forbidden
         
-        # Check if user exists
-        if not response.data or len(response.data) == 0:
+        data = await cache.get_or_load(f"care_rules:{squad_id}", lambda: fetch_care_rules(squad_id))
+        rule = next((rule for rule in data["rules"] if rule["id"] == rule_id), None)
+        if rule is None:
             return JSONResponse(
-                status_code=403,
-                content={"message": "Invalid username or password. Please try again."}
+                status_code=404,
+                content={"message": "Recurring care session not found", "data": None}
             )
         
-        user = response.data[0]
+        occurs_at = to_utc(exception.occurs_at)
+        duration = timedelta(minutes=rule["duration_minutes"])
+        occurrences = RecurrenceRule.parse(rule["rrule"]).occurrences(rule["starts_at"], duration, occurs_at, occurs_at + timedelta(microseconds=1))
+        if occurs_at not in occurrences:
+            return JSONResponse(
+                status_code=400,
+                content={"message": "occurs_at is not an occurrence of this rule", "data": None}
+            )
         
-        # Check if password matches
-        # Note: In production, you should use proper password hashing!
-        if user["password"] != credentials.password:
+        if exception.caretaker_id and not await is_squad_member(squad_id, exception.caretaker_id):
             return JSONResponse(
-                status_code=403,
-                content={"message": "Invalid username or password. Please try again."}
+                status_code=400,
+                content={"message": "The caretaker must be a member of this squad", "data": None}
             )
         
-        # Login successful
-        return JSONResponse(
-            status_code=200,
-            content={
-                "message": "Login successful",
-                "userId": user["id"],
-                "username": user["username"]
-            }
-        )
+        exception_data = {
+            "id": str(uuid.uuid4()),
+            "rule_id": rule_id,
+            "squad_id": squad_id,
+            "occurs_at": occurs_at.isoformat(),
+            "cancelled": exception.cancelled,
+            "caretaker_id": exception.caretaker_id
+        }
+        try:
+            response = await db.execute(supabase.table("care_session_exceptions").insert(exception_data))
+        except db.APIError as e:
+            # 23505: unique (rule_id, occurs_at)
+            if e.code != "23505":
+                raise
+            return JSONResponse(
+                status_code=409,
+                content={"message": "This occurrence already has an exception", "data": None}
+            )
+        
+        if response.data:
+            await invalidate_care_rules(squad_id)
+            event_hub.publish(squad_id, "rule.exception", response.data[0])
+            return JSONResponse(
+                status_code=201,
+                content={"message": "Exception created successfully", "data": response.data[0]}
+            )
+        else:
+            return JSONResponse(
+                status_code=500,
+                content={"message": "Failed to create exception", "data": None}
+            )
     
     except Exception as e:
         return JSONResponse(
             status_code=500,
-            content={"message": f"Internal server error: {str(e)}"}
+            content={"message": f"Internal server error: {str(e)}", "data": None}
         )
 
 
-@app.get(
-    "/users/search",
+@app.post(
+    "/squads/{squad_id}/sessions/{session_id}/complete",
+    response_model=schemas.Envelope[schemas.CareCompletion],
+    status_code=201,
     responses={
-        200: {
-            "description": "Users found",
+        201: {
+            "description": "Care session completed and added to the caretaker's totals",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "Users found",
-                        "data": [
-                            {
-                                "id": "user-uuid",
-                                "nameFirst": "John",
-                                "nameLast": "Doe"
-                            }
-                        ]
+                        "message": "Care session completed successfully",
+                        "data": {
+                            "id": "770e8400-e29b-41d4-a716-446655440000",
+                            "session_id": "550e8400-e29b-41d4-a716-446655440000",
+                            "squad_id": "squad-uuid",
+                            "user_id": "user-uuid",
+                            "starts_at": "2024-01-15T09:00:00",
+                            "ends_at": "2024-01-15T13:00:00",
+                            "hours": 4.0,
+                            "completed_at": "2024-01-15T13:05:00"
+                        }
                     }
                 }
             }
         },
+        400: {
+            "description": "Session has no caretaker or has not started",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Assign a caretaker before completing the session", "data": None}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can complete care sessions", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "Session not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Care session not found", "data": None}
+                }
+            }
+        },
+        409: {
+            "description": "Session already completed",
+            "content": {
+                "application/json": {
+                    "example": {"message": "This session has already been completed", "data": None}
+                }
+            }
+        },
         500: {
             "description": "Internal server error",
             "content": {
                 "application/json": {
-                    "example": {"message": "Internal server error", "data": []}
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
                 }
             }
         }
     }
 )
-async def search_users(q: str = ""):
+async def complete_care_session(squad_id: str, session_id: str, request: Request):
     """
-    Search users by first name (case-insensitive partial match).
+    Mark a care session as done and credit its hours to the caretaker.
     
-    Query parameters:
-    - q: Search query to match against nameFirst
+    Works for one-off sessions and for occurrences of recurring sessions
+    (id "<rule_id>:<start>"). The hours are added to the caretaker's,
+    the squad's and the caretaker-in-squad rollups for all time, the day and
+    the week (see rollups.py). Each session can be completed once.
     """
     try:
-        if not q:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can complete care sessions")
+        if forbidden:
+            return forbidden
+        
+        # The session and its caretaker are read from the database rather
+        # than the calendar index or the cached rules, which may not have
+        # seen a reassignment made through another instance yet
+        if ":" in session_id:
+            try:
+                moment = to_utc(session_id.partition(":")[2])
+            except ValueError:
+                moment = None
+            candidates = []
+            if moment:
+                data = await fetch_care_rules(squad_id)
+                candidates = list(expand_care_rules(data["rules"], data["exceptions"], moment, moment + timedelta(microseconds=1)))
+        else:
+            try:
+                uuid.UUID(session_id)
+            except ValueError:
+                candidates = []
+            else:
+                response = await db.execute(
+                    supabase.table("care_sessions").select(", ".join(CARE_SESSION_FIELDS)).eq("id", session_id).eq("squad_id", squad_id).limit(1)
+                )
+                candidates = response.data
+        session = next((candidate for candidate in candidates if candidate and candidate["id"] == session_id), None)
+        
+        if session is None:
             return JSONResponse(
-                status_code=200,
-                content={"message": "No search query provided", "data": []}
+                status_code=404,
+                content={"message": "Care session not found", "data": None}
+            )
+        if not session["caretaker_id"]:
+            return JSONResponse(
+                status_code=400,
+                content={"message": "Assign a caretaker before completing the session", "data": None}
             )
         
-        # Fetch all users and filter in Python for compatibility
-        response = supabase.table("users").select("id, nameFirst, nameLast").execute()
-        
-        if not response.data:
+        starts_at, ends_at = to_utc(session["starts_at"]), to_utc(session["ends_at"])
+        now = datetime.utcnow()
+        if starts_at > now:
             return JSONResponse(
-                status_code=200,
-                content={"message": "No users found", "data": []}
+                status_code=400,
+                content={"message": "The session has not started yet", "data": None}
             )
         
-        # Filter users whose nameFirst contains the search query (case-insensitive)
-        q_lower = q.lower()
-        filtered_users = [
-            user for user in response.data 
-            if user.get("nameFirst", "").lower().startswith(q_lower) or 
-               q_lower in user.get("nameFirst", "").lower()
-        ]
+        completion = {
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "squad_id": squad_id,
+            "user_id": session["caretaker_id"],
+            "starts_at": starts_at.isoformat(),
+            "ends_at": ends_at.isoformat(),
+            "hours": round((ends_at - starts_at).total_seconds() / 3600, 4),
+            "completed_at": now.isoformat()
+        }
+        try:
+            data = await record_care_completion(completion)
+        except db.APIError as e:
+            # 23505: the session_id is already in care_session_completions
+            if e.code != "23505":
+                raise
+            return JSONResponse(
+                status_code=409,
+                content={"message": "This session has already been completed", "data": None}
+            )
         
+        await cache.delete(f"user:{session['caretaker_id']}")
+        await versions.bump(f"user:{session['caretaker_id']}")
+        event_hub.publish(squad_id, "session.completed", completion)
         return JSONResponse(
-            status_code=200,
-            content={"message": "Users found", "data": filtered_users}
+            status_code=201,
+            content={"message": "Care session completed successfully", "data": data}
         )
     
     except Exception as e:
-        print(f"Search error: {str(e)}")  # Log the error for debugging
         return JSONResponse(
             status_code=500,
-            content={"message": f"Internal server error: {str(e)}", "data": []}
+            content={"message": f"Internal server error: {str(e)}", "data": None}
         )
 
 
 @app.get(
-    "/users/{user_id}",
+    "/users/{user_id}/stats",
+    response_model=schemas.Envelope[schemas.UserStats],
     responses={
         200: {
-            "description": "User fetched successfully",
+            "description": "Care totals of the user",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "User fetched successfully",
+                        "message": "Stats fetched successfully",
                         "data": {
-                            "id": "550e8400-e29b-41d4-a716-446655440000",
-                            "nameFirst": "John",
-                            "nameLast": "Doe",
-                            "email": "john@example.com",
-                            "phoneNumber": "123-456-7890",
-                            "hours": 10,
-                            "sessions": 5
+                            "total": {"hours": 42.5, "sessions": 12},
+                            "weeks": [
+                                {"week": "2024-01-15", "hours": 8.0, "sessions": 2},
+                                {"week": "2024-01-08", "hours": 4.0, "sessions": 1}
+                            ],
+                            "squads": [
+                                {"squad_id": "squad-uuid", "hours": 42.5, "sessions": 12}
+                            ]
                         }
                     }
                 }
             }
         },
-        404: {
-            "description": "User not found",
-            "content": {
-                "application/json": {
-                    "example": {"message": "User not found", "data": None}
-                }
-            }
-        },
         500: {
             "description": "Internal server error",
             "content": {
@@ -269,19 +3058,29 @@ async def search_users(q: str = ""):
         }
     }
 )
-async def get_user_by_id(user_id: str):
+async def get_user_stats(user_id: str, weeks: int = Query(8, ge=1, le=52)):
+    """
+    Get a user's care hours and sessions: all-time, per week and per squad,
+    read from precomputed rollups.
+    
+    Query parameters:
+    - weeks: how many recent weeks to include (default 8, max 52)
+    """
     try:
-        response = supabase.table("users").select("id, nameFirst, nameLast, email, phoneNumber, hours, sessions").eq("id", user_id).execute()
+        squad_ids = await fetch_user_squad_ids(user_id)
         
-        if not response.data or len(response.data) == 0:
-            return JSONResponse(
-                status_code=404,
-                content={"message": "User not found", "data": None}
-            )
+        scope = rollups.user_scope(user_id)
+        periods = recent_weeks(weeks)
+        squad_rollups = {squad_id: rollups.rollup_id(rollups.member_scope(squad_id, user_id)) for squad_id in squad_ids}
+        totals = await fetch_rollups([rollups.rollup_id(scope)] + [rollups.rollup_id(scope, period) for period in periods] + list(squad_rollups.values()))
         
         return JSONResponse(
             status_code=200,
-            content={"message": "User fetched successfully", "data": response.data[0]}
+            content={"message": "Stats fetched successfully", "data": {
+                "total": totals[rollups.rollup_id(scope)],
+                "weeks": [{"week": period.removeprefix("week:"), **totals[rollups.rollup_id(scope, period)]} for period in periods],
+                "squads": [{"squad_id": squad_id, **totals[rollup_id]} for squad_id, rollup_id in squad_rollups.items()]
+            }}
         )
     
     except Exception as e:
@@ -292,112 +3091,90 @@ async def get_user_by_id(user_id: str):
 
 
 @app.get(
-    "/users",
+    "/squads/{squad_id}/stats",
+    response_model=schemas.Envelope[schemas.SquadStats],
     responses={
         200: {
-            "description": "Users fetched successfully",
+            "description": "Care totals of the squad",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "Users fetched successfully",
-                        "data": [
-                            {
-                                "id": "123",
-                                "nameFirst": "John",
-                                "nameLast": "Doe",
-                                "email": "john@example.com",
-                                "phoneNumber": "123-456-7890",
-                                "hours": 10,
-                                "sessions": 5
-                            }
-                        ]
+                        "message": "Stats fetched successfully",
+                        "data": {
+                            "total": {"hours": 120.0, "sessions": 30},
+                            "weeks": [
+                                {"week": "2024-01-15", "hours": 16.0, "sessions": 4}
+                            ],
+                            "members": [
+                                {"user_id": "user-uuid", "hours": 42.5, "sessions": 12}
+                            ]
+                        }
                     }
                 }
             }
         },
-        404: {
-            "description": "No users found",
-            "content": {
-                "application/json": {
-                    "example": {"message": "No users found", "data": []}
-                }
-            }
-        },
         500: {
             "description": "Internal server error",
             "content": {
                 "application/json": {
-                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
                 }
             }
         }
     }
 )
-
-async def get_users():
+async def get_squad_stats(squad_id: str, weeks: int = Query(8, ge=1, le=52)):
+    """
+    Get a squad's care hours and sessions: all-time, per week and per member,
+    read from precomputed rollups.
+    
+    Query parameters:
+    - weeks: how many recent weeks to include (default 8, max 52)
+    """
     try:
-        response = supabase.table("users").select("*").execute()
-        
-        # Check if the response has data
-        if response.data is None:
-            print("DEBUG - No data found, returning 404")
-            return JSONResponse(
-                status_code=404,
-                content={"message": "No users found", "data": []}
-            )
+        user_ids = await fetch_squad_member_ids(squad_id)
         
-        # Ensure data is serializable to JSON
-        users_data = response.data if isinstance(response.data, list) else []
+        scope = rollups.squad_scope(squad_id)
+        periods = recent_weeks(weeks)
+        member_rollups = {user_id: rollups.rollup_id(rollups.member_scope(squad_id, user_id)) for user_id in user_ids}
+        totals = await fetch_rollups([rollups.rollup_id(scope)] + [rollups.rollup_id(scope, period) for period in periods] + list(member_rollups.values()))
         
         return JSONResponse(
             status_code=200,
-            content={"message": "Users fetched successfully", "data": users_data}
+            content={"message": "Stats fetched successfully", "data": {
+                "total": totals[rollups.rollup_id(scope)],
+                "weeks": [{"week": period.removeprefix("week:"), **totals[rollups.rollup_id(scope, period)]} for period in periods],
+                "members": [{"user_id": user_id, **totals[rollup_id]} for user_id, rollup_id in member_rollups.items()]
+            }}
         )
     
     except Exception as e:
         return JSONResponse(
             status_code=500,
-            content={"message": f"Internal server error: {str(e)}", "data": []}
+            content={"message": f"Internal server error: {str(e)}", "data": None}
         )
 
 
-@app.post(
-    "/create-user",
+@app.get(
+    "/rollups/rebuild",
+    response_model=schemas.Envelope[schemas.RollupRebuild],
     responses={
-        201: {
-            "description": "User created successfully",
+        200: {
+            "description": "Rollups recomputed from completed sessions",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "User created successfully",
-                        "data": {
-                            "id": "550e8400-e29b-41d4-a716-446655440000",
-                            "nameFirst": "John",
-                            "nameLast": "Doe",
-                            "username": "john_doe",
-                            "password": "password123",
-                            "email": "john@example.com",
-                            "phoneNumber": "123-456-7890",
-                            "hours": 0,
-                            "sessions": 0
-                        }
+                        "message": "Rollups rebuilt",
+                        "data": {"written": 5400, "deleted": 3, "seconds": 4.1}
                     }
                 }
             }
         },
-        400: {
-            "description": "Invalid request data",
-            "content": {
-                "application/json": {
-                    "example": {"message": "Invalid email format", "data": None}
-                }
-            }
-        },
-        409: {
-            "description": "User already exists",
+        401: {
+            "description": "Missing or wrong cron secret",
             "content": {
                 "application/json": {
-                    "example": {"message": "A user with this email already exists", "data": None}
+                    "example": {"message": "Cron secret required"}
                 }
             }
         },
@@ -406,104 +3183,52 @@ async def get_users():
             "content": {
                 "application/json": {
                     "example": {"message": "Internal server error: Database connection failed", "data": None}
-                }
-            }
-        }
-    }
-)
-async def create_user(user: CreateUserRequest):
-    try:
-        # Validate phone number format (basic validation for digits, dashes, spaces, parentheses)
-        phone_pattern = re.compile(r'^[\d\s\-\(\)\+]+$')
-        if not phone_pattern.match(user.phoneNumber):
-            return JSONResponse(
-                status_code=400,
-                content={"message": "Invalid phone number format. Use only digits, spaces, dashes, and parentheses.", "data": None}
-            )
-        
-        # Check if user with this email already exists
-        existing_email = supabase.table("users").select("id").eq("email", user.email).execute()
-        if existing_email.data and len(existing_email.data) > 0:
-            return JSONResponse(
-                status_code=409,
-                content={"message": "A user with this email already exists", "data": None}
-            )
-        
-        # Check if user with this username already exists
-        existing_username = supabase.table("users").select("id").eq("username", user.username).execute()
-        if existing_username.data and len(existing_username.data) > 0:
-            return JSONResponse(
-                status_code=409,
-                content={"message": "This username is already taken", "data": None}
-            )
-        
-        # Generate unique ID and prepare user data
-        user_id = str(uuid.uuid4())
-        user_data = {
-            "id": user_id,
-            "username": user.username.strip(),
-            "password": user.password,  # Note: In production, hash this password!
-            "nameFirst": user.nameFirst.strip(),
-            "nameLast": user.nameLast.strip(),
-            "email": user.email.lower().strip(),
-            "phoneNumber": user.phoneNumber.strip(),
-            "hours": 0,
-            "sessions": 0
+                }
+            }
         }
+    }
+)
+async def rebuild_rollups_nightly():
+    """
+    Recompute every rollup from the completed sessions, correcting any drift
+    in the incremental updates.
+    
+    Run by the Vercel cron in vercel.json, authenticated with CRON_SECRET
+    (see tokens.py).
+    """
+    try:
+        started = asyncio.get_running_loop().time()
+        written, deleted = await rebuild_rollups()
+        seconds = round(asyncio.get_running_loop().time() - started, 3)
         
-        # Insert user into Supabase
-        response = supabase.table("users").insert(user_data).execute()
-        
-        if response.data:
-            return JSONResponse(
-                status_code=201,
-                content={"message": "User created successfully", "data": response.data[0]}
-            )
-        else:
-            return JSONResponse(
-                status_code=500,
-                content={"message": "Failed to create user", "data": None}
-            )
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Rollups rebuilt", "data": {"written": written, "deleted": deleted, "seconds": seconds}}
+        )
     
     except Exception as e:
-        error_message = str(e)
-        # Check for common Supabase errors
-        if "duplicate" in error_message.lower() or "unique" in error_message.lower():
-            return JSONResponse(
-                status_code=409,
-                content={"message": "A user with this email or phone number already exists", "data": None}
-            )
         return JSONResponse(
             status_code=500,
-            content={"message": f"Internal server error: {error_message}", "data": None}
+            content={"message": f"Internal server error: {str(e)}", "data": None}
         )
 
 
 @app.get(
-    "/squads",
+    "/squads/{squad_id}/events",
     responses={
         200: {
-            "description": "Squads fetched successfully",
+            "description": "Server-sent event stream of the squad's changes",
             "content": {
-                "application/json": {
-                    "example": {
-                        "message": "Squads fetched successfully",
-                        "data": [
-                            {
-                                "id": "550e8400-e29b-41d4-a716-446655440000",
-                                "name": "Smith Family",
-                                "nameMom": "Jane Smith"
-                            }
-                        ]
-                    }
+                "text/event-stream": {
+                    "example": "id: 3f2a9c1e-42\nevent: session.created\ndata: {\"id\":\"session-uuid\",\"squad_id\":\"squad-uuid\",\"caretaker_id\":null,\"starts_at\":\"2024-01-15T09:00:00\",\"ends_at\":\"2024-01-15T13:00:00\",\"notes\":null}\n\n"
                 }
             }
         },
-        404: {
-            "description": "No squads found",
+        403: {
+            "description": "Caller is not a member of the squad",
             "content": {
                 "application/json": {
-                    "example": {"message": "No squads found", "data": []}
+                    "example": {"message": "Only squad members can follow squad events", "data": None}
                 }
             }
         },
@@ -511,54 +3236,123 @@ async def create_user(user: CreateUserRequest):
             "description": "Internal server error",
             "content": {
                 "application/json": {
-                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                    "example": {"message": "Internal server error: Database connection failed", "data": None}
                 }
             }
         }
     }
 )
-async def get_squads():
+async def stream_squad_events(squad_id: str, request: Request):
+    """
+    Follow a squad's changes as server-sent events, instead of polling.
+    
+    Events are membership.created ({"members": [...]} with user details),
+    session.created, session.updated, session.completed, rule.created,
+    rule.deleted, rule.exception and caretaker.selected, each carrying the
+    row the matching endpoint returns. resync means events were missed and
+    the client should refetch. EventSource reconnects by itself and sends
+    Last-Event-ID, which replays what it missed (see events.py).
+    
+    EventSource cannot set headers, so the access token may also be passed
+    as ?access_token= (see tokens.py). The stream is closed after
+    EVENT_STREAM_SECONDS.
+    """
     try:
-        response = supabase.table("squad").select("id, name, nameMom").execute()
-        
-        if response.data is None:
+        # With a session token, only members of the squad may listen
+        if request.state.user_id and not await is_squad_member(squad_id, request.state.user_id):
             return JSONResponse(
-                status_code=404,
-                content={"message": "No squads found", "data": []}
+                status_code=403,
+                content={"message": "Only squad members can follow squad events", "data": None}
             )
-        
-        squads_data = response.data if isinstance(response.data, list) else []
-        
-        return JSONResponse(
-            status_code=200,
-            content={"message": "Squads fetched successfully", "data": squads_data}
-        )
     
     except Exception as e:
         return JSONResponse(
             status_code=500,
-            content={"message": f"Internal server error: {str(e)}", "data": []}
+            content={"message": f"Internal server error: {str(e)}", "data": None}
         )
+    
+    last_event_id = request.headers.get("last-event-id")
+    
+    async def event_stream():
+        # Subscribe once the stream starts, so a client gone before then
+        # leaves nothing behind
+        subscription = event_hub.subscribe(squad_id, last_event_id)
+        try:
+            yield b"retry: 3000\n\n"
+            async for chunk in subscription.frames(duration=EVENT_STREAM_SECONDS):
+                yield chunk
+        finally:
+            event_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-@app.post(
-    "/squads",
+@app.get(
+    "/dashboard/{user_id}",
+    response_model=schemas.Envelope[schemas.Dashboard],
     responses={
-        201: {
-            "description": "Squad created successfully",
+        200: {
+            "description": "The user's profile and squads",
             "content": {
                 "application/json": {
                     "example": {
-                        "message": "Squad created successfully",
+                        "message": "Dashboard fetched successfully",
                         "data": {
-                            "id": "550e8400-e29b-41d4-a716-446655440000",
-                            "name": "Smith Family",
-                            "nameMom": "Jane Smith"
+                            "user": {
+                                "id": "user-uuid",
+                                "nameFirst": "John",
+                                "nameLast": "Doe",
+                                "email": "john@example.com",
+                                "phoneNumber": "123-456-7890",
+                                "hours": 10,
+                                "sessions": 5
+                            },
+                            "squads": [
+                                {
+                                    "id": "squad-uuid",
+                                    "name": "Smith Family",
+                                    "nameMom": "Jane Smith",
+                                    "member_count": 4,
+                                    "caretaker": {
+                                        "id": "assignment-uuid",
+                                        "squad_id": "squad-uuid",
+                                        "user_id": "user-uuid",
+                                        "assigned_on": "2024-01-15",
+                                        "assigned_at": "2024-01-15T10:30:00",
+                                        "probability": 0.42,
+                                        "user": {
+                                            "id": "user-uuid",
+                                            "nameFirst": "John",
+                                            "nameLast": "Doe"
+                                        }
+                                    }
+                                }
+                            ]
                         }
                     }
                 }
             }
         },
+        403: {
+            "description": "Caller is another user",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Users can only view their own dashboard", "data": None}
+                }
+            }
+        },
+        404: {
+            "description": "User not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "User not found", "data": None}
+                }
+            }
+        },
         500: {
             "description": "Internal server error",
             "content": {
@@ -566,54 +3360,53 @@ async def get_squads():
                     "example": {"message": "Internal server error: Database connection failed", "data": None}
                 }
             }
+        },
+        503: {
+            "description": "Database unavailable and nothing cached",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Service unavailable: Database unavailable, retry in 7s", "data": None}
+                }
+            }
         }
     }
 )
-async def create_squad(squad: CreateSquadRequest):
+async def get_dashboard(user_id: str, request: Request):
     """
-    Create a new squad with auto-generated UUID.
-    Also creates a squad membership for the creator as admin.
+    Everything the dashboard page shows in one request: the user's profile
+    and only the squads they are a member of, each with its member count
+    and current caretaker (None until one is picked).
     
-    Sample Postman request body:
-    {
-        "name": "Smith Family",
-        "nameMom": "Jane Smith",
-        "user_id": "550e8400-e29b-41d4-a716-446655440000"
-    }
+    Profile and squads are read through the cache concurrently, so a cold
+    cache costs the profile lookup and one bulk squad_summaries call (see
+    fetch_dashboard_squads()), and a warm one no round trips at all.
     """
     try:
-        # Generate unique ID and prepare squad data
-        squad_id = str(uuid.uuid4())
-        squad_data = {
-            "id": squad_id,
-            "name": squad.name.strip(),
-            "nameMom": squad.nameMom.strip()
-        }
-        
-        # Insert squad into Supabase
-        response = supabase.table("squad").insert(squad_data).execute()
-        
-        if response.data:
-            # Create squad membership for the creator as admin
-            membership_id = str(uuid.uuid4())
-            membership_data = {
-                "id": membership_id,
-                "user_id": squad.user_id,
-                "squad_id": squad_id,
-                "primary": True,  # Creator is admin
-                "joined_at": datetime.utcnow().isoformat()
-            }
-            supabase.table("user_squad_memberships").insert(membership_data).execute()
-            
+        # With a session token, users only see their own dashboard
+        if request.state.user_id and request.state.user_id != user_id:
             return JSONResponse(
-                status_code=201,
-                content={"message": "Squad created successfully", "data": response.data[0]}
+                status_code=403,
+                content={"message": "Users can only view their own dashboard", "data": None}
             )
-        else:
+        
+        user, squads = await asyncio.gather(
+            cache.get_or_load(f"user:{user_id}", lambda: fetch_user_profile(user_id)),
+            fetch_dashboard_squads(user_id),
+        )
+        
+        if not user:
             return JSONResponse(
-                status_code=500,
-                content={"message": "Failed to create squad", "data": None}
+                status_code=404,
+                content={"message": "User not found", "data": None}
             )
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Dashboard fetched successfully", "data": {"user": user, "squads": squads}}
+        )
+    
+    except db.DatabaseUnavailable as e:
+        return unavailable_response(e, None)
     
     except Exception as e:
         return JSONResponse(
@@ -624,6 +3417,7 @@ async def create_squad(squad: CreateSquadRequest):
 
 @app.get(
     "/squad-memberships",
+    response_model=schemas.Page[schemas.Membership],
     responses={
         200: {
             "description": "Squad memberships fetched successfully",
@@ -644,6 +3438,14 @@ async def create_squad(squad: CreateSquadRequest):
                 }
             }
         },
+        400: {
+            "description": "Invalid query parameters",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unknown field(s): password", "data": []}
+                }
+            }
+        },
         500: {
             "description": "Internal server error",
             "content": {
@@ -654,32 +3456,22 @@ async def create_squad(squad: CreateSquadRequest):
         }
     }
 )
-async def get_squad_memberships(squad_id: str = None):
+async def get_squad_memberships(squad_id: str = None, limit: int = None, cursor: str = None, fields: str = None, response_format: str = Query("json", alias="format")):
     """
     Get all squad memberships, optionally filtered by squad_id.
     
     Query parameters:
     - squad_id (optional): Filter memberships by squad ID
+    - limit (optional): Page size; returns one page plus `next_cursor`
+    - cursor (optional): `next_cursor` from the previous page
+    - fields (optional): Comma-separated columns to return, e.g. id,nameFirst
+    - format (optional): json (default) or ndjson to stream every row
     """
     try:
-        query = supabase.table("user_squad_memberships").select("id, user_id, squad_id, primary, joined_at")
-        
-        if squad_id:
-            query = query.eq("squad_id", squad_id)
-        
-        response = query.execute()
-        
-        if response.data is None:
-            return JSONResponse(
-                status_code=200,
-                content={"message": "No squad memberships found", "data": []}
-            )
-        
-        memberships_data = response.data if isinstance(response.data, list) else []
-        
-        return JSONResponse(
-            status_code=200,
-            content={"message": "Squad memberships fetched successfully", "data": memberships_data}
+        return await list_response(
+            "user_squad_memberships", MEMBERSHIP_FIELDS, "Squad memberships fetched successfully",
+            limit, cursor, fields, response_format,
+            filters=[("squad_id", squad_id)] if squad_id else ()
         )
     
     except Exception as e:
@@ -691,6 +3483,7 @@ async def get_squad_memberships(squad_id: str = None):
 
 @app.get(
     "/squad-memberships/{squad_id}/members",
+    response_model=schemas.Envelope[List[schemas.Member]],
     responses={
         200: {
             "description": "Squad members fetched successfully with user details",
@@ -716,6 +3509,9 @@ async def get_squad_memberships(squad_id: str = None):
                 }
             }
         },
+        304: {
+            "description": "Unchanged since the ETag sent in If-None-Match; no body"
+        },
         500: {
             "description": "Internal server error",
             "content": {
@@ -723,36 +3519,49 @@ async def get_squad_memberships(squad_id: str = None):
                     "example": {"message": "Internal server error: Database connection failed", "data": []}
                 }
             }
+        },
+        503: {
+            "description": "Database unavailable and nothing cached",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Service unavailable: Database unavailable, retry in 7s", "data": []}
+                }
+            }
         }
     }
 )
-async def get_squad_members(squad_id: str):
+async def get_squad_members(squad_id: str, request: Request):
     """
     Get all members of a specific squad with their user details.
+    
+    The response carries an ETag; sending it back in If-None-Match gets
+    304 Not Modified until someone joins the squad.
     """
     try:
-        # Get all memberships for this squad
-        memberships_response = supabase.table("user_squad_memberships").select("*").eq("squad_id", squad_id).execute()
+        token = await versions.get(f"squad_members:{squad_id}")
+        if etag_matches(request.headers.get("if-none-match"), token):
+            return not_modified_response(token)
+        
+        members_with_details, token = await get_or_load_versioned(
+            f"squad_members:{squad_id}", lambda: fetch_squad_members(squad_id), token
+        )
         
-        if not memberships_response.data:
+        if not members_with_details:
             return JSONResponse(
                 status_code=200,
-                content={"message": "No members found", "data": []}
+                content={"message": "No members found", "data": []},
+                headers=etag_headers(token)
             )
-        
-        # Get user details for each membership
-        members_with_details = []
-        for membership in memberships_response.data:
-            user_response = supabase.table("users").select("id, nameFirst, nameLast").eq("id", membership["user_id"]).execute()
-            if user_response.data:
-                membership["user"] = user_response.data[0]
-            members_with_details.append(membership)
-        
+
         return JSONResponse(
             status_code=200,
-            content={"message": "Squad members fetched successfully", "data": members_with_details}
+            content={"message": "Squad members fetched successfully", "data": members_with_details},
+            headers=etag_headers(token)
         )
     
+    except db.DatabaseUnavailable as e:
+        return unavailable_response(e, [])
+    
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -762,6 +3571,8 @@ async def get_squad_members(squad_id: str):
 
 @app.post(
     "/squad-memberships",
+    response_model=schemas.Envelope[schemas.Membership],
+    status_code=201,
     responses={
         201: {
             "description": "Squad membership created successfully",
@@ -780,6 +3591,14 @@ async def get_squad_members(squad_id: str):
                 }
             }
         },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can add people to the squad", "data": None}
+                }
+            }
+        },
         409: {
             "description": "User already in squad",
             "content": {
@@ -798,7 +3617,7 @@ async def get_squad_members(squad_id: str):
         }
     }
 )
-async def create_squad_membership(membership: CreateSquadMembershipRequest):
+async def create_squad_membership(membership: CreateSquadMembershipRequest, request: Request):
     """
     Add a user to a squad.
     
@@ -809,30 +3628,38 @@ async def create_squad_membership(membership: CreateSquadMembershipRequest):
     }
     """
     try:
+        forbidden = await non_member_response(request, membership.squad_id, "Only squad members can add people to the squad")
+        if forbidden:
+            return forbidden
+        
         # Check if user is already a member of this squad
-        existing = supabase.table("user_squad_memberships").select("id").eq("user_id", membership.user_id).eq("squad_id", membership.squad_id).execute()
-        if existing.data and len(existing.data) > 0:
+        if await is_squad_member(membership.squad_id, membership.user_id):
             return JSONResponse(
                 status_code=409,
                 content={"message": "User is already a member of this squad", "data": None}
             )
         
-        # Create membership
-        membership_id = str(uuid.uuid4())
-        membership_data = {
-            "id": membership_id,
-            "user_id": membership.user_id,
-            "squad_id": membership.squad_id,
-            "primary": False,  # New members are not admins
-            "joined_at": datetime.utcnow().isoformat()
-        }
-        
-        response = supabase.table("user_squad_memberships").insert(membership_data).execute()
+        # A join racing this one, or one through another instance the index
+        # has not seen yet, is caught by the unique (user_id, squad_id)
+        # constraint (sql/user_squad_memberships_unique.sql)
+        try:
+            created = await insert_squad_memberships(membership.squad_id, [membership.user_id], datetime.utcnow().isoformat())
+        except db.APIError as e:
+            if e.code != "23505":  # unique_violation
+                raise
+            return JSONResponse(
+                status_code=409,
+                content={"message": "User is already a member of this squad", "data": None}
+            )
         
-        if response.data:
+        if created:
+            await cache.delete(f"squad_members:{membership.squad_id}", f"squad_summary:{membership.squad_id}")
+            await versions.bump(f"squad_members:{membership.squad_id}")
+            await add_memberships(membership.squad_id, membership.user_id)
+            publish_members_later(membership.squad_id, created)
             return JSONResponse(
                 status_code=201,
-                content={"message": "Squad membership created successfully", "data": response.data[0]}
+                content={"message": "Squad membership created successfully", "data": created[0]}
             )
         else:
             return JSONResponse(
@@ -847,5 +3674,170 @@ async def create_squad_membership(membership: CreateSquadMembershipRequest):
         )
 
 
+@app.post(
+    "/squad-memberships/{squad_id}/bulk",
+    response_model=schemas.BulkImport,
+    responses={
+        200: {
+            "description": "Bulk import processed; see the per-row status",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Bulk import completed",
+                        "summary": {"created": 1, "already_member": 1, "duplicate": 0, "unknown_user": 0, "invalid": 0},
+                        "data": [
+                            {
+                                "user_id": "user-uuid",
+                                "status": "created",
+                                "membership": {
+                                    "id": "550e8400-e29b-41d4-a716-446655440000",
+                                    "user_id": "user-uuid",
+                                    "squad_id": "squad-uuid",
+                                    "primary": False,
+                                    "joined_at": "2024-01-15T10:30:00"
+                                }
+                            },
+                            {"user_id": "other-user-uuid", "status": "already_member", "membership": None}
+                        ]
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Invalid request body",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid bulk import body: expected {\"user_ids\": [...]}", "data": []}
+                }
+            }
+        },
+        403: {
+            "description": "Caller is not a member of the squad",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Only squad members can add people to the squad", "data": None}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: Database connection failed", "data": []}
+                }
+            }
+        }
+    }
+)
+async def bulk_create_squad_memberships(squad_id: str, request: Request):
+    """
+    Add many users to a squad at once.
+    
+    The body is JSON ({"user_ids": [...]}), NDJSON (application/x-ndjson) or
+    CSV (text/csv with a user_id column). Existing members and unknown users
+    are found with set-based queries and all new memberships are inserted in
+    one batch, so the cost does not grow with one round trip per user.
+    Re-sending the same import is safe: already added users are reported as
+    already_member.
+    
+    Per-row status is one of created, already_member, duplicate (repeated in
+    this import), unknown_user or invalid (not a UUID).
+    """
+    try:
+        forbidden = await non_member_response(request, squad_id, "Only squad members can add people to the squad")
+        if forbidden:
+            return forbidden
+        
+        try:
+            user_ids = parse_bulk_user_ids(request.headers.get("content-type", ""), await request.body())
+        except (ValueError, UnicodeDecodeError) as e:
+            return JSONResponse(
+                status_code=400,
+                content={"message": f"Invalid bulk import body: {str(e)}", "data": []}
+            )
+        
+        if len(user_ids) > MAX_BULK_MEMBERSHIPS:
+            return JSONResponse(
+                status_code=400,
+                content={"message": f"A bulk import may contain at most {MAX_BULK_MEMBERSHIPS} users", "data": []}
+            )
+        
+        results = [{"user_id": user_id, "status": None, "membership": None} for user_id in user_ids]
+        candidates = []
+        seen = set()
+        for result in results:
+            if not is_uuid(result["user_id"]):
+                # users.id is a uuid column: one malformed id would fail the lookups for all
+                result["status"] = "invalid"
+            elif result["user_id"] in seen:
+                result["status"] = "duplicate"
+            else:
+                seen.add(result["user_id"])
+                candidates.append(result["user_id"])
+        
+        # Existing memberships and known users, looked up concurrently
+        existing_rows, user_rows = await asyncio.gather(
+            fetch_in_chunks("user_squad_memberships", "user_id", "user_id", candidates, [("squad_id", squad_id)]),
+            fetch_in_chunks("users", "id", "id", candidates),
+        )
+        existing_members = {row["user_id"] for row in existing_rows}
+        known_users = {row["id"] for row in user_rows}
+        
+        joined_at = datetime.utcnow().isoformat()
+        new_members = [user_id for user_id in candidates if user_id in known_users and user_id not in existing_members]
+        
+        created = {}
+        for i in range(0, len(new_members), PAGE_SIZE):
+            chunk = new_members[i:i + PAGE_SIZE]
+            try:
+                rows = await insert_squad_memberships(squad_id, chunk, joined_at)
+            except db.APIError as e:
+                if e.code != "23505":  # unique_violation
+                    raise
+                # Someone joined since the lookup above (a concurrent import or
+                # another instance) and the whole chunk was rejected: look the
+                # chunk up again and insert the rest
+                joined = {row["user_id"] for row in await fetch_in_chunks("user_squad_memberships", "user_id", "user_id", chunk, [("squad_id", squad_id)])}
+                existing_members |= joined
+                rows = await insert_squad_memberships(squad_id, [user_id for user_id in chunk if user_id not in joined], joined_at)
+            created.update((row["user_id"], row) for row in rows)
+        
+        if created:
+            await cache.delete(f"squad_members:{squad_id}", f"squad_summary:{squad_id}")
+            await versions.bump(f"squad_members:{squad_id}")
+            await add_memberships(squad_id, *created)
+            publish_members_later(squad_id, list(created.values()))
+        
+        for result in results:
+            if result["status"]:
+                continue
+            if result["user_id"] in existing_members:
+                result["status"] = "already_member"
+            elif result["user_id"] not in known_users:
+                result["status"] = "unknown_user"
+            else:
+                result["status"] = "created"
+                result["membership"] = created.get(result["user_id"])
+        
+        summary = {status: 0 for status in ("created", "already_member", "duplicate", "unknown_user", "invalid")}
+        for result in results:
+            summary[result["status"]] += 1
+        
+        return JSONResponse(
+            status_code=200,
+            content={"message": "Bulk import completed", "summary": summary, "data": results}
+        )
+    
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"message": f"Internal server error: {str(e)}", "data": []}
+        )
+
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,196 @@
+"""
+Two-way index of squad memberships: user -> squads and squad -> users.
+
+user_squad_memberships is read by squad_id, so "every squad of this user"
+and "is this user already a member of this squad" would otherwise each be a
+round trip. The index answers both, and lists a squad's members, with set
+lookups.
+
+Entries are per user and per squad. A missing one is loaded on first use by
+the caller's loader (one query for that user's or squad's rows, never the
+whole table) and from then on kept current by add() and remove() as
+memberships are written, so lookups cost no round trip. A write that lands
+while an entry is loading is applied to it once the load finishes, so it is
+never lost to a load that read the table before it.
+
+Two backends share the same async interface, like cache.py:
+
+- MembershipIndex: in-process, the default. At most MEMBERSHIP_INDEX_KEYS
+  entries are kept, least recently used dropped first. Each entry is
+  reloaded once it is MEMBERSHIP_INDEX_MAX_AGE seconds old, which bounds how
+  long a membership written through another instance goes unseen. While
+  the database is unavailable an entry past that age is still served.
+- RedisMembershipIndex: one Redis set per user and per squad, shared by
+  every instance, used when CACHE_REDIS_URL is set, so a write through one
+  instance is seen by all of them at once. Lookups are then one Redis round
+  trip instead of none, and still no database round trip. Sets expire after
+  MEMBERSHIP_INDEX_MAX_AGE seconds.
+"""
+import os
+import time
+from collections import OrderedDict
+
+from cache import CACHE_REDIS_URL
+from resilience import DatabaseUnavailable
+
+MEMBERSHIP_INDEX_MAX_AGE = int(os.environ.get("MEMBERSHIP_INDEX_MAX_AGE", "60"))
+MEMBERSHIP_INDEX_KEYS = int(os.environ.get("MEMBERSHIP_INDEX_KEYS", "100000"))
+
+# Adds to or removes from a Redis set only if it is loaded, so a write
+# never leaves a partial set that would pass for a loaded one
+CHANGE_IF_LOADED_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[2] == "1" then
+    redis.call("SADD", KEYS[1], ARGV[1])
+else
+    redis.call("SREM", KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# Member of every loaded Redis set, so a user or squad with no memberships
+# still has one; never a valid user or squad id
+LOADED = ""
+
+
+class MembershipIndex:
+    backend = "memory"
+
+    def __init__(self, max_age=MEMBERSHIP_INDEX_MAX_AGE, maxsize=MEMBERSHIP_INDEX_KEYS):
+        self.max_age = max_age
+        self.maxsize = maxsize
+        # ("user", user_id) or ("squad", squad_id) -> (loaded_at, ids), least recently used first
+        self._entries = OrderedDict()
+        # entry key -> [loads in flight, changes written meanwhile as (id, added)]
+        self._loads = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def squads_of(self, user_id, load):
+        """Ids of the user's squads. `load` returns them from the database on a miss."""
+        return await self._lookup(("user", user_id), load)
+
+    async def members_of(self, squad_id, load):
+        """User ids of the squad's members. `load` returns them from the database on a miss."""
+        return await self._lookup(("squad", squad_id), load)
+
+    async def add(self, user_id, squad_id):
+        await self._change(user_id, squad_id, True)
+
+    async def remove(self, user_id, squad_id):
+        await self._change(user_id, squad_id, False)
+
+    async def _lookup(self, key, load):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.max_age:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return set(entry[1])
+        ids = await self._get(key)
+        if ids is not None:
+            self.hits += 1
+            return ids
+
+        self.misses += 1
+        loading = self._loads.setdefault(key, [0, []])
+        loading[0] += 1
+        start = len(loading[1])
+        try:
+            ids = set(await load())
+        except DatabaseUnavailable:
+            if entry is None:
+                raise
+            return set(entry[1])
+        finally:
+            loading[0] -= 1
+            if not loading[0]:
+                del self._loads[key]
+        for member, added in loading[1][start:]:
+            if added:
+                ids.add(member)
+            else:
+                ids.discard(member)
+        await self._store(key, ids)
+        return set(ids)
+
+    async def _change(self, user_id, squad_id, added):
+        for key, member in ((("user", user_id), squad_id), (("squad", squad_id), user_id)):
+            loading = self._loads.get(key)
+            if loading is not None:
+                loading[1].append((member, added))
+            await self._apply(key, member, added)
+
+    async def _get(self, key):
+        # Entries of this backend live in _entries only
+        return None
+
+    async def _store(self, key, ids):
+        self._entries[key] = (time.monotonic(), ids)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def _apply(self, key, member, added):
+        entry = self._entries.get(key)
+        if entry is None:
+            # Not loaded: the next lookup loads it with this write included
+            return
+        if added:
+            entry[1].add(member)
+        else:
+            entry[1].discard(member)
+
+    def stats(self):
+        return {"backend": self.backend, "entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class RedisMembershipIndex(MembershipIndex):
+    """
+    Index stored as one Redis set per user and per squad. A loaded set
+    always holds LOADED besides the ids, so a missing key means "not
+    loaded" and an empty user or squad is still a hit.
+    """
+    backend = "redis"
+
+    def __init__(self, redis_url, max_age=MEMBERSHIP_INDEX_MAX_AGE, prefix="wgm:memberships:"):
+        super().__init__(max_age=max_age, maxsize=0)
+        import redis.asyncio as redis
+        self._redis = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    def _redis_key(self, key):
+        kind, entity_id = key
+        return f"{self.prefix}{kind}:{entity_id}"
+
+    async def _get(self, key):
+        members = await self._redis.smembers(self._redis_key(key))
+        if not members:
+            return None
+        return {member.decode() for member in members} - {LOADED}
+
+    async def _store(self, key, ids):
+        # Added to rather than replaced: another instance may have stored a
+        # newer copy of the set while this one loaded
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self._redis_key(key), LOADED, *ids)
+            pipe.expire(self._redis_key(key), max(1, self.max_age))
+            await pipe.execute()
+
+    async def _apply(self, key, member, added):
+        await self._redis.eval(CHANGE_IF_LOADED_SCRIPT, 1, self._redis_key(key), member, "1" if added else "0")
+
+    def stats(self):
+        stats = super().stats()
+        stats["entries"] = None
+        return stats
+
+
+def create_membership_index():
+    if CACHE_REDIS_URL:
+        return RedisMembershipIndex(CACHE_REDIS_URL)
+    return MembershipIndex()
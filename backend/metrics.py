@@ -0,0 +1,289 @@
+"""
+Request, database and cache metrics in Prometheus text format.
+
+MetricsMiddleware times every request and records, per route template
+(/users/{user_id} rather than the concrete path):
+
+- http_requests_total and http_request_duration_seconds
+- http_request_db_round_trips: how many queries db.execute() ran for the
+  request, which is what makes an N+1 stand out
+- http_request_size_bytes and http_response_size_bytes
+- cache_lookups_total: read-through cache hits and misses
+- db_single_flight_total: reads per table/function that ran ("leader") or
+  shared the response of an identical read in flight ("shared")
+- db_retries_total, db_hedged_reads_total and db_unavailable_total: what
+  the retries, hedging and circuit breaker in resilience.py did
+
+db.execute() reports each round trip with record_query() (also kept per
+table/function in db_query_duration_seconds) and the cache reports each
+lookup with record_cache_lookup(). Both are attributed to the request being
+served through a context variable, so nothing has to be passed around.
+Event streams are counted but not timed, since they stay open on purpose.
+
+With SLOW_REQUEST_SECONDS set, every request slower than that prints one
+JSON line with its round trips grouped by query, slowest first.
+
+Metrics live in the process: each worker or serverless instance exposes its
+own at /metrics.
+"""
+import json
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "0"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts (the last one is +Inf), sum, count]
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = _labels(self.label_names, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {count}"
+
+
+REQUESTS = Counter("http_requests_total", "Requests served.", ("method", "route", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to serve a request.", ("method", "route"), LATENCY_BUCKETS)
+REQUEST_ROUND_TRIPS = Histogram("http_request_db_round_trips", "Database round trips per request.", ("method", "route"), ROUND_TRIP_BUCKETS)
+REQUEST_SIZE = Histogram("http_request_size_bytes", "Request body size.", ("method", "route"), SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Read-through cache lookups by the route that made them.", ("route", "result"))
+QUERY_DURATION = Histogram("db_query_duration_seconds", "Database round trips, including the wait for a pool thread.", ("method", "target"), LATENCY_BUCKETS)
+SINGLE_FLIGHT = Counter("db_single_flight_total", "Reads that ran (leader) or shared an identical read in flight (shared).", ("method", "target", "result"))
+RETRIES = Counter("db_retries_total", "Reads retried after a transient failure.", ("method", "target"))
+HEDGES = Counter("db_hedged_reads_total", "Reads sent twice after DB_HEDGE_AFTER, by which attempt answered first.", ("method", "target", "winner"))
+UNAVAILABLE = Counter("db_unavailable_total", "Calls failed with DatabaseUnavailable: timeout, error (after retries) or rejected (circuit open).", ("method", "target", "reason"))
+RESPONSE_VALIDATION_ERRORS = Counter("http_response_validation_errors_total", "Responses that did not match their route's response_model (RESPONSE_VALIDATION only).", ("method", "route"))
+
+METRICS = (
+    REQUESTS, REQUEST_DURATION, REQUEST_ROUND_TRIPS, REQUEST_SIZE, RESPONSE_SIZE, CACHE_LOOKUPS, QUERY_DURATION,
+    SINGLE_FLIGHT, RETRIES, HEDGES, UNAVAILABLE, RESPONSE_VALIDATION_ERRORS,
+)
+
+
+class RequestMetrics:
+    """What one request did; collected while it is served."""
+
+    def __init__(self):
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.round_trips = 0
+        self.db_seconds = 0.0
+        # "GET users" -> [round trips, seconds]
+        self.queries = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Reads answered by an identical read already in flight
+        self.shared_reads = 0
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+def query_label(query):
+    """
+    (HTTP method, table or rpc/<function>) of a PostgREST query builder.
+    """
+    request = getattr(query, "request", None)
+    if request is None:
+        return "?", type(query).__name__
+    return request.http_method, str(request.path).rsplit("/rest/v1/", 1)[-1]
+
+
+def record_query(query, seconds):
+    method, target = query_label(query)
+    QUERY_DURATION.observe((method, target), seconds)
+    request = current_request.get()
+    if request is not None:
+        request.round_trips += 1
+        request.db_seconds += seconds
+        entry = request.queries.setdefault(f"{method} {target}", [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def record_single_flight(query, shared):
+    method, target = query_label(query)
+    SINGLE_FLIGHT.inc((method, target, "shared" if shared else "leader"))
+    request = current_request.get()
+    if request is not None and shared:
+        request.shared_reads += 1
+
+
+def record_retry(query):
+    RETRIES.inc(query_label(query))
+
+
+def record_hedge(query, winner):
+    HEDGES.inc(query_label(query) + (winner,))
+
+
+def record_unavailable(query, reason):
+    UNAVAILABLE.inc(query_label(query) + (reason,))
+
+
+def record_response_validation_error(method, route):
+    RESPONSE_VALIDATION_ERRORS.inc((method, route))
+
+
+def record_cache_lookup(hit):
+    request = current_request.get()
+    if request is not None:
+        if hit:
+            request.cache_hits += 1
+        else:
+            request.cache_misses += 1
+
+
+def render(extra=()):
+    """
+    All metrics in Prometheus text format. `extra` adds (name, type, help,
+    value) samples such as the cache's and event hub's own counters.
+    """
+    lines = [line for metric in METRICS for line in metric.render()]
+    for name, metric_type, help_text, value in extra:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that measures every request. Written against raw ASGI,
+    like tokens.TokenMiddleware, so streaming responses pass through
+    untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = RequestMetrics()
+        response = {"status": 500, "streaming": False}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                request.request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["streaming"] = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            elif message["type"] == "http.response.body":
+                request.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        token = current_request.set(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            current_request.reset(token)
+            self._record(scope, request, response, time.perf_counter() - started)
+
+    @staticmethod
+    def _record(scope, request, response, seconds):
+        # The matched route's template keeps label values bounded
+        route = scope.get("route")
+        route = getattr(route, "path", "unmatched")
+        method = scope["method"]
+        labels = (method, route)
+
+        REQUESTS.inc((method, route, str(response["status"])))
+        for hit, count in ((True, request.cache_hits), (False, request.cache_misses)):
+            if count:
+                CACHE_LOOKUPS.inc((route, "hit" if hit else "miss"), count)
+        if response["streaming"]:
+            return
+        REQUEST_DURATION.observe(labels, seconds)
+        REQUEST_ROUND_TRIPS.observe(labels, request.round_trips)
+        REQUEST_SIZE.observe(labels, request.request_bytes)
+        RESPONSE_SIZE.observe(labels, request.response_bytes)
+
+        if SLOW_REQUEST_SECONDS and seconds >= SLOW_REQUEST_SECONDS:
+            queries = sorted(request.queries.items(), key=lambda item: item[1][1], reverse=True)
+            print("Slow request: " + json.dumps({
+                "method": method,
+                "route": route,
+                "path": scope["path"],
+                "status": response["status"],
+                "ms": round(seconds * 1000, 1),
+                "db_round_trips": request.round_trips,
+                "db_shared_reads": request.shared_reads,
+                "db_ms": round(request.db_seconds * 1000, 1),
+                "queries": [
+                    {"query": query, "round_trips": count, "ms": round(query_seconds * 1000, 1)}
+                    for query, (count, query_seconds) in queries
+                ],
+                "cache": {"hits": request.cache_hits, "misses": request.cache_misses},
+                "request_bytes": request.request_bytes,
+                "response_bytes": request.response_bytes,
+            }))
@@ -0,0 +1,138 @@
+"""
+Password hashing for login and registration.
+
+Passwords are hashed with scrypt (hashlib, no extra dependency) and stored as
+
+    scrypt$<n>$<r>$<p>$<salt b64>$<hash b64>
+
+so the cost parameters travel with each hash. Raising PASSWORD_SCRYPT_N,
+_R or _P only affects new hashes; verify_password() reports hashes made with
+other parameters (and legacy plaintext passwords) as needing a rehash, which
+login does transparently once the password is known to be right.
+
+scrypt is deliberately CPU and memory heavy, so it runs in a process pool
+(PASSWORD_HASH_EXECUTOR=process, the default) or a thread pool (=thread,
+for platforms without multiprocessing) rather than on the event loop.
+Successful verifications are remembered for PASSWORD_CACHE_TTL seconds,
+keyed by an HMAC of the stored hash and the password under a per-process
+secret, so repeated logins and token refreshes don't pay the full cost again.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cache import LRUCache
+
+PASSWORD_SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", "1"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_CACHE_TTL = float(os.environ.get("PASSWORD_CACHE_TTL", "300"))
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+_executor = None
+_cache_secret = secrets.token_bytes(32)
+# Salt for the scrypt run made on behalf of unknown users (see reject_password)
+_dummy_salt = secrets.token_bytes(SALT_BYTES)
+verified_cache = LRUCache(maxsize=10000, ttl=PASSWORD_CACHE_TTL)
+
+
+def _scrypt(password, salt, n, r, p):
+    # Module-level so it can be pickled into the process pool
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * n * r * p + 1024 * 1024, dklen=HASH_BYTES,
+    )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            try:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            except (OSError, NotImplementedError) as e:
+                print(f"Process pool unavailable for password hashing, using threads: {str(e)}")
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="passwords")
+    return _executor
+
+
+async def _run_scrypt(password, salt, n, r, p):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _scrypt, password, salt, n, r, p)
+
+
+def _encode(data):
+    return base64.b64encode(data).decode()
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(SCHEME + "$")
+
+
+def needs_rehash(stored):
+    """True for plaintext passwords and hashes made with other cost parameters."""
+    if not is_hashed(stored):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    except ValueError:
+        return True
+
+
+async def hash_password(password):
+    salt = secrets.token_bytes(SALT_BYTES)
+    n, r, p = PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P
+    digest = await _run_scrypt(password, salt, n, r, p)
+    return f"{SCHEME}${n}${r}${p}${_encode(salt)}${_encode(digest)}"
+
+
+async def verify_password(password, stored):
+    """
+    Check a password against its stored value.
+
+    Returns (valid, rehash): rehash is True when the password is valid but
+    stored as plaintext or with outdated parameters and should be replaced
+    with hash_password(password).
+    """
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        # Legacy rows created before passwords were hashed
+        valid = hmac.compare_digest(stored.encode(), password.encode())
+        return valid, valid
+
+    cache_key = hmac.new(_cache_secret, f"{stored}\0{password}".encode(), hashlib.sha256).hexdigest()
+    if await verified_cache.get(cache_key):
+        return True, needs_rehash(stored)
+
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        digest = await _run_scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False, False
+
+    valid = hmac.compare_digest(digest, base64.b64decode(expected))
+    if valid:
+        await verified_cache.set(cache_key, True)
+    return valid, valid and needs_rehash(stored)
+
+
+async def reject_password(password):
+    """
+    Do the scrypt work verify_password() would and return (False, False).
+    Login calls it for unknown usernames, so they take as long to reject as
+    a wrong password and response times do not reveal which usernames exist.
+    """
+    await _run_scrypt(password, _dummy_salt, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return False, False
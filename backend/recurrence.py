@@ -0,0 +1,111 @@
+"""
+Recurring care sessions.
+
+A rule is an iCalendar RRULE subset, e.g. "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=20":
+
+- FREQ: DAILY or WEEKLY
+- INTERVAL: every n days/weeks (default 1)
+- BYDAY: weekdays for WEEKLY rules (default: the weekday of the start)
+- COUNT or UNTIL: when the rule ends (default: never)
+
+Occurrences are never stored. occurrences() is a generator that jumps
+straight to the period containing the requested window and yields only the
+starts that overlap it, so the cost depends on the window, not on how long
+ago the rule started or how far it runs.
+"""
+from datetime import timedelta
+
+from care_sessions import to_utc
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+DAY = timedelta(days=1)
+
+
+class RecurrenceRule:
+    def __init__(self, freq, interval=1, byday=(), count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday)))
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        """Parse an RRULE string. Raises ValueError for anything unsupported."""
+        parts = {}
+        for part in text.strip().removeprefix("RRULE:").split(";"):
+            name, separator, value = part.partition("=")
+            if not separator or not value:
+                raise ValueError(f"Invalid RRULE part: {part!r}")
+            parts[name.strip().upper()] = value.strip().upper()
+
+        freq = parts.pop("FREQ", None)
+        if freq not in ("DAILY", "WEEKLY"):
+            raise ValueError("FREQ must be DAILY or WEEKLY")
+        interval = int(parts.pop("INTERVAL", "1"))
+        if interval < 1:
+            raise ValueError("INTERVAL must be at least 1")
+        byday = ()
+        if "BYDAY" in parts:
+            if freq != "WEEKLY":
+                raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+            names = parts.pop("BYDAY").split(",")
+            if not set(names) <= set(WEEKDAYS):
+                raise ValueError("BYDAY must list weekdays like MO,WE,FR")
+            byday = [WEEKDAYS.index(name) for name in names]
+        count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+        until = to_utc(_parse_until(parts.pop("UNTIL"))) if "UNTIL" in parts else None
+        if count is not None and until is not None:
+            raise ValueError("COUNT and UNTIL cannot both be set")
+        if parts:
+            raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+        return cls(freq, interval, byday, count, until)
+
+    def occurrences(self, dtstart, duration, start, end):
+        """
+        Yield the starts of occurrences overlapping [start, end), in order.
+
+        dtstart is the first occurrence's start and duration each
+        occurrence's length.
+        """
+        dtstart, start, end = to_utc(dtstart), to_utc(start), to_utc(end)
+        if self.freq == "DAILY":
+            base, period, offsets = dtstart, self.interval * DAY, [timedelta(0)]
+        else:
+            # Periods are weeks starting on the Monday of dtstart's week
+            base = dtstart - dtstart.weekday() * DAY
+            period = self.interval * 7 * DAY
+            offsets = [day * DAY for day in (self.byday or (dtstart.weekday(),))]
+        # Every occurrence of an earlier period ends before `start`
+        first_period = max(0, (start - duration - base) // period)
+        # Occurrences counted towards COUNT in the periods jumped over. Those
+        # of the first period that fall before dtstart don't count; when the
+        # first period is not jumped over, the loop skips them itself
+        index = 0
+        if first_period:
+            index = first_period * len(offsets) - sum(1 for offset in offsets if base + offset < dtstart)
+        moment = base + first_period * period
+        while True:
+            for offset in offsets:
+                occurrence = moment + offset
+                if occurrence < dtstart:
+                    continue
+                if self.count is not None and index >= self.count:
+                    return
+                if self.until is not None and occurrence > self.until:
+                    return
+                if occurrence >= end:
+                    return
+                index += 1
+                if occurrence + duration > start:
+                    yield occurrence
+            moment += period
+
+
+def _parse_until(value):
+    # RRULE dates are basic ISO 8601 (20240131T090000Z or 20240131)
+    value = value.removesuffix("Z")
+    if "T" in value:
+        date, time = value.split("T")
+        return f"{date[:4]}-{date[4:6]}-{date[6:8]}T{time[:2]}:{time[2:4]}:{time[4:6]}"
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}T23:59:59"
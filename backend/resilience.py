@@ -0,0 +1,177 @@
+"""
+Deadlines, retries, a circuit breaker and hedging for database round trips.
+
+db.execute() runs every round trip through these:
+
+- Deadline: a call still unfinished DB_DEADLINE seconds after it started,
+  retries included, fails with DatabaseUnavailable. The pool thread running
+  it cannot be interrupted and carries on until the HTTP client's own
+  timeout (db.DB_TIMEOUT), but the request no longer waits for it.
+- Retries: a read (GET, so idempotent) that fails with a transient error is
+  retried up to DB_READ_RETRIES times, after a random "full jitter" backoff
+  so that callers which failed together do not retry together. Writes are
+  never retried: one that timed out may still have been applied.
+- Circuit breaker: after DB_BREAKER_FAILURES transient failures in a row
+  the circuit opens and calls fail at once with DatabaseUnavailable for
+  DB_BREAKER_COOLDOWN seconds, instead of each holding a pool thread until
+  its deadline. Then a single probe call is let through; its success closes
+  the circuit and its failure opens it for another cooldown. Meanwhile the
+  cache answers with expired entries it still holds (see cache.py).
+- Hedging: with DB_HEDGE_AFTER set, a read still unanswered after that many
+  seconds is sent a second time and the first response wins. That trims
+  the tail added by one slow connection or replica, at the cost of a second
+  round trip for the slowest reads. Only done while the circuit is closed,
+  so a struggling database is not sent more work.
+
+Transient errors are the ones a retry can fix: the connection failing or
+timing out, a 5xx from the gateway, or a PostgREST/Postgres error meaning
+the database was unreachable, overloaded or restarting. Any other error (a
+bad query, a constraint violation) means the database answered, so it is
+raised as is and counts as a success for the breaker.
+"""
+import asyncio
+import os
+import random
+import time
+
+# Seconds a database call may take, retries included
+DB_DEADLINE = float(os.environ.get("DB_DEADLINE", "10"))
+
+# Extra attempts for a read that failed with a transient error
+DB_READ_RETRIES = int(os.environ.get("DB_READ_RETRIES", "2"))
+
+# Backoff before retry n is uniform in [0, min(DB_RETRY_MAX, DB_RETRY_BASE * 2**n)]
+DB_RETRY_BASE = float(os.environ.get("DB_RETRY_BASE", "0.05"))
+DB_RETRY_MAX = float(os.environ.get("DB_RETRY_MAX", "1"))
+
+# Transient failures in a row that open the circuit; 0 never opens it
+DB_BREAKER_FAILURES = int(os.environ.get("DB_BREAKER_FAILURES", "5"))
+DB_BREAKER_COOLDOWN = float(os.environ.get("DB_BREAKER_COOLDOWN", "10"))
+
+# Seconds before a slow read is sent again; 0 disables hedging
+DB_HEDGE_AFTER = float(os.environ.get("DB_HEDGE_AFTER", "0"))
+
+# PostgREST: could not connect, connection error, schema cache connection,
+# timed out waiting for a pooled connection
+# Postgres: statement timeout, too many connections, shutting down or
+# starting up, serialization failure, deadlock
+TRANSIENT_CODES = {
+    "PGRST000", "PGRST001", "PGRST002", "PGRST003",
+    "57014", "53300", "57P01", "57P02", "57P03", "40001", "40P01",
+}
+
+
+class DatabaseUnavailable(Exception):
+    """
+    The database could not be reached in time: the circuit is open, the
+    deadline passed, or transient errors outlasted the retries.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # Both are imported by the time a real query has failed
+    import httpx
+    from postgrest.exceptions import APIError
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or "")
+        # HTTP status codes stand in for the code when the body was not JSON
+        return code in TRANSIENT_CODES or code.startswith("08") or (len(code) == 3 and code.startswith("5"))
+    return False
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number attempt (0 for the first retry)."""
+    return random.uniform(0, min(DB_RETRY_MAX, DB_RETRY_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Ticket of a call let through while closed; a probe gets its own object
+    CALL = "call"
+
+    def __init__(self, failures=DB_BREAKER_FAILURES, cooldown=DB_BREAKER_COOLDOWN):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe = None
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        """
+        Whether a call may go ahead now: None if not, else a ticket to pass to
+        record() once the call is over. Every allowed call must be followed
+        by record(). While half-open, the single call let through gets a
+        probe ticket, and only the probe's outcome closes or reopens the
+        circuit.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return None
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe is not None:
+                self.rejected += 1
+                return None
+            self._probe = object()
+            return self._probe
+        return self.CALL
+
+    def record(self, ticket, ok):
+        """
+        Outcome of an allowed call: True if the database answered, False on a
+        transient failure, None if the call was abandoned before either.
+        """
+        if ticket is not None and ticket is self._probe:
+            self._probe = None
+            if ok:
+                self.failures = 0
+                self.state = self.CLOSED
+            elif ok is False:
+                self._open()
+            # Abandoned: still half-open, so the next call becomes the probe
+            return
+        if self.state != self.CLOSED:
+            # Let through before the circuit opened; only the probe decides now
+            return
+        if ok:
+            self.failures = 0
+        elif ok is False:
+            self.failures += 1
+            if self.failure_threshold and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.opened += 1
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def retry_after(self):
+        """Seconds until the circuit lets a probe through; 0 unless open."""
+        if self.state != self.OPEN:
+            return 0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,67 @@
+"""
+Precomputed care totals.
+
+Every completed care session adds its hours and one session to a fixed set
+of rollup rows, so totals are read by id instead of summed from raw sessions.
+A rollup row's id is "<scope>|<period>":
+
+- scope:  user:<user_id>, squad:<squad_id> or squad:<squad_id>:user:<user_id>
+- period: all, day:<YYYY-MM-DD> or week:<YYYY-MM-DD of the Monday>
+
+Days and weeks are those of the session's start (UTC). rollup_ids() lists the
+rows a completion touches; fold() computes rows from scratch for the rebuild
+job, using the same ids.
+"""
+from datetime import timedelta
+
+from care_sessions import to_utc
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def squad_scope(squad_id):
+    return f"squad:{squad_id}"
+
+
+def member_scope(squad_id, user_id):
+    return f"squad:{squad_id}:user:{user_id}"
+
+
+def day_period(moment):
+    return f"day:{to_utc(moment).date().isoformat()}"
+
+
+def week_period(moment):
+    day = to_utc(moment).date()
+    return f"week:{(day - timedelta(days=day.weekday())).isoformat()}"
+
+
+def rollup_id(scope, period="all"):
+    return f"{scope}|{period}"
+
+
+def rollup_ids(user_id, squad_id, starts_at):
+    """Ids of every rollup row a session completed by user_id in squad_id adds to."""
+    scopes = (user_scope(user_id), squad_scope(squad_id), member_scope(squad_id, user_id))
+    periods = ("all", day_period(starts_at), week_period(starts_at))
+    return [rollup_id(scope, period) for scope in scopes for period in periods]
+
+
+def rollup_row(rollup_id_, hours=0.0, sessions=0):
+    scope, _, period = rollup_id_.partition("|")
+    return {"id": rollup_id_, "scope": scope, "period": period, "hours": hours, "sessions": sessions}
+
+
+def fold(completions):
+    """Rollup rows for a set of completions (dicts with user_id, squad_id, starts_at, hours)."""
+    rows = {}
+    for completion in completions:
+        for row_id in rollup_ids(completion["user_id"], completion["squad_id"], completion["starts_at"]):
+            row = rows.get(row_id)
+            if row is None:
+                row = rows[row_id] = rollup_row(row_id)
+            row["hours"] += completion["hours"]
+            row["sessions"] += 1
+    return rows
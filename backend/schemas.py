@@ -0,0 +1,205 @@
+"""
+Response models: the shape of every JSON body the API returns.
+
+Routes declare them as response_model, which is what /docs and
+/openapi.json show. Handlers still build plain dicts and return them in a
+responses.JSONResponse, so FastAPI neither validates nor re-encodes them on
+the way out; with RESPONSE_VALIDATION set, responses.ResponseValidationMiddleware
+checks each successful body against its route's model instead (see
+responses.py).
+
+Most fields are optional because the list endpoints' `fields=` parameter
+returns only the columns asked for; "id" is always there.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class Envelope(BaseModel, Generic[T]):
+    message: str
+    data: T
+
+
+class Page(BaseModel, Generic[T]):
+    message: str
+    data: List[T]
+    # Only when a page was asked for with limit or cursor
+    next_cursor: Optional[str] = None
+
+
+class Status(BaseModel):
+    status: str
+
+
+class UserName(BaseModel):
+    id: str
+    nameFirst: Optional[str] = None
+    nameLast: Optional[str] = None
+
+
+class User(UserName):
+    username: Optional[str] = None
+    email: Optional[str] = None
+    phoneNumber: Optional[str] = None
+    hours: Optional[float] = None
+    sessions: Optional[int] = None
+
+
+class Squad(BaseModel):
+    id: str
+    name: Optional[str] = None
+    nameMom: Optional[str] = None
+
+
+class Membership(BaseModel):
+    id: str
+    user_id: Optional[str] = None
+    squad_id: Optional[str] = None
+    primary: Optional[bool] = None
+    joined_at: Optional[datetime] = None
+
+
+class Member(Membership):
+    user: Optional[UserName] = None
+
+
+class CaretakerAssignment(BaseModel):
+    id: str
+    squad_id: str
+    user_id: str
+    assigned_on: date
+    assigned_at: datetime
+    probability: Optional[float] = None
+    user: Optional[UserName] = None
+
+
+class CareSession(BaseModel):
+    id: str
+    squad_id: str
+    caretaker_id: Optional[str] = None
+    starts_at: datetime
+    ends_at: datetime
+    notes: Optional[str] = None
+    # Occurrences of a recurring session: the rule they come from
+    rule_id: Optional[str] = None
+    caretaker: Optional[UserName] = None
+
+
+class CareException(BaseModel):
+    id: str
+    rule_id: str
+    squad_id: str
+    occurs_at: datetime
+    cancelled: bool
+    caretaker_id: Optional[str] = None
+
+
+class CareRule(BaseModel):
+    id: str
+    squad_id: str
+    caretaker_id: Optional[str] = None
+    rrule: str
+    starts_at: datetime
+    duration_minutes: int
+    notes: Optional[str] = None
+    exceptions: Optional[List[CareException]] = None
+
+
+class CareCompletion(BaseModel):
+    id: str
+    session_id: str
+    squad_id: str
+    user_id: str
+    starts_at: datetime
+    ends_at: datetime
+    hours: float
+    completed_at: datetime
+
+
+class Totals(BaseModel):
+    hours: float
+    sessions: int
+
+
+class WeekTotals(Totals):
+    week: date
+
+
+class SquadTotals(Totals):
+    squad_id: str
+
+
+class MemberTotals(Totals):
+    user_id: str
+
+
+class UserStats(BaseModel):
+    total: Totals
+    weeks: List[WeekTotals]
+    squads: List[SquadTotals]
+
+
+class SquadStats(BaseModel):
+    total: Totals
+    weeks: List[WeekTotals]
+    members: List[MemberTotals]
+
+
+class SquadSummary(Squad):
+    member_count: int
+    caretaker: Optional[CaretakerAssignment] = None
+
+
+class Dashboard(BaseModel):
+    user: User
+    squads: List[SquadSummary]
+
+
+class NightlyAssignment(BaseModel):
+    squads: int
+    assigned: int
+    seconds: float
+
+
+class RollupRebuild(BaseModel):
+    written: int
+    deleted: int
+    seconds: float
+
+
+class Tokens(BaseModel):
+    message: str
+    userId: str
+    accessToken: str
+    refreshToken: str
+    expiresIn: int
+
+
+class Login(Tokens):
+    username: str
+
+
+class SquadCreated(Envelope[Squad]):
+    membership: Membership
+
+
+class BulkResult(BaseModel):
+    user_id: Optional[str] = None
+    # created, already_member, duplicate, unknown_user or invalid
+    status: str
+    membership: Optional[Membership] = None
+
+
+class BulkImport(BaseModel):
+    message: str
+    summary: Dict[str, int]
+    data: List[BulkResult]
+
+
+class CacheStats(BaseModel):
+    message: str
+    data: Dict[str, Any]
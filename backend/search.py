@@ -0,0 +1,168 @@
+"""
+In-process search index over user first and last names.
+
+Names repeat a lot across users, so the index is built over distinct
+lowercased names rather than over users:
+
+- a sorted list of names answers prefix queries with a binary search
+- a trigram -> names map answers substring queries by intersecting the
+  trigram sets of the query
+- a name -> user ids map expands matching names back into users
+
+Prefix matches are ranked ahead of substring matches. The index is loaded in
+bulk with load() and kept current with add()/remove() as users are written.
+"""
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+
+SEARCH_FIELDS = ("nameFirst", "nameLast")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class UserSearchIndex:
+    def __init__(self):
+        self._users = {}
+        self._ids_by_name = {}
+        self._sorted_names = []
+        self._names_by_trigram = {}
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._users)
+
+    def is_stale(self, max_age):
+        """True if the index was never loaded or was loaded more than max_age seconds ago."""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def load(self, users):
+        """Replace the index contents with `users` (dicts with id, nameFirst, nameLast)."""
+        self._users = {}
+        self._ids_by_name = {}
+        self._names_by_trigram = {}
+        for user in users:
+            user = self._record(user)
+            self._users[user["id"]] = user
+            for name in self._names_of(user):
+                ids = self._ids_by_name.get(name)
+                if ids is None:
+                    self._ids_by_name[name] = {user["id"]}
+                    self._index_name(name)
+                else:
+                    ids.add(user["id"])
+        self._sorted_names = sorted(self._ids_by_name)
+        self.loaded_at = time.monotonic()
+
+    def add(self, user):
+        """Index a new user, or re-index an existing one whose names changed."""
+        user = self._record(user)
+        if user["id"] in self._users:
+            self.remove(user["id"])
+        self._users[user["id"]] = user
+        for name in self._names_of(user):
+            ids = self._ids_by_name.get(name)
+            if ids is None:
+                self._ids_by_name[name] = {user["id"]}
+                self._index_name(name)
+                insort(self._sorted_names, name)
+            else:
+                ids.add(user["id"])
+
+    def remove(self, user_id):
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        for name in self._names_of(user):
+            ids = self._ids_by_name.get(name)
+            if ids is None:
+                continue
+            ids.discard(user_id)
+            if not ids:
+                del self._ids_by_name[name]
+                self._unindex_name(name)
+                position = bisect_left(self._sorted_names, name)
+                if position < len(self._sorted_names) and self._sorted_names[position] == name:
+                    del self._sorted_names[position]
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` users whose first or last name contains the query.
+
+        Users with a name starting with the query come first, in name order,
+        followed by users that only contain it. Extra words in the query must
+        also appear in one of the user's names, so "jo do" finds "John Doe".
+        """
+        terms = query.lower().split()
+        if not terms or limit <= 0:
+            return []
+        term, extra_terms = terms[0], terms[1:]
+
+        results = []
+        seen = set()
+
+        def collect(names):
+            for name in names:
+                for user_id in self._ids_by_name[name]:
+                    if user_id in seen:
+                        continue
+                    user = self._users[user_id]
+                    if extra_terms and not self._matches_all(user, extra_terms):
+                        continue
+                    seen.add(user_id)
+                    results.append(user)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        if collect(self._prefix_names(term)):
+            return results
+        collect(self._substring_names(term))
+        return results
+
+    def _prefix_names(self, term):
+        start = bisect_left(self._sorted_names, term)
+        for name in islice(self._sorted_names, start, None):
+            if not name.startswith(term):
+                break
+            yield name
+
+    def _substring_names(self, term):
+        if len(term) < 3:
+            # Too short for trigrams; the distinct-name vocabulary is small
+            # enough to scan directly.
+            candidates = self._ids_by_name
+        else:
+            trigram_sets = [self._names_by_trigram.get(trigram) for trigram in _trigrams(term)]
+            if not all(trigram_sets):
+                return []
+            trigram_sets.sort(key=len)
+            candidates = set.intersection(*trigram_sets)
+        return sorted(name for name in candidates if term in name and not name.startswith(term))
+
+    def _index_name(self, name):
+        for trigram in _trigrams(name):
+            self._names_by_trigram.setdefault(trigram, set()).add(name)
+
+    def _unindex_name(self, name):
+        for trigram in _trigrams(name):
+            names = self._names_by_trigram.get(trigram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._names_by_trigram[trigram]
+
+    @staticmethod
+    def _record(user):
+        return {"id": user["id"], **{field: user.get(field) or "" for field in SEARCH_FIELDS}}
+
+    @staticmethod
+    def _names_of(user):
+        return {(user.get(field) or "").strip().lower() for field in SEARCH_FIELDS} - {""}
+
+    @staticmethod
+    def _matches_all(user, terms):
+        names = " ".join((user.get(field) or "").lower() for field in SEARCH_FIELDS)
+        return all(term in names for term in terms)
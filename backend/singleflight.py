@@ -0,0 +1,67 @@
+"""
+Single-flight: concurrent callers asking for the same key share one call.
+
+The first caller starts fn() as a task and callers arriving while it is in
+flight await that task instead of starting their own; all of them get its
+result or its exception. The key is forgotten as soon as the call
+finishes, so nothing is ever served stale: only calls that overlap in time
+are merged, unlike the cache in front of them.
+
+The shared task is shielded, so a caller that is cancelled (say its client
+disconnected) stops waiting without cancelling the call for the others.
+"""
+import asyncio
+
+
+class _Call:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, copy=None):
+        """
+        Await fn(), or the call already in flight under key, and return
+        (result, shared) where shared says whether the call was joined.
+
+        When several callers share a result, all but the last one to resume
+        get copy(result) (if given), so none of them sees changes another
+        makes to it and an unshared result is never copied.
+        """
+        call = self._calls.get(key)
+        shared = call is not None and not call.task.done()
+        if shared:
+            self.shared += 1
+        else:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task: self._finish(key, task))
+            self.leaders += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+        if copy is not None and call.waiters:
+            result = copy(result)
+        return result, shared
+
+    def _finish(self, key, task):
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {"in_flight": len(self), "leaders": self.leaders, "shared": self.shared}
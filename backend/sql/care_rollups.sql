@@ -0,0 +1,68 @@
+-- Completed care sessions and the totals precomputed from them.
+--
+-- POST /squads/{squad_id}/sessions/{session_id}/complete calls
+-- record_care_completion, which in one transaction logs the completion,
+-- adds its hours and one session to every rollup row listed in
+-- p_rollup_ids (see rollups.py for the id scheme) and bumps the user's flat
+-- hours/sessions counters. A session can only be completed once.
+-- GET /rollups/rebuild recomputes care_rollups from care_session_completions.
+-- Run this once in the Supabase SQL editor, after care_sessions.sql.
+create table if not exists public.care_session_completions (
+    id uuid primary key,
+    session_id text not null unique,
+    squad_id uuid not null references public.squad (id) on delete cascade,
+    user_id uuid not null references public.users (id) on delete cascade,
+    starts_at timestamp not null,
+    ends_at timestamp not null,
+    hours double precision not null,
+    completed_at timestamp not null
+);
+
+create table if not exists public.care_rollups (
+    id text primary key,
+    scope text not null,
+    period text not null,
+    hours double precision not null default 0,
+    sessions integer not null default 0
+);
+
+create index if not exists care_rollups_period_idx on public.care_rollups (period);
+
+create or replace function public.record_care_completion(
+    p_id uuid,
+    p_session_id text,
+    p_squad_id uuid,
+    p_user_id uuid,
+    p_starts_at timestamp,
+    p_ends_at timestamp,
+    p_hours double precision,
+    p_completed_at timestamp,
+    p_rollup_ids text[]
+)
+returns json
+language plpgsql
+as $$
+declare
+    new_completion public.care_session_completions;
+begin
+    insert into public.care_session_completions
+        (id, session_id, squad_id, user_id, starts_at, ends_at, hours, completed_at)
+    values
+        (p_id, p_session_id, p_squad_id, p_user_id, p_starts_at, p_ends_at, p_hours, p_completed_at)
+    returning * into new_completion;
+
+    insert into public.care_rollups (id, scope, period, hours, sessions)
+    select rollup_id, split_part(rollup_id, '|', 1), split_part(rollup_id, '|', 2), p_hours, 1
+    from unnest(p_rollup_ids) as rollup_id
+    on conflict (id) do update
+        set hours = care_rollups.hours + excluded.hours,
+            sessions = care_rollups.sessions + 1;
+
+    update public.users
+    set hours = coalesce(hours, 0) + p_hours,
+        sessions = coalesce(sessions, 0) + 1
+    where id = p_user_id;
+
+    return row_to_json(new_completion);
+end;
+$$;
@@ -0,0 +1,33 @@
+-- Recurring care sessions and their per-occurrence exceptions.
+--
+-- A rule stores an RRULE (see recurrence.py for the supported subset), the
+-- first occurrence's start and the length of each occurrence. Occurrences
+-- are expanded on read and never stored. An exception cancels a single
+-- occurrence or hands it to another caretaker, and is keyed by the
+-- occurrence's original start. Run this once in the Supabase SQL editor,
+-- after care_sessions.sql.
+create table if not exists public.care_session_rules (
+    id uuid primary key,
+    squad_id uuid not null references public.squad (id) on delete cascade,
+    caretaker_id uuid references public.users (id) on delete set null,
+    rrule text not null,
+    starts_at timestamp not null,
+    duration_minutes integer not null check (duration_minutes > 0),
+    notes text
+);
+
+create index if not exists care_session_rules_squad_idx
+    on public.care_session_rules (squad_id);
+
+create table if not exists public.care_session_exceptions (
+    id uuid primary key,
+    rule_id uuid not null references public.care_session_rules (id) on delete cascade,
+    squad_id uuid not null references public.squad (id) on delete cascade,
+    occurs_at timestamp not null,
+    cancelled boolean not null default true,
+    caretaker_id uuid references public.users (id) on delete set null,
+    unique (rule_id, occurs_at)
+);
+
+create index if not exists care_session_exceptions_squad_idx
+    on public.care_session_exceptions (squad_id);
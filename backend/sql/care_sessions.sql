@@ -0,0 +1,24 @@
+-- Care sessions on a squad's shared calendar.
+--
+-- The backend checks new sessions for overlaps against its in-process
+-- calendar index (care_sessions.py) and answers 409 with the conflicting
+-- sessions. The exclusion constraint is the authoritative guard for writes
+-- made through other instances before their index caught up; the backend
+-- maps its exclusion_violation (23P01) to the same 409. Run this once in the
+-- Supabase SQL editor.
+create extension if not exists btree_gist;
+
+create table if not exists public.care_sessions (
+    id uuid primary key,
+    squad_id uuid not null references public.squad (id) on delete cascade,
+    caretaker_id uuid references public.users (id) on delete set null,
+    starts_at timestamp not null,
+    ends_at timestamp not null,
+    notes text,
+    check (ends_at > starts_at),
+    constraint care_sessions_no_overlap
+        exclude using gist (squad_id with =, tsrange(starts_at, ends_at) with &&)
+);
+
+create index if not exists care_sessions_squad_start_idx
+    on public.care_sessions (squad_id, starts_at);
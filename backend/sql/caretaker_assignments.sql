@@ -0,0 +1,20 @@
+-- History of caretaker picks, one row per draw.
+--
+-- POST /squads/{squad_id}/caretaker and the nightly GET /caretakers/nightly
+-- cron both append here; GET /squads/{squad_id}/caretaker returns the most
+-- recent row. `probability` is the chance the chosen member had, kept so the
+-- fairness of past draws can be audited. Run this once in the Supabase SQL
+-- editor.
+create table if not exists public.caretaker_assignments (
+    id uuid primary key,
+    squad_id uuid not null references public.squad (id) on delete cascade,
+    user_id uuid not null references public.users (id) on delete cascade,
+    assigned_on date not null,
+    assigned_at timestamp not null,
+    probability double precision not null
+);
+
+create index if not exists caretaker_assignments_squad_idx
+    on public.caretaker_assignments (squad_id, assigned_at desc);
+create index if not exists caretaker_assignments_day_idx
+    on public.caretaker_assignments (assigned_on);
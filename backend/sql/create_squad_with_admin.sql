@@ -0,0 +1,35 @@
+-- Create a squad and its creator's admin membership in one transaction.
+--
+-- POST /squads calls this through supabase.rpc("create_squad_with_admin", ...)
+-- so both rows are written in a single round trip and either both exist or
+-- neither does. Run it once in the Supabase SQL editor; until it exists the
+-- backend falls back to two inserts with a compensating delete.
+create or replace function public.create_squad_with_admin(
+    p_squad_id uuid,
+    p_name text,
+    p_name_mom text,
+    p_membership_id uuid,
+    p_user_id uuid,
+    p_joined_at timestamp
+)
+returns json
+language plpgsql
+as $$
+declare
+    new_squad public.squad;
+    new_membership public.user_squad_memberships;
+begin
+    insert into public.squad (id, name, "nameMom")
+    values (p_squad_id, p_name, p_name_mom)
+    returning * into new_squad;
+
+    insert into public.user_squad_memberships (id, user_id, squad_id, "primary", joined_at)
+    values (p_membership_id, p_user_id, p_squad_id, true, p_joined_at)
+    returning * into new_membership;
+
+    return json_build_object(
+        'squad', row_to_json(new_squad),
+        'membership', row_to_json(new_membership)
+    );
+end;
+$$;
@@ -0,0 +1,40 @@
+-- Squads with their member count and current caretaker, in one round trip.
+--
+-- GET /dashboard/{user_id} calls this through supabase.rpc("squad_summaries", ...)
+-- with the user's squads whose cached summaries have expired. The caretaker is
+-- the squad's most recent caretaker_assignments row with the user's name, as
+-- GET /squads/{squad_id}/caretaker returns it, or null. Run it once in the
+-- Supabase SQL editor; until it exists the backend falls back to one query
+-- per table plus one per squad for its caretaker.
+create or replace function public.squad_summaries(p_squad_ids uuid[])
+returns json
+language sql
+stable
+as $$
+    select coalesce(json_agg(summary order by summary.name, summary.id), '[]'::json)
+    from (
+        select
+            s.id,
+            s.name,
+            s."nameMom",
+            (
+                select count(*)
+                from public.user_squad_memberships m
+                where m.squad_id = s.id
+            ) as member_count,
+            (
+                select row_to_json(c)
+                from (
+                    select a.id, a.squad_id, a.user_id, a.assigned_on, a.assigned_at, a.probability,
+                           json_build_object('id', u.id, 'nameFirst', u."nameFirst", 'nameLast', u."nameLast") as "user"
+                    from public.caretaker_assignments a
+                    join public.users u on u.id = a.user_id
+                    where a.squad_id = s.id
+                    order by a.assigned_at desc
+                    limit 1
+                ) c
+            ) as caretaker
+        from public.squad s
+        where s.id = any(p_squad_ids)
+    ) summary;
+$$;
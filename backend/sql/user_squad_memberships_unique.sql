@@ -0,0 +1,12 @@
+-- One membership per user and squad, and the index for "squads of a user".
+--
+-- POST /squad-memberships looks for an existing membership in the
+-- membership index (see memberships.py) and the bulk import in the table
+-- before inserting, but two joins racing each other can both find none,
+-- and an instance's index may not yet have seen a join made through
+-- another instance. With this constraint the second insert fails with
+-- unique_violation: the single add answers 409 and the bulk import looks
+-- the rejected users up again. It also indexes the squads-of-a-user
+-- lookup. Run this once in the Supabase SQL editor.
+alter table public.user_squad_memberships
+    add constraint user_squad_memberships_user_squad_key unique (user_id, squad_id);
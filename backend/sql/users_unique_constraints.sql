@@ -0,0 +1,9 @@
+-- Unique constraints create_user relies on to detect duplicate registrations.
+--
+-- POST /create-user inserts straight away and maps the resulting
+-- unique_violation to its 409 message, so registration costs one round trip
+-- and has no check-then-insert race. Run this once in the Supabase SQL
+-- editor, then set USERS_UNIQUE_CONSTRAINTS=true. Until then the backend
+-- checks for duplicates with a query first (the default).
+alter table public.users add constraint users_email_key unique (email);
+alter table public.users add constraint users_username_key unique (username);
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from memberships import MembershipIndex
+from resilience import DatabaseUnavailable
+
+
+def test_missing_key_is_loaded_once_then_kept_current():
+    index = MembershipIndex()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return ["squad-a"]
+
+    async def run():
+        assert await index.squads_of("user", load) == {"squad-a"}
+        await index.add("user", "squad-b")
+        await index.add("other", "squad-a")
+        assert await index.squads_of("user", load) == {"squad-a", "squad-b"}
+        await index.remove("user", "squad-a")
+        assert await index.squads_of("user", load) == {"squad-b"}
+
+    asyncio.run(run())
+    assert len(loads) == 1
+    # Keys no lookup asked for are not loaded by writes
+    assert len(index) == 1
+
+
+def test_write_during_load_is_kept():
+    index = MembershipIndex()
+
+    async def run():
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def load():
+            started.set()
+            await finish.wait()
+            # Read before the join below was written
+            return []
+
+        lookup = asyncio.create_task(index.members_of("squad", load))
+        await started.wait()
+        await index.add("user", "squad")
+        finish.set()
+        assert await lookup == {"user"}
+        assert await index.members_of("squad", load) == {"user"}
+
+    asyncio.run(run())
+
+
+def test_expired_entry_is_served_while_database_is_unavailable():
+    index = MembershipIndex(max_age=-1)
+
+    async def load():
+        return ["squad"]
+
+    async def unavailable():
+        raise DatabaseUnavailable("down")
+
+    async def run():
+        await index.squads_of("user", load)
+        assert await index.squads_of("user", unavailable) == {"squad"}
+        with pytest.raises(DatabaseUnavailable):
+            await index.squads_of("someone-else", unavailable)
+
+    asyncio.run(run())
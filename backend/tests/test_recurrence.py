@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from recurrence import RecurrenceRule
+
+HOUR = timedelta(hours=1)
+
+
+def starts(rrule, dtstart, start, end):
+    return list(RecurrenceRule.parse(rrule).occurrences(dtstart, HOUR, start, end))
+
+
+def test_count_when_dtstart_is_not_the_first_byday_of_its_week():
+    # Wednesday, so Monday of that week comes before dtstart and doesn't count
+    dtstart = datetime(2024, 1, 17, 9)
+    assert starts("FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=2", dtstart, datetime(2024, 1, 1), datetime(2024, 3, 1)) == [
+        datetime(2024, 1, 17, 9),
+        datetime(2024, 1, 19, 9),
+    ]
+
+
+def test_count_does_not_depend_on_the_window():
+    dtstart = datetime(2024, 1, 17, 9)
+    rrule = "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=4"
+    everything = starts(rrule, dtstart, datetime(2024, 1, 1), datetime(2024, 6, 1))
+    assert everything == [
+        datetime(2024, 1, 17, 9),
+        datetime(2024, 1, 19, 9),
+        datetime(2024, 1, 22, 9),
+        datetime(2024, 1, 24, 9),
+    ]
+    for day in range(40):
+        start = datetime(2024, 1, 1) + timedelta(days=day)
+        end = start + timedelta(days=3)
+        assert starts(rrule, dtstart, start, end) == [
+            occurrence for occurrence in everything if occurrence < end and occurrence + HOUR > start
+        ]
+
+
+def test_daily_count_and_interval():
+    dtstart = datetime(2024, 1, 1, 9)
+    rrule = "FREQ=DAILY;INTERVAL=2;COUNT=3"
+    assert starts(rrule, dtstart, datetime(2024, 1, 1), datetime(2024, 2, 1)) == [
+        datetime(2024, 1, 1, 9),
+        datetime(2024, 1, 3, 9),
+        datetime(2024, 1, 5, 9),
+    ]
+    assert starts(rrule, dtstart, datetime(2024, 1, 4), datetime(2024, 2, 1)) == [datetime(2024, 1, 5, 9)]
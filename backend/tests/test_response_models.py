@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+from benchmarks.stub_supabase import StubSupabase, auth_headers, seed_squad
+from cache import LRUCache
+from memberships import MembershipIndex
+from responses import ResponseValidationMiddleware
+from search import UserSearchIndex
+from versions import VersionTable
+
+
+@pytest.fixture
+def client():
+    stub = StubSupabase()
+    main.supabase = stub
+    main.cache = LRUCache()
+    main.versions = VersionTable()
+    main.membership_index = MembershipIndex()
+    main.user_search_index = UserSearchIndex()
+    main.care_session_indexes.clear()
+    user_ids = seed_squad(stub, "squad", 3)
+    # What RESPONSE_VALIDATION=true adds to main.app at import
+    app = ResponseValidationMiddleware(main.app)
+    with TestClient(app, headers=auth_headers(user_ids[0])) as http:
+        yield http, user_ids
+
+
+def mismatches():
+    return sum(metrics.RESPONSE_VALIDATION_ERRORS._values.values())
+
+
+def test_responses_match_their_models(client):
+    http, user_ids = client
+    member, other, _ = user_ids
+    before = mismatches()
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    def ok(response):
+        # Only 2xx bodies are validated
+        assert 200 <= response.status_code < 300, response.text
+        return response.json()
+
+    ok(http.get("/"))
+    ok(http.get("/health"))
+    ok(http.get("/cache-stats"))
+
+    ok(http.post("/create-user", json={
+        "username": "alice", "password": "password123", "nameFirst": "Alice", "nameLast": "Smith",
+        "email": "alice@example.com", "phoneNumber": "1234567890",
+    }))
+    tokens = ok(http.post("/login", json={"username": "alice", "password": "password123"}))
+    ok(http.post("/token/refresh", json={"refreshToken": tokens["refreshToken"]}))
+
+    ok(http.get("/users"))
+    ok(http.get(f"/users/{member}"))
+    ok(http.get("/users/search", params={"q": "First"}))
+
+    created = ok(http.post("/squads", json={"name": "New squad", "nameMom": "Mom", "user_id": member}))
+    ok(http.get("/squads"))
+    ok(http.get("/squad-memberships"))
+    ok(http.get("/squad-memberships/squad/members"))
+    new_squad = created["data"]["id"]
+    ok(http.post(f"/squad-memberships/{new_squad}/bulk", json={"user_ids": [other]}))
+    ok(http.post("/squad-memberships", json={"user_id": user_ids[2], "squad_id": new_squad}))
+
+    ok(http.post("/squads/squad/caretaker"))
+    ok(http.get("/squads/squad/caretaker"))
+
+    session = ok(http.post("/squads/squad/sessions", json={
+        "starts_at": (hour - timedelta(hours=2)).isoformat(),
+        "ends_at": (hour - timedelta(hours=1)).isoformat(),
+    }))["data"]
+    ok(http.put(f"/squads/squad/sessions/{session['id']}/caretaker", json={"user_id": other}))
+    ok(http.get("/squads/squad/sessions", params={
+        "start": (hour - timedelta(days=1)).isoformat(), "end": (hour + timedelta(days=7)).isoformat(),
+    }))
+    ok(http.get("/squads/squad/sessions/on-duty"))
+    ok(http.post(f"/squads/squad/sessions/{session['id']}/complete"))
+
+    rule = ok(http.post("/squads/squad/session-rules", json={
+        "rrule": "FREQ=DAILY;COUNT=5", "starts_at": (hour + timedelta(days=1)).isoformat(),
+        "duration_minutes": 60, "caretaker_id": member,
+    }))["data"]
+    ok(http.get("/squads/squad/session-rules"))
+    ok(http.post(f"/squads/squad/session-rules/{rule['id']}/exceptions", json={
+        "occurs_at": (hour + timedelta(days=2)).isoformat(),
+    }))
+    ok(http.delete(f"/squads/squad/session-rules/{rule['id']}"))
+
+    ok(http.get(f"/users/{other}/stats"))
+    ok(http.get("/squads/squad/stats"))
+    ok(http.get(f"/dashboard/{member}"))
+
+    assert mismatches() == before
@@ -0,0 +1,196 @@
+"""
+Signed session tokens.
+
+login issues a short-lived access token and a longer-lived refresh token.
+Both are HS256 JWTs carrying the user id (sub), the token type and an
+expiry. TokenMiddleware checks the `Authorization: Bearer <access token>`
+header of every request against the signing keys alone, with no users table
+lookup, and exposes the caller as request.state.user_id (None when no token
+was sent). Requests with an invalid or expired token get a 401.
+
+Keys come from SESSION_SIGNING_KEYS as "kid:secret,kid:secret". The first
+key signs new tokens and every listed key is accepted, with the key picked
+by the token's `kid` header. To rotate, put a new key first and drop the old
+one once REFRESH_TOKEN_TTL has passed. Without the variable a random key is
+generated per process, which only suits local development.
+
+Writes (WRITE_METHODS) always need a token outside PUBLIC_PATHS, and the
+write endpoints check the caller themselves (squad members only; see
+main.non_member_response). AUTH_REQUIRED=true also rejects reads without a
+token on every path except PUBLIC_PATHS. It defaults to false only while
+frontends built before every request carried the token
+(frontend/src/utils/api.ts) are still open in browsers: set it to true per
+deployment once they have been reloaded, and the default becomes true in
+the release after that.
+
+CRON_PATHS are called by Vercel cron jobs, which authenticate with
+`Authorization: Bearer $CRON_SECRET` instead of a session token. They are
+rejected unless CRON_SECRET is set and matches, and mark the request with
+request.state.cron.
+
+METRICS_PATH is scraped by Prometheus. With METRICS_SECRET set it requires
+`Authorization: Bearer $METRICS_SECRET`; otherwise it is treated like any
+other path.
+
+Event streams (paths ending in EVENT_STREAM_SUFFIX) are opened by the
+browser's EventSource, which cannot set headers, so there the access token
+may be sent as the access_token query parameter instead.
+"""
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+import jwt
+
+ACCESS_TOKEN_TTL = int(os.environ.get("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.environ.get("REFRESH_TOKEN_TTL", str(7 * 24 * 3600)))
+AUTH_REQUIRED = os.environ.get("AUTH_REQUIRED", "false").lower() == "true"
+ALGORITHM = "HS256"
+
+# Tokens already verified, so a client's repeated requests skip the signature
+# check until the token expires
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+# Methods that always need a token outside PUBLIC_PATHS, whatever AUTH_REQUIRED says
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+PUBLIC_PATHS = {"/", "/health", "/login", "/create-user", "/token/refresh", "/docs", "/openapi.json"}
+
+CRON_SECRET = os.environ.get("CRON_SECRET")
+CRON_PATHS = {"/caretakers/nightly", "/rollups/rebuild"}
+
+METRICS_SECRET = os.environ.get("METRICS_SECRET")
+METRICS_PATH = "/metrics"
+
+EVENT_STREAM_SUFFIX = "/events"
+
+
+def load_signing_keys(raw):
+    keys = {}
+    for entry in (raw or "").split(","):
+        kid, _, secret = entry.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+signing_keys = load_signing_keys(os.environ.get("SESSION_SIGNING_KEYS"))
+if not signing_keys:
+    print("SESSION_SIGNING_KEYS not set, using a random per-process signing key")
+    signing_keys = {"dev": secrets.token_urlsafe(32)}
+active_kid = next(iter(signing_keys))
+_verified_tokens = OrderedDict()
+
+
+def rotate_signing_keys(keys):
+    """Replace the key set; the first key becomes the signing key."""
+    global signing_keys, active_kid
+    signing_keys = dict(keys)
+    active_kid = next(iter(signing_keys))
+    _verified_tokens.clear()
+
+
+def issue_token(user_id, token_type, ttl):
+    now = int(time.time())
+    payload = {"sub": user_id, "type": token_type, "iat": now, "exp": now + ttl}
+    return jwt.encode(payload, signing_keys[active_kid], algorithm=ALGORITHM, headers={"kid": active_kid})
+
+
+def issue_token_pair(user_id):
+    return {
+        "accessToken": issue_token(user_id, "access", ACCESS_TOKEN_TTL),
+        "refreshToken": issue_token(user_id, "refresh", REFRESH_TOKEN_TTL),
+        "expiresIn": ACCESS_TOKEN_TTL,
+    }
+
+
+def verify_token(token, token_type="access"):
+    """
+    Return the claims of a valid token of the given type.
+    Raises jwt.InvalidTokenError otherwise.
+    """
+    claims = _verified_tokens.get(token)
+    if claims is not None and claims["exp"] > time.time():
+        if claims["type"] != token_type:
+            raise jwt.InvalidTokenError("Wrong token type")
+        return claims
+
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = signing_keys.get(kid)
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    claims = jwt.decode(token, key, algorithms=[ALGORITHM], options={"require": ["exp", "sub", "type"]})
+    if claims["type"] != token_type:
+        raise jwt.InvalidTokenError("Wrong token type")
+
+    _verified_tokens[token] = claims
+    if len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+    return claims
+
+
+class TokenMiddleware:
+    """
+    ASGI middleware that resolves the caller from their access token.
+    Written against raw ASGI so streaming responses pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state = scope.setdefault("state", {})
+        state["user_id"] = None
+        state["cron"] = False
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        if authorization is None and scope["path"].endswith(EVENT_STREAM_SUFFIX):
+            access_token = parse_qs(scope["query_string"].decode("latin-1")).get("access_token")
+            if access_token:
+                authorization = f"Bearer {access_token[0]}"
+
+        if scope["path"] in CRON_PATHS:
+            if not (CRON_SECRET and authorization and hmac.compare_digest(authorization, f"Bearer {CRON_SECRET}")):
+                return await self._reject(send, "Cron secret required")
+            state["cron"] = True
+            return await self.app(scope, receive, send)
+
+        if scope["path"] == METRICS_PATH and METRICS_SECRET:
+            if not (authorization and hmac.compare_digest(authorization, f"Bearer {METRICS_SECRET}")):
+                return await self._reject(send, "Metrics secret required")
+            return await self.app(scope, receive, send)
+
+        if authorization and authorization.lower().startswith("bearer "):
+            try:
+                state["user_id"] = verify_token(authorization[7:].strip())["sub"]
+            except jwt.InvalidTokenError:
+                return await self._reject(send, "Invalid or expired token")
+        elif scope["path"] not in PUBLIC_PATHS and (scope["method"] in WRITE_METHODS or (AUTH_REQUIRED and scope["method"] != "OPTIONS")):
+            return await self._reject(send, "Authentication required")
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, message):
+        body = json.dumps({"message": message}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"www-authenticate", b"Bearer"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
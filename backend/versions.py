@@ -0,0 +1,165 @@
+"""
+Version tokens for cached resources, from which their ETags are made.
+
+Each resource has an opaque token under the same key as its cache entry
+("squads", "squad_members:<squad_id>", "user:<user_id>"). The token is
+minted on first use and replaced by bump():
+
+- by the write endpoints, right after they invalidate the cache entry;
+- whenever the entry is (re)loaded into the cache, since the reload may
+  pick up writes this instance never saw. That bump goes through bump_if()
+  with the token read before the load: if a write replaced it meanwhile,
+  the loaded value may predate the write, so it is sent without an ETag
+  rather than under a token that would vouch for it.
+
+A GET compares If-None-Match with the current token before anything else,
+so a client that is up to date gets 304 Not Modified without the payload
+being read from the cache or Supabase.
+
+Tokens are random rather than counters, so a token minted after a restart
+or an expiry can never match an ETag handed out for other content.
+
+Two backends share the same async interface, like cache.py:
+
+- VersionTable: in-process, the default. Tokens expire with the cache
+  entries (CACHE_TTL), so a write through another instance goes unseen
+  no longer than it does in the cache, and at most CACHE_MAXSIZE are kept.
+- RedisVersionTable: shared between instances, used when CACHE_REDIS_URL
+  is set, so a write through any instance changes the ETag everywhere.
+"""
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from cache import CACHE_MAXSIZE, CACHE_REDIS_URL, CACHE_TTL
+
+# Seconds a token shared through Redis is kept without being bumped
+VERSION_REDIS_TTL = int(os.environ.get("VERSION_REDIS_TTL", "86400"))
+
+# Compare-and-set for RedisVersionTable.bump_if(), atomic in Redis
+BUMP_IF_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[2], "EX", ARGV[3])
+return 1
+"""
+
+
+def new_token():
+    return secrets.token_urlsafe(12)
+
+
+def etag(token):
+    """Strong ETag header value for a version token."""
+    return f'"{token}"'
+
+
+def etag_matches(if_none_match, token):
+    """Whether an If-None-Match header value lists the ETag of token."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return "*" in tags or etag(token) in (tag.removeprefix("W/") for tag in tags)
+
+
+class VersionTable:
+    backend = "memory"
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, token), least recently used first
+        self._tokens = OrderedDict()
+        self.bumps = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    async def get(self, key):
+        """The current token for key, minting one if it has none."""
+        entry = self._tokens.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self._tokens.move_to_end(key)
+            return entry[1]
+        token = new_token()
+        self._store(key, now + self.ttl, token)
+        return token
+
+    async def bump(self, *keys):
+        """Give each key a new token; returns the new tokens in order."""
+        expires_at = time.monotonic() + self.ttl
+        tokens = [new_token() for _ in keys]
+        for key, token in zip(keys, tokens):
+            self._store(key, expires_at, token)
+        self.bumps += len(keys)
+        return tokens
+
+    async def bump_if(self, key, token):
+        """
+        Give key a new token if its current one is still token; returns the
+        new token, or None if the token was replaced or has expired.
+        """
+        entry = self._tokens.get(key)
+        if entry is None or entry[0] <= time.monotonic() or entry[1] != token:
+            return None
+        (token,) = await self.bump(key)
+        return token
+
+    def _store(self, key, expires_at, token):
+        self._tokens[key] = (expires_at, token)
+        self._tokens.move_to_end(key)
+        # A token dropped here is simply minted anew: one extra 200, never a wrong 304
+        while len(self._tokens) > self.maxsize:
+            self._tokens.popitem(last=False)
+
+    def stats(self):
+        return {"backend": self.backend, "tokens": len(self), "bumps": self.bumps}
+
+
+class RedisVersionTable(VersionTable):
+    backend = "redis"
+
+    def __init__(self, redis_url, ttl=VERSION_REDIS_TTL, prefix="wgm:version:"):
+        super().__init__(maxsize=None, ttl=ttl)
+        import redis.asyncio as redis
+        self._redis = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    async def get(self, key):
+        token = new_token()
+        # Mint only if no other instance has; either way read back the winner
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, token, ex=self.ttl, nx=True)
+            pipe.get(self.prefix + key)
+            _, current = await pipe.execute()
+        return current.decode() if current is not None else token
+
+    async def bump(self, *keys):
+        tokens = [new_token() for _ in keys]
+        if keys:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, token in zip(keys, tokens):
+                    pipe.set(self.prefix + key, token, ex=self.ttl)
+                await pipe.execute()
+            self.bumps += len(keys)
+        return tokens
+
+    async def bump_if(self, key, token):
+        new = new_token()
+        if not await self._redis.eval(BUMP_IF_SCRIPT, 1, self.prefix + key, token, new, self.ttl):
+            return None
+        self.bumps += 1
+        return new
+
+    def stats(self):
+        return {"backend": self.backend, "tokens": None, "bumps": self.bumps}
+
+
+def create_version_table():
+    if CACHE_REDIS_URL:
+        return RedisVersionTable(CACHE_REDIS_URL)
+    return VersionTable()
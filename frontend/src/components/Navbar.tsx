@@ -37,7 +37,10 @@ export default function Navbar() {
             <button
               className="nav-link logout"
               onClick={() => {
-                // Add logout logic here
+                // Forget the session so its tokens are not sent again
+                localStorage.removeItem('userId');
+                localStorage.removeItem('accessToken');
+                localStorage.removeItem('refreshToken');
                 navigate('/');
               }}
             >
@@ -1,6 +1,6 @@
 import { useParams, useNavigate } from 'react-router-dom';
-import { useEffect, useState } from 'react';
-import { API_URL } from '../config/env';
+import { useCallback, useEffect, useState } from 'react';
+import { apiFetch } from '../utils/api';
 import Navbar from '../components/Navbar';
 
 interface User {
@@ -13,10 +13,21 @@ interface User {
   sessions: number;
 }
 
+interface Caretaker {
+  user_id: string;
+  user?: {
+    id: string;
+    nameFirst: string;
+    nameLast: string;
+  };
+}
+
 interface Squad {
   id: string;
   name: string;
   nameMom: string;
+  member_count: number;
+  caretaker: Caretaker | null;
 }
 
 export default function Dashboard() {
@@ -37,48 +48,34 @@ export default function Dashboard() {
   const [momName, setMomName] = useState('');
   const [submitting, setSubmitting] = useState(false);
 
-  // Fetch user data
-  useEffect(() => {
+  // Fetch the user and their squads in one request
+  const fetchDashboard = useCallback(() => {
     if (!userId) return;
-
-    fetch(`${API_URL}/users/${userId}`)
-      .then(response => response.json())
-      .then(data => {
-        if (data.data) {
-          setUser(data.data);
-        } else {
-          setError(data.message || 'User not found');
-        }
-        setLoading(false);
-      })
-      .catch(() => {
-        setError('Failed to fetch user data');
-        setLoading(false);
-      });
-  }, [userId]);
-
-  // Fetch squads
-  const fetchSquads = () => {
     setSquadsLoading(true);
-    fetch(`${API_URL}/squads`)
+    apiFetch(`/dashboard/${userId}`)
       .then(response => response.json())
       .then(data => {
         if (data.data) {
-          setSquads(data.data);
+          setUser(data.data.user);
+          setSquads(data.data.squads);
         } else {
+          setError(data.message || 'User not found');
           setSquadsError(data.message || 'No squads found');
         }
+        setLoading(false);
         setSquadsLoading(false);
       })
       .catch(() => {
+        setError('Failed to fetch user data');
         setSquadsError('Failed to fetch squads');
+        setLoading(false);
         setSquadsLoading(false);
       });
-  };
+  }, [userId]);
 
   useEffect(() => {
-    fetchSquads();
-  }, []);
+    fetchDashboard();
+  }, [fetchDashboard]);
 
   // Handle form submission
   const handleSubmit = async (e: React.FormEvent) => {
@@ -86,7 +83,7 @@ export default function Dashboard() {
     setSubmitting(true);
 
     try {
-      const response = await fetch(`${API_URL}/squads`, {
+      const response = await apiFetch('/squads', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -102,7 +99,7 @@ export default function Dashboard() {
 
       if (response.ok) {
         // Refresh squads list and close modal
-        fetchSquads();
+        fetchDashboard();
         setShowModal(false);
         setSquadName('');
         setMomName('');
@@ -158,6 +155,14 @@ export default function Dashboard() {
             >
               <h3 className="squad-name">{squad.name}</h3>
               <p className="squad-mom">Mom: {squad.nameMom}</p>
+              <p className="squad-mom">
+                {squad.member_count} {squad.member_count === 1 ? 'member' : 'members'}
+              </p>
+              {squad.caretaker?.user && (
+                <p className="squad-mom">
+                  Caretaker: {squad.caretaker.user.nameFirst} {squad.caretaker.user.nameLast}
+                </p>
+              )}
             </div>
           ))}
         </div>
@@ -26,8 +26,10 @@ export default function Login() {
       const data = await response.json();
 
       if (response.ok) {
-        // Login successful - store userId and navigate to dashboard
+        // Login successful - store userId and session tokens, then navigate to dashboard
         localStorage.setItem('userId', data.userId);
+        localStorage.setItem('accessToken', data.accessToken);
+        localStorage.setItem('refreshToken', data.refreshToken);
         navigate(`/dashboard/${data.userId}`);
       } else {
         // Login failed - show error message
@@ -1,6 +1,6 @@
-import { useEffect, useState, useCallback } from 'react';
+import { useEffect, useState, useCallback, useRef } from 'react';
 import { useParams } from 'react-router-dom';
-import { API_URL } from '../config/env';
+import { apiFetch, eventSourceUrl, refreshSession } from '../utils/api';
 
 import { drawWheel, spinWheel, careTaker, cgi, setOnSpinComplete, wheelColors } from '../utils/wheel';
 
@@ -29,6 +29,8 @@ export default function Squad() {
   const { squadId } = useParams<{ squadId: string }>();
   const [currentCareTaker, setCurrentCareTaker] = useState("");
   const [isSpinning, setIsSpinning] = useState(false);
+  // Read by the event stream, which should not reveal our own pick mid-spin
+  const isSpinningRef = useRef(false);
   
   // Squad members state
   const [members, setMembers] = useState<SquadMember[]>([]);
@@ -61,7 +63,7 @@ export default function Squad() {
     if (!squadId) return;
     
     setMembersLoading(true);
-    fetch(`${API_URL}/squad-memberships/${squadId}/members`)
+    apiFetch(`/squad-memberships/${squadId}/members`)
       .then(response => response.json())
       .then(data => {
         if (data.data && Array.isArray(data.data)) {
@@ -79,6 +81,14 @@ export default function Squad() {
     fetchMembers();
   }, [fetchMembers]);
 
+  // Add members we already have the details of, skipping ones we know
+  const addMembers = useCallback((newMembers: SquadMember[]) => {
+    setMembers(current => {
+      const known = new Set(current.map(member => member.id));
+      return [...current, ...newMembers.filter(member => !known.has(member.id))];
+    });
+  }, []);
+
   // Draw wheel when we have 2+ members
   useEffect(() => {
     if (members.length >= 2) {
@@ -86,6 +96,7 @@ export default function Squad() {
       setOnSpinComplete(() => {
         setCurrentCareTaker(careTaker);
         setIsSpinning(false);
+        isSpinningRef.current = false;
         // Update theme color to match the winner's wheel segment
         const winnerColor = wheelColors[cgi % wheelColors.length];
         setThemeColor(winnerColor);
@@ -98,14 +109,110 @@ export default function Squad() {
       
       // Draw the wheel with the member names
       drawWheel(fullNames);
-      setCurrentCareTaker(careTaker);
     }
   }, [members]);
 
-  const handleSpin = () => {
+  // Show the squad's current caretaker (the most recent pick)
+  const fetchCaretaker = useCallback(() => {
+    if (!squadId) return;
+
+    apiFetch(`/squads/${squadId}/caretaker`)
+      .then(response => response.json())
+      .then(data => {
+        if (data.data && data.data.user) {
+          setCurrentCareTaker(`${data.data.user.nameFirst} ${data.data.user.nameLast}`);
+        } else {
+          setCurrentCareTaker("Spin to find out!");
+        }
+      })
+      .catch(() => {
+        setCurrentCareTaker("Spin to find out!");
+      });
+  }, [squadId]);
+
+  useEffect(() => {
+    fetchCaretaker();
+  }, [fetchCaretaker]);
+
+  // Changes made by anyone in the squad are pushed over server-sent events,
+  // so the page never polls. EventSource reconnects by itself; `resync`
+  // means events were missed and we refetch. It gives up for good when a
+  // reconnect is refused, e.g. once the access token in its URL expires,
+  // so then we refresh the token and open a new stream.
+  useEffect(() => {
+    if (!squadId) return;
+
+    let events: EventSource;
+    let closed = false;
+    const open = () => {
+      events = new EventSource(eventSourceUrl(`/squads/${squadId}/events`));
+      events.addEventListener('membership.created', event => {
+        addMembers(JSON.parse((event as MessageEvent).data).members);
+      });
+      events.addEventListener('caretaker.selected', event => {
+        if (isSpinningRef.current) return;
+        const assignment = JSON.parse((event as MessageEvent).data);
+        if (assignment.user) {
+          setCurrentCareTaker(`${assignment.user.nameFirst} ${assignment.user.nameLast}`);
+        } else {
+          // Nightly picks come without user details
+          fetchCaretaker();
+        }
+      });
+      events.addEventListener('resync', () => {
+        fetchMembers();
+        fetchCaretaker();
+      });
+      events.addEventListener('error', () => {
+        if (events.readyState !== EventSource.CLOSED) return;
+        refreshSession().then(refreshed => {
+          if (refreshed && !closed) {
+            // Whatever happened while we were away is refetched
+            open();
+            fetchMembers();
+            fetchCaretaker();
+          }
+        });
+      });
+    };
+    open();
+    return () => {
+      closed = true;
+      events.close();
+    };
+  }, [squadId, addMembers, fetchMembers, fetchCaretaker]);
+
+  // The backend picks the caretaker (weighted by hours and sessions) and
+  // records it; the wheel then spins to land on them
+  const handleSpin = async () => {
+    if (!squadId) return;
+
     setIsSpinning(true);
+    isSpinningRef.current = true;
     setCurrentCareTaker("Spinning...");
-    spinWheel();
+    try {
+      const response = await apiFetch(`/squads/${squadId}/caretaker`, {
+        method: 'POST',
+      });
+      const data = await response.json();
+      const winnerIndex = response.ok
+        ? members.findIndex(member => member.user_id === data.data.user_id)
+        : -1;
+
+      if (winnerIndex === -1) {
+        alert(data.message || 'Failed to pick a caretaker');
+        setCurrentCareTaker("");
+        setIsSpinning(false);
+        isSpinningRef.current = false;
+        return;
+      }
+      spinWheel(winnerIndex);
+    } catch {
+      alert('Failed to pick a caretaker');
+      setCurrentCareTaker("");
+      setIsSpinning(false);
+      isSpinningRef.current = false;
+    }
   };
 
   // Search users as they type
@@ -117,7 +224,7 @@ export default function Squad() {
 
     const delaySearch = setTimeout(() => {
       setSearching(true);
-      fetch(`${API_URL}/users/search?q=${encodeURIComponent(searchQuery)}`)
+      apiFetch(`/users/search?q=${encodeURIComponent(searchQuery)}`)
         .then(response => response.json())
         .then(data => {
           if (data.data && Array.isArray(data.data)) {
@@ -144,7 +251,7 @@ export default function Squad() {
     
     setAdding(true);
     try {
-      const response = await fetch(`${API_URL}/squad-memberships`, {
+      const response = await apiFetch('/squad-memberships', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -158,8 +265,9 @@ export default function Squad() {
       const data = await response.json();
 
       if (response.ok) {
-        // Refresh members list
-        fetchMembers();
+        // We know who was added, so no refetch; other viewers get the
+        // membership.created event
+        addMembers([{ ...data.data, user }]);
         setSearchQuery('');
         setSearchResults([]);
         // Don't close modal so they can add more people
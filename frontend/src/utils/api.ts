@@ -0,0 +1,67 @@
+import { API_URL } from '../config/env';
+
+// Every API call goes through apiFetch so it carries the session's access
+// token (stored by Login) as `Authorization: Bearer <token>`.
+
+function storeTokens(data: { accessToken: string; refreshToken: string }) {
+  localStorage.setItem('accessToken', data.accessToken);
+  localStorage.setItem('refreshToken', data.refreshToken);
+}
+
+// One refresh at a time, shared by the requests that got a 401 together
+let refreshing: Promise<boolean> | null = null;
+
+async function refreshTokens(): Promise<boolean> {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) return false;
+  try {
+    const response = await fetch(`${API_URL}/token/refresh`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ refreshToken }),
+    });
+    if (!response.ok) return false;
+    storeTokens(await response.json());
+    return true;
+  } catch {
+    return false;
+  }
+}
+
+function send(path: string, init: RequestInit) {
+  const headers = new Headers(init.headers);
+  const accessToken = localStorage.getItem('accessToken');
+  if (accessToken) {
+    headers.set('Authorization', `Bearer ${accessToken}`);
+  }
+  return fetch(`${API_URL}${path}`, { ...init, headers });
+}
+
+// Exchange the refresh token for new tokens; resolves to whether it worked
+export function refreshSession() {
+  refreshing ??= refreshTokens().finally(() => {
+    refreshing = null;
+  });
+  return refreshing;
+}
+
+// fetch() for an API path. An expired access token (401) is refreshed once
+// with the refresh token and the request sent again.
+export async function apiFetch(path: string, init: RequestInit = {}) {
+  const response = await send(path, init);
+  if (response.status !== 401 || !localStorage.getItem('refreshToken')) {
+    return response;
+  }
+  return (await refreshSession()) ? send(path, init) : response;
+}
+
+// URL for an EventSource, which cannot set headers: the access token goes
+// in the access_token query parameter instead
+export function eventSourceUrl(path: string) {
+  const accessToken = localStorage.getItem('accessToken');
+  if (!accessToken) return `${API_URL}${path}`;
+  const separator = path.includes('?') ? '&' : '?';
+  return `${API_URL}${path}${separator}access_token=${encodeURIComponent(accessToken)}`;
+}
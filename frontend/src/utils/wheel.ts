@@ -21,12 +21,6 @@ export function drawWheel(names: string[]) {
   // Set wheelNames to the passed names array
   wheelNames = names;
   
-  // Update careTaker and cgi based on new names
-  if (wheelNames.length > 0) {
-    cgi = Math.floor(Math.random() * wheelNames.length); // Random initial selection
-    careTaker = wheelNames[cgi];
-  }
-  
   if(wheelNames.length === 0) return;
 
   const sliceAngle = (2 * Math.PI) / wheelNames.length;
@@ -59,7 +53,9 @@ export function drawWheel(names: string[]) {
   });
 }
 
-export function spinWheel() {
+// Spin the wheel so it comes to rest on wheelNames[winnerIndex].
+// The winner itself is picked by the backend (POST /squads/{id}/caretaker).
+export function spinWheel(winnerIndex: number) {
   const wheelSpinner = document.getElementById('wheelSpinner') as HTMLElement;
   if (!wheelSpinner) return;
 
@@ -68,12 +64,19 @@ export function spinWheel() {
 
   isSpinning = true;
 
-  // Random spin: 3-5 full rotations plus a random extra amount
+  // The pointer is at the top (270 degrees in canvas coordinates) and slice i
+  // covers [i * sliceDeg, (i + 1) * sliceDeg) before rotation, so aim for a
+  // random spot inside the winner's slice away from its edges
+  const sliceDeg = 360 / wheelNames.length;
+  const targetAngle = (winnerIndex + 0.2 + Math.random() * 0.6) * sliceDeg;
+  const targetRotation = (270 - targetAngle + 360) % 360;
+  const extraDegrees = (targetRotation - (currentRotation % 360) + 360) % 360;
+
+  // 3-5 full rotations before settling on the winner
   const minSpins = 3;
   const maxSpins = 5;
-  const randomSpins = minSpins + Math.random() * (maxSpins - minSpins);
-  const randomExtraDegrees = Math.random() * 360;
-  const totalRotation = randomSpins * 360 + randomExtraDegrees;
+  const randomSpins = minSpins + Math.floor(Math.random() * (maxSpins - minSpins + 1));
+  const totalRotation = randomSpins * 360 + extraDegrees;
 
   // Calculate the final rotation
   const finalRotation = currentRotation + totalRotation;
@@ -83,26 +86,8 @@ export function spinWheel() {
   wheelSpinner.style.transformOrigin = 'center center';
   wheelSpinner.style.transform = `rotate(${finalRotation}deg)`;
 
-  // After spin completes (2 seconds), determine the winner
+  // After spin completes (2 seconds), show the winner
   setTimeout(() => {
-    // Normalize the final rotation to 0-360 range
-    const normalizedRotation = finalRotation % 360;
-    
-    // The pointer is at the top (270 degrees in canvas coordinates, or -90 from start)
-    // We need to find which slice is at the pointer position
-    // Since the wheel rotates clockwise, we need to calculate backwards
-    const sliceDeg = 360 / wheelNames.length;
-    
-    // Pointer is at the top, which is at 270 degrees (or -90 degrees)
-    // The first slice starts at 0 degrees (right side) in the canvas
-    // After rotation, we need to find which slice ended up at the top
-    const pointerAngle = 270; // Top of the wheel
-    const adjustedAngle = (pointerAngle - normalizedRotation + 360) % 360;
-    
-    // Find which slice this angle falls into
-    const winnerIndex = Math.floor(adjustedAngle / sliceDeg) % wheelNames.length;
-    
-    // Update the winner
     cgi = winnerIndex;
     careTaker = wheelNames[cgi];
     